@@ -0,0 +1,57 @@
+"""Unique index on issue (repository_url, issue_number)
+
+Revision ID: 003_issue_repository_number_unique
+Revises: 002_add_node_is_public_column
+Create Date: 2026-10-17 10:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "003_issue_repository_number_unique"
+down_revision = "002_add_node_is_public_column"
+branch_labels = None
+depends_on = None
+
+
+INDEX_NAME = "uq_issue_repository_url_issue_number"
+
+
+def _index_exists(table_name: str, index_name: str) -> bool:
+    inspector = sa.inspect(op.get_bind())
+    return index_name in {index["name"] for index in inspector.get_indexes(table_name)}
+
+
+def upgrade() -> None:
+    if _index_exists("issue", INDEX_NAME):
+        return
+
+    # The GitHub sync upserts on this key, so duplicates must be resolved
+    # by hand rather than silently dropped here.
+    duplicates = op.get_bind().execute(
+        sa.text(
+            "SELECT repository_url, issue_number, COUNT(*) FROM issue "
+            "WHERE repository_url IS NOT NULL AND issue_number IS NOT NULL "
+            "GROUP BY repository_url, issue_number HAVING COUNT(*) > 1 LIMIT 10"
+        )
+    ).all()
+    if duplicates:
+        listed = ", ".join(f"{url}#{number} x{count}" for url, number, count in duplicates)
+        raise RuntimeError(
+            "Cannot create unique index on issue (repository_url, issue_number); "
+            f"remove duplicate issues first: {listed}"
+        )
+
+    op.create_index(
+        INDEX_NAME,
+        "issue",
+        ["repository_url", "issue_number"],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    if not _index_exists("issue", INDEX_NAME):
+        return
+
+    op.drop_index(INDEX_NAME, table_name="issue")
@@ -0,0 +1,53 @@
+"""Add repository_sync_state table for incremental GitHub sync
+
+Revision ID: 004_add_repository_sync_state
+Revises: 003_issue_repository_number_unique
+Create Date: 2026-10-17 11:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+revision = "004_add_repository_sync_state"
+down_revision = "003_issue_repository_number_unique"
+branch_labels = None
+depends_on = None
+
+
+def _table_exists(table_name: str) -> bool:
+    inspector = sa.inspect(op.get_bind())
+    return table_name in inspector.get_table_names()
+
+
+def upgrade() -> None:
+    if _table_exists("repository_sync_state"):
+        return
+
+    op.create_table(
+        "repository_sync_state",
+        sa.Column("id", sa.Uuid(), nullable=False),
+        sa.Column("repository_url", sqlmodel.sql.sqltypes.AutoString(length=512), nullable=False),
+        sa.Column("labels", sqlmodel.sql.sqltypes.AutoString(length=255), nullable=False),
+        sa.Column("last_updated_at", sa.DateTime(), nullable=True),
+        sa.Column("etags", sa.JSON(), nullable=False),
+        sa.Column("last_synced_at", sa.DateTime(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("repository_url", "labels"),
+    )
+    op.create_index(
+        "ix_repository_sync_state_repository_url",
+        "repository_sync_state",
+        ["repository_url"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    if not _table_exists("repository_sync_state"):
+        return
+
+    op.drop_index("ix_repository_sync_state_repository_url", table_name="repository_sync_state")
+    op.drop_table("repository_sync_state")
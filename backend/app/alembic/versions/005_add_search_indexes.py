@@ -0,0 +1,97 @@
+"""Full-text and trigram search indexes for issues and projects
+
+Revision ID: 005_add_search_indexes
+Revises: 004_add_repository_sync_state
+Create Date: 2026-10-17 12:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "005_add_search_indexes"
+down_revision = "004_add_repository_sync_state"
+branch_labels = None
+depends_on = None
+
+
+# table -> (search_vector expression, columns with trigram indexes)
+SEARCH_TABLES = {
+    "issue": (
+        "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(content, '')), 'B') || "
+        "setweight(to_tsvector('simple', coalesce(repository_url, '')), 'C')",
+        ["title", "content", "repository_url"],
+    ),
+    "project": (
+        "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(description, '')), 'B')",
+        ["name", "description"],
+    ),
+}
+
+
+def _column_exists(table_name: str, column_name: str) -> bool:
+    inspector = sa.inspect(op.get_bind())
+    return column_name in {column["name"] for column in inspector.get_columns(table_name)}
+
+
+def _index_exists(table_name: str, index_name: str) -> bool:
+    inspector = sa.inspect(op.get_bind())
+    return index_name in {index["name"] for index in inspector.get_indexes(table_name)}
+
+
+def _search_indexes() -> list[tuple[str, str, str, dict]]:
+    """(table, index, column, create_index kwargs) for every search index"""
+    indexes = []
+    for table_name, (_, trigram_columns) in SEARCH_TABLES.items():
+        indexes.append(
+            (table_name, f"ix_{table_name}_search_vector", "search_vector", {"postgresql_using": "gin"})
+        )
+        for column_name in trigram_columns:
+            indexes.append((
+                table_name,
+                f"ix_{table_name}_{column_name}_trgm",
+                column_name,
+                {"postgresql_using": "gin", "postgresql_ops": {column_name: "gin_trgm_ops"}},
+            ))
+    return indexes
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    for table_name, (expression, _) in SEARCH_TABLES.items():
+        if not _column_exists(table_name, "search_vector"):
+            op.add_column(
+                table_name,
+                sa.Column(
+                    "search_vector",
+                    postgresql.TSVECTOR(),
+                    sa.Computed(expression, persisted=True),
+                    nullable=True,
+                ),
+            )
+
+    # CONCURRENTLY avoids blocking writes on large tables but cannot run
+    # inside a transaction block.
+    with op.get_context().autocommit_block():
+        for table_name, index_name, column_name, options in _search_indexes():
+            if _index_exists(table_name, index_name):
+                continue
+            op.create_index(
+                index_name, table_name, [column_name], postgresql_concurrently=True, **options
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for table_name, index_name, _, _ in reversed(_search_indexes()):
+            if _index_exists(table_name, index_name):
+                op.drop_index(index_name, table_name=table_name, postgresql_concurrently=True)
+
+    for table_name in SEARCH_TABLES:
+        if _column_exists(table_name, "search_vector"):
+            op.drop_column(table_name, "search_vector")
+
+    # pg_trgm may be used by other objects, so the extension is left installed
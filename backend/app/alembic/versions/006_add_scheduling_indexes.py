@@ -0,0 +1,73 @@
+"""Composite and partial indexes for the scheduling hot paths
+
+Revision ID: 006_add_scheduling_indexes
+Revises: 005_add_search_indexes
+Create Date: 2026-10-17 13:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "006_add_scheduling_indexes"
+down_revision = "005_add_search_indexes"
+branch_labels = None
+depends_on = None
+
+
+# name -> (table, columns, partial index predicate)
+INDEXES = {
+    "ix_issue_pending_queue": (
+        "issue", ["priority DESC", "created_at ASC"], "status = 'pending'",
+    ),
+    "ix_issue_processing_node": (
+        "issue", ["assigned_node_id"], "status = 'processing'",
+    ),
+    "ix_issue_list_order": (
+        "issue", ["priority DESC", "created_at DESC", "id DESC"], None,
+    ),
+    "ix_issue_owner_list_order": (
+        "issue", ["owner_id", "priority DESC", "created_at DESC", "id DESC"], None,
+    ),
+    "ix_issue_finished_completed_at": (
+        "issue",
+        ["completed_at"],
+        "status IN ('completed', 'failed') AND completed_at IS NOT NULL",
+    ),
+    "ix_node_online_heartbeat": (
+        "node", ["last_heartbeat"], "status = 'online'",
+    ),
+    "ix_task_running_started_at": (
+        "task", ["started_at DESC"], "status = 'running'",
+    ),
+    "ix_task_issue_id": (
+        "task", ["issue_id"], None,
+    ),
+}
+
+
+def _index_exists(table_name: str, index_name: str) -> bool:
+    inspector = sa.inspect(op.get_bind())
+    return index_name in {index["name"] for index in inspector.get_indexes(table_name)}
+
+
+def upgrade() -> None:
+    # CONCURRENTLY avoids blocking writes on large tables but cannot run
+    # inside a transaction block.
+    with op.get_context().autocommit_block():
+        for index_name, (table_name, columns, where) in INDEXES.items():
+            if _index_exists(table_name, index_name):
+                continue
+            op.create_index(
+                index_name,
+                table_name,
+                [sa.text(column) for column in columns],
+                postgresql_where=sa.text(where) if where else None,
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for index_name, (table_name, _, _) in INDEXES.items():
+            if _index_exists(table_name, index_name):
+                op.drop_index(index_name, table_name=table_name, postgresql_concurrently=True)
@@ -0,0 +1,44 @@
+"""Add node_metrics table for heartbeat-reported resource metrics
+
+Revision ID: 007_add_node_metrics
+Revises: 006_add_scheduling_indexes
+Create Date: 2026-10-17 16:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "007_add_node_metrics"
+down_revision = "006_add_scheduling_indexes"
+branch_labels = None
+depends_on = None
+
+
+def _table_exists(table_name: str) -> bool:
+    inspector = sa.inspect(op.get_bind())
+    return table_name in inspector.get_table_names()
+
+
+def upgrade() -> None:
+    if _table_exists("node_metrics"):
+        return
+
+    op.create_table(
+        "node_metrics",
+        sa.Column("node_id", sa.Uuid(), nullable=False),
+        sa.Column("cpu_count", sa.Integer(), nullable=True),
+        sa.Column("load_avg", sa.Float(), nullable=True),
+        sa.Column("mem_free_mb", sa.Integer(), nullable=True),
+        sa.Column("disk_free_mb", sa.Integer(), nullable=True),
+        sa.Column("running_tasks", sa.Integer(), nullable=True),
+        sa.Column("reported_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["node_id"], ["node.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("node_id"),
+    )
+
+
+def downgrade() -> None:
+    if not _table_exists("node_metrics"):
+        return
+
+    op.drop_table("node_metrics")
@@ -0,0 +1,66 @@
+"""Add issue.unmet_dependency_count and the ready queue index
+
+Revision ID: 008_add_issue_dependency_counter
+Revises: 007_add_node_metrics
+Create Date: 2026-10-17 18:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "008_add_issue_dependency_counter"
+down_revision = "007_add_node_metrics"
+branch_labels = None
+depends_on = None
+
+
+def _column_exists(table_name: str, column_name: str) -> bool:
+    inspector = sa.inspect(op.get_bind())
+    return column_name in {column["name"] for column in inspector.get_columns(table_name)}
+
+
+def _index_exists(table_name: str, index_name: str) -> bool:
+    inspector = sa.inspect(op.get_bind())
+    return index_name in {index["name"] for index in inspector.get_indexes(table_name)}
+
+
+def upgrade() -> None:
+    if not _column_exists("issue", "unmet_dependency_count"):
+        op.add_column(
+            "issue",
+            sa.Column("unmet_dependency_count", sa.Integer(), nullable=False, server_default="0"),
+        )
+        # Backfill from the existing dependency links.
+        op.execute(
+            """
+            UPDATE issue SET unmet_dependency_count = unmet.count
+            FROM (
+                SELECT link.issue_id, count(*) AS count
+                FROM issue_dependency_link AS link
+                JOIN issue AS dependency ON dependency.id = link.depends_on_issue_id
+                WHERE dependency.status <> 'merged'
+                GROUP BY link.issue_id
+            ) AS unmet
+            WHERE issue.id = unmet.issue_id
+            """
+        )
+
+    # CONCURRENTLY avoids blocking writes on large tables but cannot run
+    # inside a transaction block.
+    with op.get_context().autocommit_block():
+        if not _index_exists("issue", "ix_issue_ready_queue"):
+            op.create_index(
+                "ix_issue_ready_queue",
+                "issue",
+                [sa.text("priority DESC"), sa.text("created_at ASC")],
+                postgresql_where=sa.text("status = 'pending' AND unmet_dependency_count = 0"),
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        if _index_exists("issue", "ix_issue_ready_queue"):
+            op.drop_index("ix_issue_ready_queue", table_name="issue", postgresql_concurrently=True)
+    if _column_exists("issue", "unmet_dependency_count"):
+        op.drop_column("issue", "unmet_dependency_count")
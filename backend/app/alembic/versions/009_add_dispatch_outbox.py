@@ -0,0 +1,60 @@
+"""Add dispatch_outbox table for asynchronous task delivery to nodes
+
+Revision ID: 009_add_dispatch_outbox
+Revises: 008_add_issue_dependency_counter
+Create Date: 2026-10-17 20:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "009_add_dispatch_outbox"
+down_revision = "008_add_issue_dependency_counter"
+branch_labels = None
+depends_on = None
+
+
+def _table_exists(table_name: str) -> bool:
+    inspector = sa.inspect(op.get_bind())
+    return table_name in inspector.get_table_names()
+
+
+def upgrade() -> None:
+    if _table_exists("dispatch_outbox"):
+        return
+
+    op.create_table(
+        "dispatch_outbox",
+        sa.Column("id", sa.Uuid(), nullable=False),
+        sa.Column("task_id", sa.Uuid(), nullable=False),
+        sa.Column("node_id", sa.Uuid(), nullable=False),
+        sa.Column("credential_id", sa.Uuid(), nullable=True),
+        sa.Column("path", sa.String(length=255), nullable=False),
+        sa.Column("payload", sa.JSON(), nullable=False),
+        sa.Column("idempotency_key", sa.String(length=64), nullable=False),
+        sa.Column("status", sa.String(length=32), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("next_attempt_at", sa.DateTime(), nullable=False),
+        sa.Column("last_error", sa.String(length=1024), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("delivered_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["task_id"], ["task.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["node_id"], ["node.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["credential_id"], ["credential.id"], ondelete="SET NULL"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("idempotency_key"),
+    )
+    op.create_index(
+        "ix_dispatch_outbox_due",
+        "dispatch_outbox",
+        ["next_attempt_at"],
+        postgresql_where=sa.text("status = 'pending'"),
+    )
+
+
+def downgrade() -> None:
+    if not _table_exists("dispatch_outbox"):
+        return
+
+    op.drop_index("ix_dispatch_outbox_due", table_name="dispatch_outbox")
+    op.drop_table("dispatch_outbox")
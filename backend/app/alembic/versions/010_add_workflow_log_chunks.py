@@ -0,0 +1,57 @@
+"""Store full step output as compressed chunks and link workflow logs to tasks
+
+Revision ID: 010_add_workflow_log_chunks
+Revises: 009_add_dispatch_outbox
+Create Date: 2026-10-17 22:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "010_add_workflow_log_chunks"
+down_revision = "009_add_dispatch_outbox"
+branch_labels = None
+depends_on = None
+
+
+def _table_exists(table_name: str) -> bool:
+    inspector = sa.inspect(op.get_bind())
+    return table_name in inspector.get_table_names()
+
+
+def _column_exists(table_name: str, column_name: str) -> bool:
+    inspector = sa.inspect(op.get_bind())
+    return column_name in {column["name"] for column in inspector.get_columns(table_name)}
+
+
+def upgrade() -> None:
+    if not _column_exists("workflowlog", "task_id"):
+        op.add_column("workflowlog", sa.Column("task_id", sa.Uuid(), nullable=True))
+        op.create_foreign_key(
+            "workflowlog_task_id_fkey", "workflowlog", "task", ["task_id"], ["id"], ondelete="CASCADE"
+        )
+        op.create_index("ix_workflowlog_task_id", "workflowlog", ["task_id"])
+
+    if not _table_exists("workflow_log_chunk"):
+        op.create_table(
+            "workflow_log_chunk",
+            sa.Column("log_id", sa.Uuid(), nullable=False),
+            sa.Column("stream", sa.String(length=16), nullable=False),
+            sa.Column("seq", sa.Integer(), nullable=False),
+            sa.Column("offset", sa.BigInteger(), nullable=False),
+            sa.Column("raw_size", sa.Integer(), nullable=False),
+            sa.Column("codec", sa.String(length=16), nullable=False),
+            sa.Column("data", sa.LargeBinary(), nullable=False),
+            sa.ForeignKeyConstraint(["log_id"], ["workflowlog.id"], ondelete="CASCADE"),
+            sa.PrimaryKeyConstraint("log_id", "stream", "seq"),
+        )
+
+
+def downgrade() -> None:
+    if _table_exists("workflow_log_chunk"):
+        op.drop_table("workflow_log_chunk")
+
+    if _column_exists("workflowlog", "task_id"):
+        op.drop_index("ix_workflowlog_task_id", table_name="workflowlog")
+        op.drop_constraint("workflowlog_task_id_fkey", "workflowlog", type_="foreignkey")
+        op.drop_column("workflowlog", "task_id")
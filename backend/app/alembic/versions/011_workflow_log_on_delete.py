@@ -0,0 +1,49 @@
+"""Cascade workflow logs with their issue and detach them from deleted nodes
+
+Revision ID: 011_workflow_log_on_delete
+Revises: 010_add_workflow_log_chunks
+Create Date: 2026-10-18 10:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "011_workflow_log_on_delete"
+down_revision = "010_add_workflow_log_chunks"
+branch_labels = None
+depends_on = None
+
+# (列, 引用的表, 升级后的 ON DELETE)
+FOREIGN_KEYS = [
+    ("issue_id", "issue", "CASCADE"),
+    ("node_id", "node", "SET NULL"),
+]
+
+
+def _foreign_key(column: str) -> dict | None:
+    inspector = sa.inspect(op.get_bind())
+    for foreign_key in inspector.get_foreign_keys("workflowlog"):
+        if foreign_key["constrained_columns"] == [column]:
+            return foreign_key
+    return None
+
+
+def _recreate(column: str, referred_table: str, ondelete: str | None) -> None:
+    existing = _foreign_key(column)
+    if existing is not None:
+        if (existing.get("options") or {}).get("ondelete") == ondelete:
+            return
+        op.drop_constraint(existing["name"], "workflowlog", type_="foreignkey")
+    op.create_foreign_key(
+        f"workflowlog_{column}_fkey", "workflowlog", referred_table, [column], ["id"], ondelete=ondelete
+    )
+
+
+def upgrade() -> None:
+    for column, referred_table, ondelete in FOREIGN_KEYS:
+        _recreate(column, referred_table, ondelete)
+
+
+def downgrade() -> None:
+    for column, referred_table, _ in FOREIGN_KEYS:
+        _recreate(column, referred_table, None)
@@ -0,0 +1,48 @@
+"""Mark dispatch_outbox entries that must be delivered with a credential
+
+Revision ID: 012_outbox_credential_required
+Revises: 011_workflow_log_on_delete
+Create Date: 2026-10-18 12:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "012_outbox_credential_required"
+down_revision = "011_workflow_log_on_delete"
+branch_labels = None
+depends_on = None
+
+
+def _table_exists(table_name: str) -> bool:
+    inspector = sa.inspect(op.get_bind())
+    return table_name in inspector.get_table_names()
+
+
+def _column_exists(table_name: str, column_name: str) -> bool:
+    if not _table_exists(table_name):
+        return False
+
+    inspector = sa.inspect(op.get_bind())
+    columns = [col["name"] for col in inspector.get_columns(table_name)]
+    return column_name in columns
+
+
+def upgrade() -> None:
+    if not _table_exists("dispatch_outbox") or _column_exists("dispatch_outbox", "credential_required"):
+        return
+
+    op.add_column(
+        "dispatch_outbox",
+        sa.Column("credential_required", sa.Boolean(), nullable=False, server_default=sa.false()),
+    )
+    # 已有记录: 仍带 credential_id 的需要凭证; 已被置空的无法区分, 保持原有行为
+    op.execute(sa.text("UPDATE dispatch_outbox SET credential_required = TRUE WHERE credential_id IS NOT NULL"))
+    op.alter_column("dispatch_outbox", "credential_required", server_default=None)
+
+
+def downgrade() -> None:
+    if not _column_exists("dispatch_outbox", "credential_required"):
+        return
+
+    op.drop_column("dispatch_outbox", "credential_required")
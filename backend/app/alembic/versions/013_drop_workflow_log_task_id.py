@@ -0,0 +1,36 @@
+"""Drop the unused task_id column from workflow logs
+
+Revision ID: 013_drop_workflow_log_task_id
+Revises: 012_outbox_credential_required
+Create Date: 2026-10-18 14:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "013_drop_workflow_log_task_id"
+down_revision = "012_outbox_credential_required"
+branch_labels = None
+depends_on = None
+
+
+def _column_exists(table_name: str, column_name: str) -> bool:
+    inspector = sa.inspect(op.get_bind())
+    return column_name in {column["name"] for column in inspector.get_columns(table_name)}
+
+
+def upgrade() -> None:
+    # 工作流不经过任务记录执行, 该列从未写入
+    if _column_exists("workflowlog", "task_id"):
+        op.drop_index("ix_workflowlog_task_id", table_name="workflowlog")
+        op.drop_constraint("workflowlog_task_id_fkey", "workflowlog", type_="foreignkey")
+        op.drop_column("workflowlog", "task_id")
+
+
+def downgrade() -> None:
+    if not _column_exists("workflowlog", "task_id"):
+        op.add_column("workflowlog", sa.Column("task_id", sa.Uuid(), nullable=True))
+        op.create_foreign_key(
+            "workflowlog_task_id_fkey", "workflowlog", "task", ["task_id"], ["id"], ondelete="CASCADE"
+        )
+        op.create_index("ix_workflowlog_task_id", "workflowlog", ["task_id"])
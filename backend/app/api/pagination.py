@@ -0,0 +1,161 @@
+"""
+列表接口分页
+- offset 模式 (默认): skip/limit, 与之前行为一致
+- cursor 模式: 传入 cursor (第一页传空字符串) 后按排序键做 keyset 分页,
+  响应中的 next_cursor 是不透明字符串, 原样传回即可获取下一页, 翻页深度不影响查询耗时
+count 参数控制总数: exact 精确 COUNT(*), estimate 使用统计信息估算, none 不计算
+"""
+import base64
+import binascii
+import json
+import uuid
+from datetime import datetime
+from collections.abc import Sequence
+from typing import Any, Literal, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import ColumnElement, Select, and_, func, or_, select, text, tuple_
+from sqlmodel import Session
+
+CountMode = Literal["exact", "estimate", "none"]
+
+
+def _encode_value(value: Any) -> Any:
+    # JSON 没有日期和UUID类型, 用单键对象标记, 解码时还原
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, uuid.UUID):
+        return {"uuid": str(value)}
+    return value
+
+
+def _decode_value(raw: Any) -> Any:
+    if isinstance(raw, dict):
+        if "dt" in raw:
+            return datetime.fromisoformat(raw["dt"])
+        if "uuid" in raw:
+            return uuid.UUID(raw["uuid"])
+        raise ValueError("unknown cursor value")
+    return raw
+
+
+def encode_cursor(row: Any, sort_keys: list[ColumnElement[Any]]) -> str:
+    """把一行的排序键编码为不透明游标"""
+    values = [_encode_value(getattr(row, column.key)) for column in sort_keys]
+    payload = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_keys: list[ColumnElement[Any]]) -> tuple:
+    """解析游标, 格式不对时返回400"""
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(payload)
+        if not isinstance(values, list) or len(values) != len(sort_keys):
+            raise ValueError("cursor does not match sort keys")
+        return tuple(_decode_value(raw) for raw in values)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _after_boundary(
+    sort_keys: list[ColumnElement[Any]],
+    values: tuple,
+    directions: list[bool]
+) -> ColumnElement[bool]:
+    """排在游标所指的行之后的条件"""
+    if len(set(directions)) == 1:
+        # 行值比较 (a, b, id) < (...) 可以直接利用同顺序的联合索引
+        boundary, bound = tuple_(*sort_keys), tuple_(*values)
+        return boundary < bound if directions[0] else boundary > bound
+    # 排序方向不一致时展开为 a > x OR (a = x AND (b < y OR (b = y AND ...)))
+    condition = None
+    for column, value, desc in reversed(list(zip(sort_keys, values, directions))):
+        beyond = column < value if desc else column > value
+        condition = beyond if condition is None else or_(beyond, and_(column == value, condition))
+    return condition
+
+
+def paginate(
+    session: Session,
+    statement: Select,
+    sort_keys: list[ColumnElement[Any]],
+    *,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    descending: bool | Sequence[bool] = False
+) -> tuple[list[Any], Optional[str]]:
+    """
+    按 sort_keys 排序并分页, sort_keys 的最后一列必须唯一 (一般是id)
+    :param statement: 已带过滤条件的查询
+    :param cursor: 为None时使用 skip/limit, 否则从游标之后开始 (空字符串表示第一页)
+    :param descending: 所有排序键统一倒序, 或与 sort_keys 一一对应的每一列是否倒序
+    :return: (本页数据, 下一页游标), 没有更多数据或 offset 模式时游标为None
+    """
+    if isinstance(descending, bool):
+        directions = [descending] * len(sort_keys)
+    else:
+        directions = list(descending)
+        if len(directions) != len(sort_keys):
+            raise ValueError("descending must match sort_keys")
+    statement = statement.order_by(
+        *(column.desc() if desc else column.asc() for column, desc in zip(sort_keys, directions))
+    )
+    if cursor is None:
+        rows = session.exec(statement.offset(skip).limit(limit)).all()
+        return list(rows), None
+
+    if cursor:
+        statement = statement.where(
+            _after_boundary(sort_keys, decode_cursor(cursor, sort_keys), directions)
+        )
+
+    # 多取一行判断是否还有下一页
+    rows = list(session.exec(statement.limit(limit + 1)).all())
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1], sort_keys)
+
+
+def count_rows(
+    session: Session,
+    model: Any,
+    filters: list[Any],
+    mode: CountMode = "exact"
+) -> Optional[int]:
+    """
+    统计总数
+    estimate: 无过滤条件时读取 pg_class.reltuples, 有过滤条件时取执行计划的预估行数;
+    表从未 ANALYZE 过 (reltuples < 0) 时退回精确计数
+    """
+    if mode == "none":
+        return None
+
+    count_statement = select(func.count()).select_from(model)
+    for condition in filters:
+        count_statement = count_statement.where(condition)
+
+    if mode == "estimate":
+        if not filters:
+            estimate = session.connection().execute(
+                text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(quote_ident(:table))"),
+                {"table": model.__tablename__},
+            ).scalar()
+        else:
+            rows_statement = select(model.__table__.c.id).where(*filters)
+            compiled = rows_statement.compile(
+                dialect=session.get_bind().dialect,
+                compile_kwargs={"render_postcompile": True},
+            )
+            plan = session.connection().exec_driver_sql(
+                f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params
+            ).scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            estimate = plan[0]["Plan"]["Plan Rows"]
+        if estimate is not None and estimate >= 0:
+            return int(estimate)
+
+    return session.exec(count_statement).one()
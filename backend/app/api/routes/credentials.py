@@ -3,9 +3,10 @@ from typing import Any
 
 from fastapi import APIRouter, HTTPException
 from sqlalchemy.orm import selectinload
-from sqlmodel import func, select
+from sqlmodel import select
 
 from app.api.deps import CurrentUser, SessionDep
+from app.api.pagination import CountMode, count_rows, paginate
 from app.models import (
     Credential,
     CredentialCreate,
@@ -32,41 +33,32 @@ def _resolve_nodes(session: SessionDep, node_ids: list[uuid.UUID]) -> list[Node]
     return nodes
 
 
+CREDENTIAL_SORT_KEYS = [Credential.created_at, Credential.id]
+
+
 @router.get("/", response_model=CredentialsPublic)
 def read_credentials(
-    session: SessionDep, current_user: CurrentUser, skip: int = 0, limit: int = 100
+    session: SessionDep,
+    current_user: CurrentUser,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: str | None = None,
+    count: CountMode = "exact",
 ) -> Any:
     """
     Retrieve credentials.
     """
+    filters: list[Any] = []
+    if not current_user.is_superuser:
+        filters.append(Credential.owner_id == current_user.id)
 
-    if current_user.is_superuser:
-        count_statement = select(func.count()).select_from(Credential)
-        count = session.exec(count_statement).one()
-        statement = (
-            select(Credential)
-            .options(selectinload(Credential.nodes))
-            .offset(skip)
-            .limit(limit)
-        )
-        credentials = session.exec(statement).all()
-    else:
-        count_statement = (
-            select(func.count())
-            .select_from(Credential)
-            .where(Credential.owner_id == current_user.id)
-        )
-        count = session.exec(count_statement).one()
-        statement = (
-            select(Credential)
-            .where(Credential.owner_id == current_user.id)
-            .options(selectinload(Credential.nodes))
-            .offset(skip)
-            .limit(limit)
-        )
-        credentials = session.exec(statement).all()
+    statement = select(Credential).where(*filters).options(selectinload(Credential.nodes))
+    credentials, next_cursor = paginate(
+        session, statement, CREDENTIAL_SORT_KEYS, skip=skip, limit=limit, cursor=cursor
+    )
+    total = count_rows(session, Credential, filters, count)
 
-    return CredentialsPublic(data=credentials, count=count)
+    return CredentialsPublic(data=credentials, count=total, next_cursor=next_cursor)
 
 
 @router.get("/{id}", response_model=CredentialPublic)
@@ -3,34 +3,53 @@ import logging
 from datetime import datetime
 from typing import Any, List
 
-import httpx
-from fastapi import APIRouter, BackgroundTasks, HTTPException
-from sqlalchemy import delete, or_
-from sqlmodel import Session, func, select
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Query
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
 from pydantic import BaseModel
 
 from app.api.deps import CurrentUser, SessionDep
+from app.api.pagination import CountMode, count_rows, paginate
+from app.core.config import settings
 from app.models import Message, Project
 from app.models.issue import (
     Issue,
     IssueCreate,
+    IssueDependencyGraph,
     IssueDependencyLink,
     IssuePublic,
     IssuesPublic,
     IssueUpdate,
 )
 from app.models.task import Task, TaskPublic
+from app.models.workflow_log import WorkflowLog, WorkflowLogOutputPage, WorkflowLogPublic, WorkflowLogsPublic
 from app.models.node import Node
 from app.models.repository import Repository
 from app.services.workflow import WorkflowService
 from app.services.github_sync import GitHubSyncService
-from app.services.node_selection import NodeSelectionService
+from app.services.node_selection import NodeSelectionService, ResourceRequirements
+from app.services.dispatch_outbox import DispatchOutboxService, outbox_dispatcher
+from app.services.issue_claim import IssueClaimService
+from app.services.issue_dependency import (
+    DependencyCycleError,
+    GraphDirection,
+    IssueDependencyService,
+    ready_condition,
+)
+from app.services.search import build_text_search
+from app.services.task_log import LOG_STREAMS, TaskLogStore
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/issues", tags=["issues"])
 
+# 列表排序键, 同时也是 cursor 分页的游标内容
+ISSUE_SORT_KEYS = [Issue.priority, Issue.created_at, Issue.id]
+# 就绪队列按调度顺序: priority 倒序, created_at 与 id 正序
+READY_ISSUE_SORT_DESCENDING = [True, False, False]
+
+
 @router.get("/", response_model=IssuesPublic)
 def read_issues(
     session: SessionDep,
@@ -39,8 +58,13 @@ def read_issues(
     limit: int = 100,
     search: str | None = None,
     project_id: uuid.UUID | None = None,
+    cursor: str | None = None,
+    count: CountMode = "exact",
 ) -> Any:
-    """获取Issue列表"""
+    """
+    获取Issue列表
+    按 priority, created_at 倒序; 传入 cursor 时使用游标分页 (第一页传空字符串)
+    """
     filters: list[Any] = []
     if not current_user.is_superuser:
         filters.append(Issue.owner_id == current_user.id)
@@ -48,30 +72,63 @@ def read_issues(
     if project_id:
         filters.append(Issue.project_id == project_id)
 
+    statement = select(Issue)
+    search = search.strip() if search else None
     if search:
-        normalized = f"%{search.strip()}%"
-        filters.append(
-            or_(
-                Issue.title.ilike(normalized),
-                Issue.content.ilike(normalized),
-                Issue.repository_url.ilike(normalized),
-            )
+        if cursor is not None:
+            raise HTTPException(status_code=400, detail="Cursor pagination does not support search")
+        condition, rank = build_text_search(
+            Issue.__table__.c.search_vector,
+            [Issue.title, Issue.content, Issue.repository_url],
+            search,
         )
+        filters.append(condition)
+        statement = statement.order_by(rank.desc())
 
-    count_statement = select(func.count()).select_from(Issue)
-    statement = (
-        select(Issue)
-        .offset(skip)
-        .limit(limit)
-        .order_by(Issue.priority.desc(), Issue.created_at.desc())
+    for condition in filters:
+        statement = statement.where(condition)
+
+    issues, next_cursor = paginate(
+        session, statement, ISSUE_SORT_KEYS,
+        skip=skip, limit=limit, cursor=cursor, descending=True,
     )
+    total = count_rows(session, Issue, filters, count)
+
+    dependency_map = _get_dependency_map(session, [issue.id for issue in issues])
+    serialized = [
+        IssuePublic(**issue.model_dump(), dependency_issue_ids=dependency_map.get(issue.id, []))
+        for issue in issues
+    ]
+
+    return IssuesPublic(data=serialized, count=total, next_cursor=next_cursor)
+
+
+@router.get("/ready", response_model=IssuesPublic)
+def read_ready_issues(
+    session: SessionDep,
+    current_user: CurrentUser,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: str | None = None,
+    count: CountMode = "exact",
+) -> Any:
+    """
+    获取就绪的Issue: 待处理且依赖都已 merged
+    按调度顺序 (priority 倒序, created_at 正序) 返回; 传入 cursor 时使用游标分页 (第一页传空字符串)
+    """
+    filters: list[Any] = [ready_condition()]
+    if not current_user.is_superuser:
+        filters.append(Issue.owner_id == current_user.id)
 
+    statement = select(Issue)
     for condition in filters:
-        count_statement = count_statement.where(condition)
         statement = statement.where(condition)
 
-    issues = session.exec(statement).all()
-    count = session.exec(count_statement).one()
+    issues, next_cursor = paginate(
+        session, statement, ISSUE_SORT_KEYS,
+        skip=skip, limit=limit, cursor=cursor, descending=READY_ISSUE_SORT_DESCENDING,
+    )
+    total = count_rows(session, Issue, filters, count)
 
     dependency_map = _get_dependency_map(session, [issue.id for issue in issues])
     serialized = [
@@ -79,7 +136,25 @@ def read_issues(
         for issue in issues
     ]
 
-    return IssuesPublic(data=serialized, count=count)
+    return IssuesPublic(data=serialized, count=total, next_cursor=next_cursor)
+
+
+@router.get("/dependency-graph", response_model=IssueDependencyGraph)
+def read_dependency_graph(
+    session: SessionDep,
+    current_user: CurrentUser,
+    issue_ids: List[uuid.UUID] = Query(..., min_length=1),
+    direction: GraphDirection = "both",
+) -> Any:
+    """
+    获取一组Issue的依赖图: 传递的祖先/后代、拓扑顺序和关键路径
+    普通用户只能看到自己的issue
+    """
+    owner_id = None if current_user.is_superuser else current_user.id
+    graph = IssueDependencyService.get_graph(session, issue_ids, direction, owner_id=owner_id)
+    if not any(node.relation == "seed" for node in graph.nodes):
+        raise HTTPException(status_code=404, detail="Issue not found")
+    return graph
 
 
 @router.get("/{id}", response_model=IssuePublic)
@@ -112,7 +187,7 @@ def create_issue(
     )
 
     session.add(issue)
-    session.flush()
+    _flush_issue(session)
     _replace_issue_dependencies(session, issue.id, dependency_ids)
     session.commit()
     session.refresh(issue)
@@ -158,7 +233,7 @@ def update_issue(
     issue.sqlmodel_update(update_dict)
     issue.updated_at = datetime.utcnow()
     session.add(issue)
-    session.flush()
+    _flush_issue(session)
 
     if dependency_set is not None:
         _replace_issue_dependencies(session, issue.id, dependency_set)
@@ -187,18 +262,18 @@ def delete_issue(
 
 @router.get("/pending/next", response_model=IssuePublic)
 def get_next_pending_issue(session: SessionDep, current_user: CurrentUser) -> Any:
-    """获取下一个待处理的Issue（按优先级和创建时间排序）"""
+    """获取下一个就绪的Issue（依赖都已 merged, 按优先级和创建时间排序）"""
     if current_user.is_superuser:
         statement = (
             select(Issue)
-            .where(Issue.status == "pending")
+            .where(ready_condition())
             .order_by(Issue.priority.desc(), Issue.created_at.asc())
             .limit(1)
         )
     else:
         statement = (
             select(Issue)
-            .where(Issue.owner_id == current_user.id, Issue.status == "pending")
+            .where(Issue.owner_id == current_user.id, ready_condition())
             .order_by(Issue.priority.desc(), Issue.created_at.asc())
             .limit(1)
         )
@@ -261,6 +336,7 @@ class GitHubSyncRequest(BaseModel):
     repo_owner: str
     repo_name: str
     labels: List[str] | None = None
+    full_sync: bool = False  # 忽略增量游标, 重新拉取全部issues
 
 
 class GitHubMultiSyncRequest(BaseModel):
@@ -286,7 +362,8 @@ async def sync_github_issues(
             owner_id=current_user.id,
             repo_owner=sync_request.repo_owner,
             repo_name=sync_request.repo_name,
-            labels=sync_request.labels
+            labels=sync_request.labels,
+            full_sync=sync_request.full_sync
         )
         return {"message": "GitHub issues synced successfully", "stats": stats}
     except Exception as e:
@@ -318,6 +395,7 @@ async def sync_multiple_github_repos(
 class StartTaskRequest(BaseModel):
     """启动任务请求模型"""
     command: str | None = None  # 可选的自定义命令
+    requirements: ResourceRequirements | None = None  # 可选的资源需求, 大仓库可要求更多内存/磁盘
 
 
 @router.post("/{id}/start", response_model=TaskPublic)
@@ -333,8 +411,8 @@ async def start_issue_task(
     1. 查询issue和关联的仓库
     2. 自动选择空闲的node
     3. 查询node可用凭证
-    4. 创建任务记录
-    5. 下发任务给node处理
+    4. 创建任务记录, 同一事务写入下发发件箱
+    5. 后台投递器下发任务给node处理, 接口不等待node响应
     """
     logger.info(f"Starting task for issue {id} by user {current_user.id}")
 
@@ -346,8 +424,9 @@ async def start_issue_task(
     if not current_user.is_superuser and (issue.owner_id != current_user.id):
         raise HTTPException(status_code=403, detail="Not enough permissions")
 
-    # 检查issue状态
-    if issue.status == "processing":
+    # 加行锁认领issue, 防止多个worker同时启动同一个issue
+    issue = IssueClaimService.lock_issue(session, id)
+    if not issue or issue.status == "processing":
         raise HTTPException(status_code=400, detail="Issue is already being processed")
 
     # 查询关联的仓库
@@ -355,7 +434,11 @@ async def start_issue_task(
         raise HTTPException(status_code=400, detail="Issue has no associated repository")
     
     # 自动选择空闲的node
-    node = NodeSelectionService.select_best_node(session)
+    node = NodeSelectionService.select_best_node(
+        session,
+        strategy=settings.NODE_SELECTION_STRATEGY,
+        requirements=request.requirements if request else None,
+    )
     if not node:
         raise HTTPException(status_code=503, detail="No available node found")
     
@@ -363,7 +446,7 @@ async def start_issue_task(
     if not node.credentials or len(node.credentials) == 0:
         raise HTTPException(status_code=400, detail=f"Node {node.name} has no available credentials")
     
-    # 使用第一个可用凭证
+    # 使用第一个可用凭证, 密钥在投递时读取
     credential = node.credentials[0]
     
     # 更新issue状态为processing
@@ -384,40 +467,21 @@ async def start_issue_task(
         started_at=datetime.utcnow()
     )
     session.add(task)
+    
+    # 下发请求写入发件箱, 与任务在同一个事务中提交, 由后台投递器异步下发给node
+    payload = {
+        "issue_id": str(issue.id),
+        "task_id": str(task.id),
+        "repository_url": issue.repository_url,
+        "issue_number": issue.issue_number,
+        "issue_title": issue.title,
+        "issue_content": issue.content,
+        "command": command
+    }
+    DispatchOutboxService.enqueue(session, task, payload, credential_id=credential.id)
     session.commit()
     session.refresh(task)
-    
-    # 异步下发任务给node
-    try:
-        # 构造下发给node的请求数据
-        node_url = f"http://{node.ip}:8007/process-issue"
-        payload = {
-            "issue_id": str(issue.id),
-            "task_id": str(task.id),
-            "repository_url": issue.repository_url,
-            "issue_number": issue.issue_number,
-            "issue_title": issue.title,
-            "issue_content": issue.content,
-            "credential_token": credential.token,
-            "command": command
-        }
-        
-        # 发送HTTP请求到node
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(node_url, json=payload)
-            response.raise_for_status()
-            
-    except Exception as e:
-        # 如果下发失败,更新任务和issue状态
-        task.status = "failed"
-        task.error_message = str(e)
-        task.completed_at = datetime.utcnow()
-        issue.status = "terminated"
-        issue.error_message = str(e)
-        session.add(task)
-        session.add(issue)
-        session.commit()
-        raise HTTPException(status_code=500, detail=f"Failed to dispatch task to node: {str(e)}")
+    outbox_dispatcher.notify()
     
     return TaskPublic(**task.model_dump())
 
@@ -481,6 +545,61 @@ async def report_branch(
     return Message(message=f"Branch {request.branch_name} reported successfully")
 
 
+@router.get("/{id}/logs", response_model=WorkflowLogsPublic)
+def read_issue_logs(
+    session: SessionDep,
+    current_user: CurrentUser,
+    id: uuid.UUID,
+) -> Any:
+    """获取Issue各步骤的执行日志 (状态、耗时和输出摘要), 完整输出通过 /logs/{log_id}/output 分页读取"""
+    _get_accessible_issue(session, current_user, id)
+
+    logs = session.exec(
+        select(WorkflowLog).where(WorkflowLog.issue_id == id).order_by(WorkflowLog.created_at.asc())
+    ).all()
+
+    sizes = TaskLogStore.sizes(session, [log.id for log in logs])
+    data = [
+        WorkflowLogPublic(
+            **log.model_dump(),
+            stdout_size=sizes.get((log.id, "stdout"), 0),
+            stderr_size=sizes.get((log.id, "stderr"), 0),
+        )
+        for log in logs
+    ]
+    return WorkflowLogsPublic(data=data, count=len(data))
+
+
+@router.get("/{id}/logs/{log_id}/output", response_model=WorkflowLogOutputPage)
+def read_issue_log_output(
+    session: SessionDep,
+    current_user: CurrentUser,
+    id: uuid.UUID,
+    log_id: uuid.UUID,
+    stream: str = "stdout",
+    offset: int = Query(default=0, ge=0),
+    limit: int = Query(default=settings.TASK_LOG_CHUNK_BYTES, ge=1, le=16 * settings.TASK_LOG_CHUNK_BYTES),
+) -> Any:
+    """按字节范围读取步骤的完整输出, 从返回的 next_offset 继续读取下一页"""
+    _get_accessible_issue(session, current_user, id)
+    if stream not in LOG_STREAMS:
+        raise HTTPException(status_code=400, detail=f"Unknown log stream: {stream}")
+
+    log = session.get(WorkflowLog, log_id)
+    if not log or log.issue_id != id:
+        raise HTTPException(status_code=404, detail="Log not found")
+    return TaskLogStore.read(session, log_id, stream, offset, limit)
+
+
+def _get_accessible_issue(session: Session, current_user: CurrentUser, issue_id: uuid.UUID) -> Issue:
+    issue = session.get(Issue, issue_id)
+    if not issue:
+        raise HTTPException(status_code=404, detail="Issue not found")
+    if not current_user.is_superuser and (issue.owner_id != current_user.id):
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    return issue
+
+
 def _get_dependency_map(session: Session, issue_ids: list[uuid.UUID]) -> dict[uuid.UUID, list[uuid.UUID]]:
     if not issue_ids:
         return {}
@@ -499,16 +618,24 @@ def _replace_issue_dependencies(
     issue_id: uuid.UUID,
     dependency_ids: set[uuid.UUID],
 ) -> None:
-    session.exec(
-        delete(IssueDependencyLink).where(IssueDependencyLink.issue_id == issue_id)
-    )
+    try:
+        IssueDependencyService.set_dependencies(session, issue_id, dependency_ids)
+    except DependencyCycleError as e:
+        session.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
 
-    if dependency_ids:
-        session.add_all(
-            [
-                IssueDependencyLink(issue_id=issue_id, depends_on_issue_id=dep_id)
-                for dep_id in dependency_ids
-            ]
+
+def _flush_issue(session: Session) -> None:
+    """写入Issue, 同一仓库的 issue_number 重复时返回409而不是500"""
+    try:
+        session.flush()
+    except IntegrityError as e:
+        session.rollback()
+        if "uq_issue_repository_url_issue_number" not in str(e.orig):
+            raise
+        raise HTTPException(
+            status_code=409,
+            detail="Issue with this repository_url and issue_number already exists",
         )
 
 
@@ -1,30 +1,55 @@
 import uuid
+from collections.abc import AsyncIterator
 from typing import Any
 from datetime import datetime
 import httpx
-from fastapi import APIRouter, HTTPException
-from sqlmodel import select, func
+from fastapi import APIRouter, Header, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from sqlmodel import select
 
 from app.api.deps import CurrentUser, SessionDep
+from app.api.pagination import CountMode, count_rows, paginate
 from app.models import Node, NodeCreate, NodePublic, NodesPublic, NodeUpdate, Message
 from app.models.node import NodeRegister, NodeHeartbeat, RegistrationKeyPublic
 from app.models.register_key import RegisterKey
-from app.models.command import CommandRequest, CommandResponse
+from app.models.command import (
+    CommandBatchRequest,
+    CommandBatchResponse,
+    CommandOutputChunk,
+    CommandRequest,
+    CommandResponse,
+    CommandStreamRequest,
+)
 from app.core.config import settings
+from app.services.command_stream import CommandStream, command_streams
+from app.services.heartbeat import METRIC_FIELDS, heartbeat_registry
+from app.services.node_rpc import node_rpc
 
 router = APIRouter(prefix="/nodes", tags=["nodes"])
 
+NODE_SORT_KEYS = [Node.created_at, Node.id]
+
+
 @router.get("/", response_model=NodesPublic)
-def read_nodes(session: SessionDep, current_user: CurrentUser, skip: int = 0, limit: int = 100) -> Any:
+def read_nodes(
+    session: SessionDep,
+    current_user: CurrentUser,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: str | None = None,
+    count: CountMode = "exact",
+) -> Any:
     """Retrieve nodes. (目前仅超级管理员可见)"""
     if not current_user.is_superuser:
         # 非超级用户返回空集合，亦可选择抛出 403
         return NodesPublic(data=[], count=0)
-    count_statement = select(func.count()).select_from(Node)
-    count = session.exec(count_statement).one()
-    statement = select(Node).offset(skip).limit(limit)
-    nodes = session.exec(statement).all()
-    return NodesPublic(data=[NodePublic(**n.model_dump()) for n in nodes], count=count)
+    nodes, next_cursor = paginate(
+        session, select(Node), NODE_SORT_KEYS, skip=skip, limit=limit, cursor=cursor
+    )
+    total = count_rows(session, Node, [], count)
+    return NodesPublic(
+        data=[NodePublic(**n.model_dump()) for n in nodes], count=total, next_cursor=next_cursor
+    )
 
 @router.post("/", response_model=NodePublic)
 def create_node(session: SessionDep, current_user: CurrentUser, node_in: NodeCreate) -> Any:
@@ -82,6 +107,7 @@ def rotate_registration_key(session: SessionDep, current_user: CurrentUser) -> A
     db_key_obj.rotate()
     session.add(db_key_obj)
     session.commit()
+    heartbeat_registry.invalidate_register_key()
     # 重新生成 docker 命令并替换旧密钥
     backend_url = settings.FRONTEND_HOST.replace("5173", "8000")
     docker_command = f"""docker run -d \
@@ -141,23 +167,23 @@ def register_node(session: SessionDep, node_in: NodeRegister) -> Any:
 
 @router.post("/heartbeat")
 def node_heartbeat(session: SessionDep, heartbeat: NodeHeartbeat) -> Message:
-    """从节点心跳接口 (无需认证, 通过 register_key 验证)."""
-    db_key_obj = session.get(RegisterKey, 1)
-    if not db_key_obj:
+    """
+    从节点心跳接口 (无需认证, 通过 register_key 验证).
+    心跳只记录在内存中, 由后台线程批量写回 last_heartbeat 并将节点置为 online;
+    注册密钥和节点是否存在都有内存缓存, 正常情况下不访问数据库.
+    附带的资源指标 (CPU/负载/内存/磁盘/运行任务数) 随心跳一起写回 node_metrics.
+    """
+    key_valid = heartbeat_registry.check_register_key(session, heartbeat.register_key)
+    if key_valid is None:
         raise HTTPException(status_code=503, detail="Registration key not ready; please fetch /nodes/registration-key first")
-    if heartbeat.register_key != db_key_obj.key:
+    if not key_valid:
         raise HTTPException(status_code=401, detail="Invalid register key")
 
-    node = session.get(Node, heartbeat.node_id)
-    if not node:
+    if not heartbeat_registry.is_known_node(session, heartbeat.node_id):
         raise HTTPException(status_code=404, detail="Node not found")
 
-    node.last_heartbeat = datetime.utcnow()
-    # 心跳不再携带状态字段，默认保持原状态或置为 online
-    if node.status != "online":
-        node.status = "online"
-    session.add(node)
-    session.commit()
+    metrics = heartbeat.model_dump(include=set(METRIC_FIELDS), exclude_none=True)
+    heartbeat_registry.record(heartbeat.node_id, metrics=metrics)
     return Message(message="Heartbeat received")
 
 @router.get("/{id}", response_model=NodePublic)
@@ -196,6 +222,7 @@ def delete_node(session: SessionDep, current_user: CurrentUser, id: uuid.UUID) -
         raise HTTPException(status_code=403, detail="Not enough permissions")
     session.delete(node)
     session.commit()
+    heartbeat_registry.forget(id)
     return Message(message="Node deleted successfully")
 
 
@@ -217,18 +244,113 @@ async def execute_command_on_node(
     if node.status != "online":
         raise HTTPException(status_code=400, detail="Node is not online")
     
-    # 构造从节点的执行URL
-    node_url = f"http://{node.ip}:8007/execute"
-    
     try:
-        async with httpx.AsyncClient(timeout=300.0) as client:
-            response = await client.post(
-                node_url,
-                json=command_req.model_dump()
-            )
-            response.raise_for_status()
-            return CommandResponse(**response.json())
+        return await node_rpc.execute(node, command_req)
     except httpx.HTTPError as e:
         raise HTTPException(status_code=500, detail=f"Failed to execute command on node: {str(e)}")
 
 
+@router.post("/{id}/execute/batch", response_model=CommandBatchResponse)
+async def execute_batch_on_node(
+    session: SessionDep,
+    current_user: CurrentUser,
+    id: uuid.UUID,
+    batch_req: CommandBatchRequest
+) -> Any:
+    """在指定节点上按顺序批量执行命令, 返回每一步的结果和耗时"""
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    
+    node = session.get(Node, id)
+    if not node:
+        raise HTTPException(status_code=404, detail="Node not found")
+    
+    if node.status != "online":
+        raise HTTPException(status_code=400, detail="Node is not online")
+    
+    try:
+        return await node_rpc.execute_batch(node, batch_req)
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=500, detail=f"Failed to execute commands on node: {str(e)}")
+
+
+@router.post("/{id}/execute/stream")
+async def execute_stream_on_node(
+    session: SessionDep,
+    current_user: CurrentUser,
+    id: uuid.UUID,
+    command_req: CommandStreamRequest,
+    request: Request,
+) -> StreamingResponse:
+    """
+    在指定节点上执行命令并实时返回输出
+    默认返回 NDJSON (每行一个 CommandOutputChunk), Accept 为 text/event-stream 时返回 SSE;
+    响应头 X-Stream-Id 可用于其它客户端订阅同一个输出流
+    """
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+
+    node = session.get(Node, id)
+    if not node:
+        raise HTTPException(status_code=404, detail="Node not found")
+
+    if node.status != "online":
+        raise HTTPException(status_code=400, detail="Node is not online")
+
+    # 输出可能持续很久, 不在整个响应期间占用数据库连接
+    session.expunge(node)
+    session.close()
+
+    cmd_request = CommandRequest(**command_req.model_dump(exclude={"stream_id"}))
+    try:
+        stream = command_streams.start(
+            node_rpc.execute_stream(node, cmd_request),
+            stream_id=command_req.stream_id,
+            node_id=node.id,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return _stream_response(stream, 0, request)
+
+
+@router.get("/{id}/execute/stream/{stream_id}")
+async def subscribe_command_stream(
+    current_user: CurrentUser,
+    id: uuid.UUID,
+    stream_id: str,
+    request: Request,
+    from_seq: int = 0,
+    last_event_id: int | None = Header(default=None),
+) -> StreamingResponse:
+    """
+    订阅正在执行 (或刚结束) 的命令输出, 先回放缓冲区中的输出再接收实时输出
+    SSE 重连时按 Last-Event-ID 从下一段继续
+    """
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+
+    stream = command_streams.get(stream_id)
+    if not stream or stream.node_id != id:
+        raise HTTPException(status_code=404, detail="Command stream not found")
+
+    if last_event_id is not None:
+        from_seq = last_event_id + 1
+    return _stream_response(stream, from_seq, request)
+
+
+def _stream_response(stream: CommandStream, from_seq: int, request: Request) -> StreamingResponse:
+    """按 Accept 头把输出流编码为 SSE 或 NDJSON"""
+    sse = "text/event-stream" in request.headers.get("accept", "")
+
+    async def _encode(chunks: AsyncIterator[CommandOutputChunk]) -> AsyncIterator[str]:
+        async for chunk in chunks:
+            if sse:
+                yield f"id: {chunk.seq}\nevent: {chunk.stream}\ndata: {chunk.model_dump_json()}\n\n"
+            else:
+                yield chunk.model_dump_json() + "\n"
+
+    return StreamingResponse(
+        _encode(stream.subscribe(from_seq)),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={"X-Stream-Id": stream.stream_id, "Cache-Control": "no-cache"},
+    )
@@ -2,16 +2,20 @@ import uuid
 from typing import Any
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import or_
-from sqlmodel import Session, func, select
+from sqlmodel import Session, select
 
 from app.api.deps import CurrentUser, SessionDep
+from app.api.pagination import CountMode, count_rows, paginate
 from app.models import Project, ProjectCreate, ProjectPublic, ProjectsPublic, ProjectUpdate, Message
 from app.models import Repository
+from app.services.search import build_text_search
 
 router = APIRouter(prefix="/projects", tags=["projects"])
 
 
+PROJECT_SORT_KEYS = [Project.created_at, Project.id]
+
+
 @router.get("/", response_model=ProjectsPublic)
 def read_projects(
     session: SessionDep,
@@ -19,6 +23,8 @@ def read_projects(
     skip: int = 0,
     limit: int = 100,
     search: str | None = None,
+    cursor: str | None = None,
+    count: CountMode = "exact",
 ) -> Any:
     """
     Retrieve projects.
@@ -27,26 +33,29 @@ def read_projects(
     if not current_user.is_superuser:
         filters.append(Project.owner_id == current_user.id)
 
+    statement = select(Project)
+
+    search = search.strip() if search else None
     if search:
-        normalized = f"%{search.strip()}%"
-        filters.append(
-            or_(
-                Project.name.ilike(normalized),
-                Project.description.ilike(normalized),
-            )
+        if cursor is not None:
+            raise HTTPException(status_code=400, detail="Cursor pagination does not support search")
+        condition, rank = build_text_search(
+            Project.__table__.c.search_vector,
+            [Project.name, Project.description],
+            search,
         )
-
-    count_statement = select(func.count()).select_from(Project)
-    statement = select(Project).offset(skip).limit(limit)
+        filters.append(condition)
+        statement = statement.order_by(rank.desc())
 
     for condition in filters:
-        count_statement = count_statement.where(condition)
         statement = statement.where(condition)
 
-    projects = session.exec(statement).all()
-    count = session.exec(count_statement).one()
+    projects, next_cursor = paginate(
+        session, statement, PROJECT_SORT_KEYS, skip=skip, limit=limit, cursor=cursor
+    )
+    total = count_rows(session, Project, filters, count)
 
-    return ProjectsPublic(data=projects, count=count)
+    return ProjectsPublic(data=projects, count=total, next_cursor=next_cursor)
 
 
 @router.get("/{id}", response_model=ProjectPublic)
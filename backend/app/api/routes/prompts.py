@@ -2,43 +2,41 @@ import uuid
 from typing import Any
 
 from fastapi import APIRouter, HTTPException
-from sqlmodel import func, select
+from sqlmodel import select
 
 from app.api.deps import CurrentUser, SessionDep
+from app.api.pagination import CountMode, count_rows, paginate
 from app.models import Prompt, PromptCreate, PromptPublic, PromptsPublic, PromptUpdate, Message
 
 router = APIRouter(prefix="/prompts", tags=["prompts"])
 
 
+PROMPT_SORT_KEYS = [Prompt.created_at, Prompt.id]
+
+
 @router.get("/", response_model=PromptsPublic)
 def read_prompts(
-    session: SessionDep, current_user: CurrentUser, skip: int = 0, limit: int = 100
+    session: SessionDep,
+    current_user: CurrentUser,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: str | None = None,
+    count: CountMode = "exact",
 ) -> Any:
     """
     Retrieve prompts.
     """
+    filters: list[Any] = []
+    if not current_user.is_superuser:
+        filters.append(Prompt.owner_id == current_user.id)
+
+    prompts, next_cursor = paginate(
+        session, select(Prompt).where(*filters), PROMPT_SORT_KEYS,
+        skip=skip, limit=limit, cursor=cursor,
+    )
+    total = count_rows(session, Prompt, filters, count)
 
-    if current_user.is_superuser:
-        count_statement = select(func.count()).select_from(Prompt)
-        count = session.exec(count_statement).one()
-        statement = select(Prompt).offset(skip).limit(limit)
-        prompts = session.exec(statement).all()
-    else:
-        count_statement = (
-            select(func.count())
-            .select_from(Prompt)
-            .where(Prompt.owner_id == current_user.id)
-        )
-        count = session.exec(count_statement).one()
-        statement = (
-            select(Prompt)
-            .where(Prompt.owner_id == current_user.id)
-            .offset(skip)
-            .limit(limit)
-        )
-        prompts = session.exec(statement).all()
-
-    return PromptsPublic(data=prompts, count=count)
+    return PromptsPublic(data=prompts, count=total, next_cursor=next_cursor)
 
 
 @router.get("/{id}", response_model=PromptPublic)
@@ -2,43 +2,41 @@ import uuid
 from typing import Any
 
 from fastapi import APIRouter, HTTPException
-from sqlmodel import func, select
+from sqlmodel import select
 
 from app.api.deps import CurrentUser, SessionDep
+from app.api.pagination import CountMode, count_rows, paginate
 from app.models import Repository, RepositoryCreate, RepositoryPublic, RepositoriesPublic, RepositoryUpdate, Message
 
 router = APIRouter(prefix="/repositories", tags=["repositories"])
 
 
+REPOSITORY_SORT_KEYS = [Repository.created_at, Repository.id]
+
+
 @router.get("/", response_model=RepositoriesPublic)
 def read_repositories(
-    session: SessionDep, current_user: CurrentUser, skip: int = 0, limit: int = 100
+    session: SessionDep,
+    current_user: CurrentUser,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: str | None = None,
+    count: CountMode = "exact",
 ) -> Any:
     """
     Retrieve repositories.
     """
+    filters: list[Any] = []
+    if not current_user.is_superuser:
+        filters.append(Repository.owner_id == current_user.id)
+
+    repositories, next_cursor = paginate(
+        session, select(Repository).where(*filters), REPOSITORY_SORT_KEYS,
+        skip=skip, limit=limit, cursor=cursor,
+    )
+    total = count_rows(session, Repository, filters, count)
 
-    if current_user.is_superuser:
-        count_statement = select(func.count()).select_from(Repository)
-        count = session.exec(count_statement).one()
-        statement = select(Repository).offset(skip).limit(limit)
-        repositories = session.exec(statement).all()
-    else:
-        count_statement = (
-            select(func.count())
-            .select_from(Repository)
-            .where(Repository.owner_id == current_user.id)
-        )
-        count = session.exec(count_statement).one()
-        statement = (
-            select(Repository)
-            .where(Repository.owner_id == current_user.id)
-            .offset(skip)
-            .limit(limit)
-        )
-        repositories = session.exec(statement).all()
-
-    return RepositoriesPublic(data=repositories, count=count)
+    return RepositoriesPublic(data=repositories, count=total, next_cursor=next_cursor)
 
 
 @router.get("/{id}", response_model=RepositoryPublic)
@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends
 from pydantic.networks import EmailStr
 
-from app.api.deps import get_current_active_superuser
+from app.api.deps import SessionDep, get_current_active_superuser
 from app.models import Message
+from app.services.leader import LeaderStatus, get_leader_status
 from app.utils import generate_test_email, send_email
 
 router = APIRouter(prefix="/utils", tags=["utils"])
@@ -29,3 +30,15 @@ def test_email(email_to: EmailStr) -> Message:
 @router.get("/health-check/")
 async def health_check() -> bool:
     return True
+
+
+@router.get(
+    "/leaders/",
+    dependencies=[Depends(get_current_active_superuser)],
+    response_model=list[LeaderStatus],
+)
+def read_leaders(session: SessionDep) -> list[LeaderStatus]:
+    """
+    Show which process currently runs each periodic background job.
+    """
+    return get_leader_status(session.connection())
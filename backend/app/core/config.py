@@ -37,6 +37,62 @@ class Settings(BaseSettings):
     # 节点状态离线检测配置
     NODE_OFFLINE_CHECK_INTERVAL_SECONDS: int = 30  # 后台线程检查间隔
     NODE_OFFLINE_THRESHOLD_SECONDS: int = 30       # 最近心跳超过该秒数则置为 offline
+    # 心跳写回配置 (心跳先记录在内存, 定期批量写回数据库)
+    HEARTBEAT_FLUSH_INTERVAL_SECONDS: float = 5.0  # 批量写回间隔, 需小于离线阈值
+    HEARTBEAT_KEY_CACHE_SECONDS: float = 10.0      # 注册密钥的缓存时间, 也是轮换后其它进程仍接受旧密钥的最长时间
+    HEARTBEAT_NODE_CACHE_SECONDS: float = 60.0     # 已确认存在的节点的缓存时间, 也是节点删除后其它进程仍接受其心跳的最长时间
+    # 周期任务选主配置 (Postgres advisory lock)
+    LEADER_ELECTION_RETRY_SECONDS: float = 15.0    # 非 leader 进程尝试接管的间隔
+    # 节点RPC客户端配置 (应用级共享, 每个节点一个长连接池)
+    NODE_AGENT_PORT: int = 8007                        # 从节点 agent 监听端口
+    NODE_RPC_TIMEOUT_SECONDS: float = 300.0            # 命令执行默认超时
+    NODE_RPC_DISPATCH_TIMEOUT_SECONDS: float = 30.0    # 任务下发超时
+    NODE_RPC_CONNECT_TIMEOUT_SECONDS: float = 5.0      # 建连超时
+    NODE_RPC_MAX_CONNECTIONS_PER_NODE: int = 20        # 单节点最大并发连接
+    NODE_RPC_MAX_KEEPALIVE_PER_NODE: int = 10          # 单节点保持的空闲连接
+    NODE_RPC_KEEPALIVE_EXPIRY_SECONDS: float = 60.0    # 空闲连接存活时间
+    NODE_RPC_HTTP2: bool = True                        # 安装了 h2 且节点支持时启用 HTTP/2
+    # 命令输出流配置 (节点逐段返回输出, 每个输出流一个有界环形缓冲区)
+    COMMAND_STREAM_BUFFER_CHUNKS: int = 2000         # 缓冲区最多保留的输出段数
+    COMMAND_STREAM_BUFFER_BYTES: int = 1024 * 1024   # 缓冲区最多保留的字符数
+    COMMAND_STREAM_STALL_SECONDS: float = 5.0        # 缓冲区满时等待慢订阅者的时间, 超时后丢弃最旧的输出
+    COMMAND_STREAM_RETENTION_SECONDS: float = 300.0  # 命令结束后输出流保留的时间, 供晚加入的订阅者读取
+    # 节点仓库缓存配置 (每个仓库一个 bare 镜像, 新工作空间以镜像为 --reference 克隆)
+    REPOSITORY_CACHE_ENABLED: bool = True
+    REPOSITORY_CACHE_DIR: str = "/workspace/.mirrors"   # 节点上的镜像目录
+    REPOSITORY_CACHE_LOCK_TIMEOUT_SECONDS: int = 600    # 等待其它任务刷新同一镜像的最长时间
+    # 任务日志存储配置 (步骤完整输出按固定大小分段压缩)
+    TASK_LOG_CHUNK_BYTES: int = 64 * 1024         # 每段未压缩的字节数, 也是默认的分页大小
+    TASK_LOG_CODEC: Literal["gzip", "zstd"] = "gzip"  # zstd 需要安装 zstandard, 未安装时使用 gzip
+    # 任务下发发件箱配置 (下发请求与任务同事务写入, 后台批量投递)
+    OUTBOX_POLL_INTERVAL_SECONDS: float = 1.0  # 没有新记录通知时的轮询间隔
+    OUTBOX_BATCH_SIZE: int = 50                # 每批投递的最大记录数
+    OUTBOX_MAX_ATTEMPTS: int = 8               # 超过该次数后任务置为失败
+    OUTBOX_RETRY_BASE_SECONDS: float = 2.0     # 指数退避的初始间隔
+    OUTBOX_RETRY_MAX_SECONDS: float = 300.0    # 指数退避的最大间隔
+    # 节点选择策略: least_loaded / weighted (结合心跳上报的资源指标打分) /
+    # weighted_round_robin / power_of_two / tag_affinity, 可先用 scripts/simulate_scheduling.py 比较
+    NODE_SELECTION_STRATEGY: Literal[
+        "least_loaded", "weighted", "weighted_round_robin", "power_of_two", "tag_affinity"
+    ] = "weighted"  # 手动启动任务
+    SCHEDULER_SELECTION_STRATEGY: Literal[
+        "least_loaded", "weighted", "weighted_round_robin", "power_of_two", "tag_affinity"
+    ] = "least_loaded"  # 自动处理时批量分配pending issues
+    # 自动处理调度配置
+    SCHEDULER_MAX_CONCURRENT_RUNS: int = 20            # 同时运行的工作流总数上限
+    SCHEDULER_MAX_RUNS_PER_NODE: int = 2               # 单节点同时运行的工作流上限
+    SCHEDULER_RUN_TIMEOUT_SECONDS: float = 3600.0      # 单个工作流运行超时
+    # GitHub同步配置
+    GITHUB_SYNC_CONCURRENCY: int = 8                   # 多仓库同步时并发同步的仓库数
+    GITHUB_SYNC_TIMEOUT_SECONDS: float = 30.0          # 单次 GitHub API 请求超时
+    GITHUB_RATE_LIMIT_MIN_REMAINING: int = 100         # 剩余配额低于该值时开始放慢请求
+    GITHUB_RATE_LIMIT_MAX_WAIT_SECONDS: float = 900.0  # 单次限流等待上限
+    GITHUB_RATE_LIMIT_MAX_RETRIES: int = 3             # 被限流 (403/429) 后的最大重试次数
+    # Dashboard快照配置
+    DASHBOARD_SNAPSHOT_INTERVAL_SECONDS: float = 10.0     # 没有变更事件时快照的最长缓存时间
+    DASHBOARD_SNAPSHOT_MIN_INTERVAL_SECONDS: float = 1.0  # 收到变更事件后两次重算的最小间隔
+    DASHBOARD_STREAM_POLL_SECONDS: float = 1.0            # SSE 推送检查快照的间隔
+    DASHBOARD_STREAM_KEEPALIVE_SECONDS: float = 15.0      # SSE 无变化时发送心跳注释的间隔
     # 60 minutes * 24 hours * 8 days = 8 days
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8
     FRONTEND_HOST: str = "http://localhost:5173"
@@ -5,7 +5,12 @@ from starlette.middleware.cors import CORSMiddleware
 
 from app.api.main import api_router
 from app.core.config import settings
+from app.services.command_stream import command_streams
+from app.services.dispatch_outbox import outbox_dispatcher
+from app.services.heartbeat import start_heartbeat_flusher, stop_heartbeat_flusher
+from app.services.leader import release_all
 from app.services.node_monitor import start_node_monitor
+from app.services.node_rpc import node_rpc
 
 
 def custom_generate_unique_id(route: APIRoute) -> str:
@@ -35,5 +40,19 @@ app.include_router(api_router, prefix=settings.API_V1_STR)
 
 
 @app.on_event("startup")
-def _startup() -> None:
+async def _startup() -> None:
+    start_heartbeat_flusher()
     start_node_monitor()
+    outbox_dispatcher.start()
+
+
+@app.on_event("shutdown")
+async def _shutdown() -> None:
+    # 未投递的下发记录留在发件箱中, 由其它进程或重启后继续投递
+    await outbox_dispatcher.stop()
+    # 写回内存中尚未落库的心跳
+    stop_heartbeat_flusher()
+    # 释放周期任务的锁, 其它进程立即接管
+    release_all()
+    await command_streams.aclose()
+    await node_rpc.aclose()
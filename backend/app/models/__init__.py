@@ -11,5 +11,7 @@ from app.models.credential import *
 from app.models.prompt import *
 from app.models.task import *
 from app.models.register_key import *
+from app.models.workflow_log import *
+from app.models.dispatch_outbox import *
 
 __all__ = ["SQLModel"]
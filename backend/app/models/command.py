@@ -17,3 +17,39 @@ class CommandResponse(BaseModel):
     stdout: str
     stderr: str
     error_message: str | None = None
+
+
+class CommandStepResult(CommandResponse):
+    """批量执行中单个步骤的结果"""
+    duration_ms: int | None = None
+    skipped: bool = False  # 前序步骤失败后未执行
+
+
+class CommandBatchRequest(BaseModel):
+    """批量命令执行请求, 按顺序在同一个请求中执行"""
+    steps: List[CommandRequest]
+    stop_on_failure: bool = True  # 某一步退出码非0时跳过后续步骤
+
+
+class CommandBatchResponse(BaseModel):
+    """批量命令执行响应"""
+    steps: List[CommandStepResult] = []
+    success: bool
+    duration_ms: int | None = None
+
+
+class CommandStreamRequest(CommandRequest):
+    """流式命令执行请求"""
+    stream_id: str | None = None  # 为空时自动生成, 其它客户端可用它订阅同一个输出流
+
+
+class CommandOutputChunk(BaseModel):
+    """
+    流式执行的一段输出, 节点按行发送 NDJSON
+    stream: stdout/stderr 为输出, exit 为结束 (带 exit_code), error 为执行出错,
+    gap 表示订阅者落后太多, 有 data 中所述数量的输出已从缓冲区丢弃
+    """
+    seq: int = 0  # 在输出流中的序号, 由后端分配
+    stream: str = "stdout"
+    data: str = ""
+    exit_code: int | None = None
@@ -67,4 +67,5 @@ class CredentialsPublic(SQLModel):
     model_config = ConfigDict(from_attributes=True)
 
     data: list[CredentialPublic]
-    count: int
+    count: int | None  # count=none 时为空
+    next_cursor: str | None = None  # cursor 分页时下一页的游标
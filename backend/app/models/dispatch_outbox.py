@@ -0,0 +1,41 @@
+import uuid
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import JSON, Column, Index
+from sqlmodel import Field, SQLModel
+
+
+class DispatchOutbox(SQLModel, table=True):
+    """
+    任务下发发件箱
+    与任务记录在同一个事务中写入, 由 DispatchOutboxService 的后台投递器异步下发给节点,
+    进程在提交和下发之间崩溃时, 未投递的记录在租约过期后会被重新投递
+    """
+    __tablename__ = "dispatch_outbox"
+
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    task_id: uuid.UUID = Field(foreign_key="task.id", nullable=False, ondelete="CASCADE")
+    node_id: uuid.UUID = Field(foreign_key="node.id", nullable=False, ondelete="CASCADE")
+    # 投递时才读取凭证, 密钥不落在发件箱中
+    credential_id: uuid.UUID | None = Field(default=None, foreign_key="credential.id", ondelete="SET NULL")
+    # 凭证在投递前被删除时 credential_id 会被置空, 据此判定为凭证缺失而不是不需要凭证
+    credential_required: bool = Field(default=False)
+    path: str = Field(default="/process-issue", max_length=255)
+    payload: dict[str, Any] = Field(default_factory=dict, sa_column=Column(JSON, nullable=False))
+    # 随请求发送的 Idempotency-Key, 节点据此丢弃重复投递
+    idempotency_key: str = Field(max_length=64, unique=True)
+    status: str = Field(default="pending", max_length=32)  # pending/delivered/failed
+    attempts: int = Field(default=0)
+    next_attempt_at: datetime = Field(default_factory=datetime.utcnow)
+    last_error: str | None = Field(default=None, max_length=1024)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    delivered_at: datetime | None = Field(default=None)
+
+
+# 投递器按 next_attempt_at 取到期的待投递记录
+Index(
+    "ix_dispatch_outbox_due",
+    DispatchOutbox.next_attempt_at,
+    postgresql_where=DispatchOutbox.status == "pending",
+)
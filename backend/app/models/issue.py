@@ -1,7 +1,9 @@
 import uuid
 from datetime import datetime
-from typing import TYPE_CHECKING, Optional, List
+from typing import TYPE_CHECKING, Any, Optional, List
 
+from sqlalchemy import Column, Computed, Index, and_
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlmodel import Field, Relationship, SQLModel
 
 from .common import ProjectIssueLink
@@ -48,6 +50,23 @@ class IssueUpdate(SQLModel):
 
 
 class Issue(IssueBase, table=True):
+    __table_args__ = (
+        # GitHub 同步按 (仓库, issue编号) 做 upsert
+        Index("uq_issue_repository_url_issue_number", "repository_url", "issue_number", unique=True),
+        # 搜索: 全文检索 + 子串匹配 (ILIKE '%term%') 的 trigram 索引
+        Index("ix_issue_search_vector", "search_vector", postgresql_using="gin"),
+        Index("ix_issue_title_trgm", "title", postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"}),
+        Index("ix_issue_content_trgm", "content", postgresql_using="gin", postgresql_ops={"content": "gin_trgm_ops"}),
+        Index(
+            "ix_issue_repository_url_trgm",
+            "repository_url",
+            postgresql_using="gin",
+            postgresql_ops={"repository_url": "gin_trgm_ops"},
+        ),
+    )
+    # search_vector 由数据库生成, 只在搜索时使用, 不映射到ORM属性, 避免每次查询都加载
+    __mapper_args__ = {"exclude_properties": ["search_vector"]}
+
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     owner_id: uuid.UUID = Field(foreign_key="user.id", nullable=False, ondelete="CASCADE")
     owner: Optional["User"] = Relationship(back_populates="issues")
@@ -62,11 +81,65 @@ class Issue(IssueBase, table=True):
     completed_at: datetime | None = Field(default=None)
     error_message: str | None = Field(default=None, max_length=1024)
     result_branch: str | None = Field(default=None, max_length=255)
+    # 直接依赖中尚未 merged 的数量, 由 IssueDependencyService 维护, 为0时issue可以被调度
+    unmet_dependency_count: int = Field(default=0)
 
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     deleted_at: datetime | None = Field(default=None, index=True)
 
+    search_vector: Any = Field(
+        default=None,
+        exclude=True,
+        sa_column=Column(
+            TSVECTOR,
+            Computed(
+                "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+                "setweight(to_tsvector('simple', coalesce(content, '')), 'B') || "
+                "setweight(to_tsvector('simple', coalesce(repository_url, '')), 'C')",
+                persisted=True,
+            ),
+        ),
+    )
+
+
+# 调度热点查询的索引
+# 待处理队列: 认领/分配按 priority DESC, created_at ASC 取 status='pending' 的issue
+Index(
+    "ix_issue_pending_queue",
+    Issue.priority.desc(),
+    Issue.created_at.asc(),
+    postgresql_where=Issue.status == "pending",
+)
+# 就绪队列: 依赖都已 merged 的待处理issue
+Index(
+    "ix_issue_ready_queue",
+    Issue.priority.desc(),
+    Issue.created_at.asc(),
+    postgresql_where=and_(Issue.status == "pending", Issue.unmet_dependency_count == 0),
+)
+# 节点负载: 按 assigned_node_id 统计 status='processing' 的issue
+Index(
+    "ix_issue_processing_node",
+    Issue.assigned_node_id,
+    postgresql_where=Issue.status == "processing",
+)
+# 列表排序 (priority, created_at, id) 倒序, 与 cursor 分页的游标一致
+Index("ix_issue_list_order", Issue.priority.desc(), Issue.created_at.desc(), Issue.id.desc())
+Index(
+    "ix_issue_owner_list_order",
+    Issue.owner_id,
+    Issue.priority.desc(),
+    Issue.created_at.desc(),
+    Issue.id.desc(),
+)
+# 工作空间清理: 已结束的issue按完成时间查找
+Index(
+    "ix_issue_finished_completed_at",
+    Issue.completed_at,
+    postgresql_where=and_(Issue.status.in_(["completed", "failed"]), Issue.completed_at.is_not(None)),
+)
+
 
 class IssuePublic(IssueBase):
     id: uuid.UUID
@@ -78,9 +151,36 @@ class IssuePublic(IssueBase):
     error_message: str | None = None
     result_branch: str | None = None
     assigned_node_id: uuid.UUID | None = None
+    unmet_dependency_count: int = 0
     dependency_issue_ids: list[uuid.UUID] = Field(default_factory=list)
 
 
 class IssuesPublic(SQLModel):
     data: list[IssuePublic]
-    count: int
+    count: int | None  # count=none 时为空
+    next_cursor: str | None = None  # cursor 分页时下一页的游标
+
+
+class DependencyGraphNode(SQLModel):
+    id: uuid.UUID
+    title: str
+    status: str
+    priority: int
+    unmet_dependency_count: int = 0
+    relation: str  # seed: 查询的issue / ancestor: 被依赖 (传递) / descendant: 依赖查询的issue (传递)
+
+
+class DependencyGraphEdge(SQLModel):
+    issue_id: uuid.UUID
+    depends_on_issue_id: uuid.UUID
+
+
+class IssueDependencyGraph(SQLModel):
+    nodes: list[DependencyGraphNode]
+    edges: list[DependencyGraphEdge]
+    ancestor_ids: list[uuid.UUID]
+    descendant_ids: list[uuid.UUID]
+    topological_order: list[uuid.UUID]  # 被依赖的issue在前
+    critical_path: list[uuid.UUID]  # 未 merged issue 最多的依赖链, 从最先需要完成的issue开始
+    critical_path_length: int  # critical_path 上未 merged 的issue数
+    cycle_issue_ids: list[uuid.UUID] = Field(default_factory=list)  # 历史数据中成环而无法排序的issue
@@ -2,6 +2,7 @@ import uuid
 
 from typing import TYPE_CHECKING, Optional, List
 from datetime import datetime
+from sqlalchemy import Index
 from sqlmodel import Field, Relationship, SQLModel
 
 from .common import NodeCredentialLink, ProjectNodeLink
@@ -48,6 +49,31 @@ class Node(NodeBase, table=True):
     deleted_at: datetime | None = Field(default=None, index=True)
 
 
+# 在线节点按心跳时间筛选: 节点选择取心跳较新的, 离线检测取心跳过期的
+Index(
+    "ix_node_online_heartbeat",
+    Node.last_heartbeat,
+    postgresql_where=Node.status == "online",
+)
+
+
+class NodeMetricsBase(SQLModel):
+    """从节点通过心跳上报的资源指标, 均为可选, 旧版本 agent 不上报"""
+    cpu_count: int | None = Field(default=None, ge=1)  # CPU核数
+    load_avg: float | None = Field(default=None, ge=0)  # 1分钟平均负载
+    mem_free_mb: int | None = Field(default=None, ge=0)  # 可用内存 (MB)
+    disk_free_mb: int | None = Field(default=None, ge=0)  # 工作空间所在磁盘的可用空间 (MB)
+    running_tasks: int | None = Field(default=None, ge=0)  # 节点上正在运行的任务数
+
+
+class NodeMetrics(NodeMetricsBase, table=True):
+    """节点最新资源指标, 每个节点一行, 只保留最近一次上报的值"""
+    __tablename__ = "node_metrics"
+
+    node_id: uuid.UUID = Field(foreign_key="node.id", primary_key=True, ondelete="CASCADE")
+    reported_at: datetime = Field(default_factory=datetime.utcnow)
+
+
 class NodePublic(NodeBase):
     id: uuid.UUID
     last_heartbeat: datetime | None = None
@@ -55,7 +81,8 @@ class NodePublic(NodeBase):
 
 class NodesPublic(SQLModel):
     data: list[NodePublic]
-    count: int
+    count: int | None  # count=none 时为空
+    next_cursor: str | None = None  # cursor 分页时下一页的游标
 
 
 # 节点注册相关模型
@@ -68,8 +95,8 @@ class NodeRegister(SQLModel):
     tags: str | None = Field(default=None, max_length=255)
 
 
-class NodeHeartbeat(SQLModel):
-    """从节点心跳请求"""
+class NodeHeartbeat(NodeMetricsBase):
+    """从节点心跳请求, 可附带资源指标"""
     node_id: uuid.UUID
     register_key: str = Field(max_length=255)
 
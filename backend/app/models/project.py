@@ -1,7 +1,9 @@
 import uuid
 
 from datetime import datetime
-from typing import TYPE_CHECKING, Optional, List
+from typing import TYPE_CHECKING, Any, Optional, List
+from sqlalchemy import Column, Computed, Index
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlmodel import Field, Relationship, SQLModel
 
 from .common import ProjectMemberLink, ProjectIssueLink, ProjectRepositoryLink, ProjectNodeLink
@@ -34,6 +36,20 @@ class ProjectUpdate(SQLModel):
 
 
 class Project(ProjectBase, table=True):
+    __table_args__ = (
+        # 搜索: 全文检索 + 子串匹配 (ILIKE '%term%') 的 trigram 索引
+        Index("ix_project_search_vector", "search_vector", postgresql_using="gin"),
+        Index("ix_project_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+        Index(
+            "ix_project_description_trgm",
+            "description",
+            postgresql_using="gin",
+            postgresql_ops={"description": "gin_trgm_ops"},
+        ),
+    )
+    # search_vector 由数据库生成, 只在搜索时使用, 不映射到ORM属性
+    __mapper_args__ = {"exclude_properties": ["search_vector"]}
+
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     owner_id: uuid.UUID = Field(foreign_key="user.id", nullable=False, ondelete="CASCADE")
     owner: Optional["User"] = Relationship(
@@ -50,6 +66,19 @@ class Project(ProjectBase, table=True):
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     deleted_at: datetime | None = Field(default=None, index=True)
 
+    search_vector: Any = Field(
+        default=None,
+        exclude=True,
+        sa_column=Column(
+            TSVECTOR,
+            Computed(
+                "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+                "setweight(to_tsvector('simple', coalesce(description, '')), 'B')",
+                persisted=True,
+            ),
+        ),
+    )
+
 
 class ProjectPublic(ProjectBase):
     id: uuid.UUID
@@ -58,4 +87,5 @@ class ProjectPublic(ProjectBase):
 
 class ProjectsPublic(SQLModel):
     data: List[ProjectPublic]
-    count: int
+    count: int | None  # count=none 时为空
+    next_cursor: str | None = None  # cursor 分页时下一页的游标
@@ -42,4 +42,5 @@ class PromptPublic(PromptBase):
 
 class PromptsPublic(SQLModel):
     data: list[PromptPublic]
-    count: int
+    count: int | None  # count=none 时为空
+    next_cursor: str | None = None  # cursor 分页时下一页的游标
@@ -2,6 +2,7 @@ import uuid
 
 from typing import TYPE_CHECKING, Optional, List
 from datetime import datetime
+from sqlalchemy import JSON, Column, UniqueConstraint
 from sqlmodel import Field, Relationship, SQLModel
 
 from .common import ProjectRepositoryLink
@@ -46,4 +47,21 @@ class RepositoryPublic(RepositoryBase):
 
 class RepositoriesPublic(SQLModel):
     data: list[RepositoryPublic]
-    count: int
+    count: int | None  # count=none 时为空
+    next_cursor: str | None = None  # cursor 分页时下一页的游标
+
+
+class RepositorySyncState(SQLModel, table=True):
+    """GitHub 增量同步游标, 每个 (仓库, 标签过滤) 一行"""
+    __tablename__ = "repository_sync_state"
+    __table_args__ = (UniqueConstraint("repository_url", "labels"),)
+
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    repository_url: str = Field(max_length=512, index=True)
+    labels: str = Field(default="", max_length=255)  # 逗号分隔的标签过滤, 空表示不过滤
+    last_updated_at: datetime | None = Field(default=None)  # 已同步issue的最大 updated_at (UTC)
+    etags: dict[str, str] = Field(default_factory=dict, sa_column=Column(JSON, nullable=False))  # 页码 -> ETag
+    last_synced_at: datetime | None = Field(default=None)
+
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -1,6 +1,7 @@
 import uuid
 from typing import TYPE_CHECKING, Optional
 from datetime import datetime
+from sqlalchemy import Index
 from sqlmodel import Field, Relationship, SQLModel
 
 if TYPE_CHECKING:
@@ -46,6 +47,16 @@ class Task(TaskBase, table=True):
     deleted_at: datetime | None = Field(default=None, index=True)
 
 
+# 运行中的任务按开始时间倒序 (Dashboard)
+Index(
+    "ix_task_running_started_at",
+    Task.started_at.desc(),
+    postgresql_where=Task.status == "running",
+)
+# 按issue查任务, 也用于删除issue时的外键检查
+Index("ix_task_issue_id", Task.issue_id)
+
+
 class TaskPublic(TaskBase):
     id: uuid.UUID
     owner_id: uuid.UUID
@@ -78,4 +78,5 @@ class UserPublic(UserBase):
 
 class UsersPublic(SQLModel):
     data: List[UserPublic]
-    count: int
+    count: int | None  # count=none 时为空
+    next_cursor: str | None = None  # cursor 分页时下一页的游标
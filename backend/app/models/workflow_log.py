@@ -1,16 +1,17 @@
 import uuid
 from datetime import datetime
+from sqlalchemy import BigInteger, Column, LargeBinary
 from sqlmodel import Field, SQLModel
 
 
 class WorkflowLogBase(SQLModel):
     """工作流执行日志基础模型"""
-    issue_id: uuid.UUID = Field(foreign_key="issue.id")
-    node_id: uuid.UUID | None = Field(default=None, foreign_key="node.id")
+    issue_id: uuid.UUID = Field(foreign_key="issue.id", ondelete="CASCADE")
+    node_id: uuid.UUID | None = Field(default=None, foreign_key="node.id", ondelete="SET NULL")
     step_name: str = Field(max_length=100)  # init/clone/ai_coding/commit/push
     status: str = Field(max_length=32)  # running/success/failed
     command: str | None = Field(default=None, max_length=512)
-    output: str | None = Field(default=None, max_length=4096)
+    output: str | None = Field(default=None, max_length=4096)  # 输出末尾的摘要, 完整输出在 WorkflowLogChunk 中
     error_message: str | None = Field(default=None, max_length=2048)
     duration_ms: int | None = Field(default=None)
 
@@ -20,11 +21,39 @@ class WorkflowLog(WorkflowLogBase, table=True):
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 
+class WorkflowLogChunk(SQLModel, table=True):
+    """
+    步骤完整输出的压缩分段
+    每个步骤 (WorkflowLog) 的 stdout/stderr 按固定大小切分, 每段单独压缩, 按 offset 范围读取时只解压需要的段
+    """
+    __tablename__ = "workflow_log_chunk"
+
+    log_id: uuid.UUID = Field(foreign_key="workflowlog.id", primary_key=True, ondelete="CASCADE")
+    stream: str = Field(default="stdout", max_length=16, primary_key=True)  # stdout/stderr
+    seq: int = Field(primary_key=True)
+    offset: int = Field(default=0, sa_type=BigInteger)  # 本段第一个字节在整个输出中的位置 (未压缩)
+    raw_size: int = Field(default=0)  # 未压缩的字节数
+    codec: str = Field(default="gzip", max_length=16)  # gzip/zstd
+    data: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+
+
 class WorkflowLogPublic(WorkflowLogBase):
     id: uuid.UUID
     created_at: datetime
+    stdout_size: int = 0  # 完整输出的字节数
+    stderr_size: int = 0
 
 
 class WorkflowLogsPublic(SQLModel):
     data: list[WorkflowLogPublic]
     count: int
+
+
+class WorkflowLogOutputPage(SQLModel):
+    """按字节范围读取的一页输出"""
+    log_id: uuid.UUID
+    stream: str
+    offset: int
+    next_offset: int  # 下一页的起点, 不小于 total 时已读完
+    total: int  # 完整输出的字节数
+    data: str
@@ -0,0 +1,202 @@
+"""
+命令输出流
+节点以 NDJSON 逐段返回命令输出, 后端不再等命令结束后一次性持有全部 stdout/stderr:
+- 每个输出流一个有界环形缓冲区 (按段数和字节数), 内存占用与输出总量无关
+- 订阅者可以从任意序号开始读取, 晚加入的订阅者先回放缓冲区中的输出再接收实时输出
+- 缓冲区已满且有订阅者尚未读到最旧的输出时, 生产者暂停读取节点响应 (TCP 反压传导到节点),
+  超过 COMMAND_STREAM_STALL_SECONDS 仍未读走则丢弃最旧的输出, 落后的订阅者收到 gap
+- 命令结束后输出流保留 COMMAND_STREAM_RETENTION_SECONDS, 之后从注册表中移除
+"""
+import asyncio
+import itertools
+import logging
+import uuid
+from collections import deque
+from collections.abc import AsyncIterator
+from datetime import datetime
+from typing import Optional
+
+from app.core.config import settings
+from app.models.command import CommandOutputChunk
+
+logger = logging.getLogger(__name__)
+
+
+class CommandStream:
+    """一个命令的输出流"""
+
+    def __init__(
+        self,
+        stream_id: str,
+        node_id: Optional[uuid.UUID] = None,
+        max_chunks: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        stall_seconds: Optional[float] = None
+    ) -> None:
+        self.stream_id = stream_id
+        self.node_id = node_id
+        self.max_chunks = max_chunks or settings.COMMAND_STREAM_BUFFER_CHUNKS
+        self.max_bytes = max_bytes or settings.COMMAND_STREAM_BUFFER_BYTES
+        self.stall_seconds = settings.COMMAND_STREAM_STALL_SECONDS if stall_seconds is None else stall_seconds
+        self.created_at = datetime.utcnow()
+        self.finished_at: Optional[datetime] = None
+
+        self._chunks: deque[CommandOutputChunk] = deque()
+        self._bytes = 0
+        self._next_seq = 0
+        self._closed = False
+        self._condition = asyncio.Condition()
+        # 订阅者 -> 下一个要读取的序号
+        self._cursors: dict[int, int] = {}
+        self._subscriber_ids = itertools.count()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @property
+    def _first_seq(self) -> int:
+        """缓冲区中最旧一段的序号, 缓冲区为空时为下一段的序号"""
+        return self._chunks[0].seq if self._chunks else self._next_seq
+
+    def _is_full(self, incoming: int) -> bool:
+        return bool(self._chunks) and (
+            len(self._chunks) + 1 > self.max_chunks or self._bytes + incoming > self.max_bytes
+        )
+
+    def _blocks_eviction(self) -> bool:
+        """有订阅者还没读到最旧的一段"""
+        return any(cursor <= self._first_seq for cursor in self._cursors.values())
+
+    async def publish(self, chunk: CommandOutputChunk) -> None:
+        """追加一段输出, 缓冲区满且会丢掉订阅者未读的输出时等待订阅者读取"""
+        size = len(chunk.data)
+        async with self._condition:
+            if self._closed:
+                raise RuntimeError(f"Command stream {self.stream_id} is closed")
+            if self._is_full(size) and self._blocks_eviction():
+                try:
+                    await asyncio.wait_for(
+                        self._condition.wait_for(
+                            lambda: not (self._is_full(size) and self._blocks_eviction())
+                        ),
+                        timeout=self.stall_seconds,
+                    )
+                except asyncio.TimeoutError:
+                    logger.warning(f"Command stream {self.stream_id}: slow subscriber, dropping oldest output")
+
+            chunk = chunk.model_copy(update={"seq": self._next_seq})
+            self._next_seq += 1
+            self._chunks.append(chunk)
+            self._bytes += size
+            # 至少保留最新的一段, 单段超过字节上限时也能被读取
+            while len(self._chunks) > 1 and (
+                len(self._chunks) > self.max_chunks or self._bytes > self.max_bytes
+            ):
+                self._bytes -= len(self._chunks.popleft().data)
+            self._condition.notify_all()
+
+    async def close(self) -> None:
+        """输出结束, 订阅者读完缓冲区后退出"""
+        async with self._condition:
+            self._closed = True
+            self.finished_at = datetime.utcnow()
+            self._condition.notify_all()
+
+    async def subscribe(self, from_seq: int = 0) -> AsyncIterator[CommandOutputChunk]:
+        """
+        从 from_seq 开始读取输出, 直到输出流结束
+        from_seq 之后的输出已被丢弃时先返回一个 gap
+        """
+        subscriber = next(self._subscriber_ids)
+        cursor = max(from_seq, 0)
+        async with self._condition:
+            self._cursors[subscriber] = cursor
+        try:
+            while True:
+                async with self._condition:
+                    await self._condition.wait_for(lambda: self._closed or cursor < self._next_seq)
+                    batch: list[CommandOutputChunk] = []
+                    if cursor < self._first_seq:
+                        batch.append(
+                            CommandOutputChunk(
+                                seq=self._first_seq - 1,
+                                stream="gap",
+                                data=f"{self._first_seq - cursor} chunks dropped",
+                            )
+                        )
+                        cursor = self._first_seq
+                    batch.extend(chunk for chunk in self._chunks if chunk.seq >= cursor)
+                    if not batch and self._closed:
+                        return
+                    cursor = self._next_seq
+                    self._cursors[subscriber] = cursor
+                    self._condition.notify_all()
+                # 在锁外交给调用方, 慢的订阅者不会阻塞其它订阅者
+                for chunk in batch:
+                    yield chunk
+        finally:
+            async with self._condition:
+                self._cursors.pop(subscriber, None)
+                self._condition.notify_all()
+
+
+class CommandStreamRegistry:
+    """进程内活动输出流的注册表"""
+
+    def __init__(self) -> None:
+        self._streams: dict[str, CommandStream] = {}
+        self._producers: dict[str, asyncio.Task] = {}
+
+    def get(self, stream_id: str) -> Optional[CommandStream]:
+        return self._streams.get(stream_id)
+
+    def start(
+        self,
+        source: AsyncIterator[CommandOutputChunk],
+        stream_id: Optional[str] = None,
+        node_id: Optional[uuid.UUID] = None
+    ) -> CommandStream:
+        """
+        创建输出流并在后台读取 source, 客户端断开不会中断命令输出的读取
+        :raises ValueError: stream_id 已被使用
+        """
+        stream_id = stream_id or uuid.uuid4().hex
+        if stream_id in self._streams:
+            raise ValueError(f"Command stream {stream_id} already exists")
+        stream = CommandStream(stream_id, node_id=node_id)
+        self._streams[stream_id] = stream
+        self._producers[stream_id] = asyncio.create_task(self._produce(stream, source))
+        return stream
+
+    async def _produce(self, stream: CommandStream, source: AsyncIterator[CommandOutputChunk]) -> None:
+        try:
+            async for chunk in source:
+                await stream.publish(chunk)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Command stream {stream.stream_id} failed: {str(e)}")
+            await stream.publish(CommandOutputChunk(stream="error", data=str(e)))
+        finally:
+            await stream.close()
+            self._producers.pop(stream.stream_id, None)
+            # 结束后保留一段时间供晚加入的订阅者读取
+            asyncio.get_running_loop().call_later(
+                settings.COMMAND_STREAM_RETENTION_SECONDS,
+                self._streams.pop,
+                stream.stream_id,
+                None,
+            )
+
+    async def aclose(self) -> None:
+        """取消所有仍在读取的输出流, 在应用退出时调用"""
+        producers = list(self._producers.values())
+        for producer in producers:
+            producer.cancel()
+        await asyncio.gather(*producers, return_exceptions=True)
+        self._streams.clear()
+
+
+# 全局输出流注册表
+command_streams = CommandStreamRegistry()
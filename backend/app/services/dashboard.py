@@ -0,0 +1,353 @@
+"""
+Dashboard统计服务
+统计数据的计算, 以及按用户范围缓存的快照: 多个浏览器标签/SSE订阅者共享同一份计算结果,
+快照最多每 DASHBOARD_SNAPSHOT_INTERVAL_SECONDS 重算一次, issue/task/node 等写入提交后立即失效
+"""
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Optional
+
+from pydantic import BaseModel, computed_field
+from sqlalchemy import event
+from sqlalchemy.orm import ORMExecuteState
+from sqlmodel import Session, func, select
+
+from app.core.config import settings
+from app.core.db import engine
+from app.models.credential import Credential
+from app.models.issue import Issue
+from app.models.node import Node
+from app.models.project import Project
+from app.models.prompt import Prompt
+from app.models.repository import Repository
+from app.models.task import Task
+
+logger = logging.getLogger(__name__)
+
+
+class IssueStats(BaseModel):
+    """Issue统计"""
+    pending: int  # 待处理
+    processing: int  # 处理中
+    total: int  # 总数
+
+
+class NodeStats(BaseModel):
+    """Node统计"""
+    idle: int  # 空闲
+    running: int  # 运行中
+    offline: int  # 离线
+    total: int  # 总数
+
+
+class RunningTask(BaseModel):
+    """运行中的任务"""
+    task_id: uuid.UUID
+    issue_id: uuid.UUID
+    issue_title: str
+    node_name: str
+    started_at: datetime
+
+    # 序列化时才计算, 缓存的快照中不会停留在计算时的值
+    @computed_field  # type: ignore[prop-decorator]
+    @property
+    def running_time(self) -> str:
+        """已运行时间(格式化字符串)"""
+        return format_duration(self.started_at)
+
+
+class DashboardStats(BaseModel):
+    """Dashboard统计数据"""
+    issues: IssueStats
+    nodes: NodeStats
+    projects_count: int
+    prompts_count: int
+    credentials_count: int
+    repositories_count: int
+    running_tasks: list[RunningTask]
+
+
+def format_duration(started_at: datetime) -> str:
+    """格式化运行时间"""
+    duration = datetime.utcnow() - started_at
+    total_seconds = int(duration.total_seconds())
+    
+    hours = total_seconds // 3600
+    minutes = (total_seconds % 3600) // 60
+    seconds = total_seconds % 60
+    
+    if hours > 0:
+        return f"{hours}h {minutes}m {seconds}s"
+    elif minutes > 0:
+        return f"{minutes}m {seconds}s"
+    else:
+        return f"{seconds}s"
+
+
+def _count_scalar(model: Any, owner_filter: uuid.UUID | None) -> Any:
+    """单表计数的标量子查询"""
+    statement = select(func.count()).select_from(model)
+    if owner_filter:
+        statement = statement.where(model.owner_id == owner_filter)
+    return statement.scalar_subquery()
+
+
+def collect_dashboard_stats(session: Session, owner_filter: uuid.UUID | None) -> DashboardStats:
+    """
+    计算Dashboard统计数据, 共两条SQL:
+    各类计数用 COUNT(*) FILTER 和标量子查询合并为一条, 运行中的任务列表单独一条
+    :param owner_filter: 只统计该用户的数据, 为空时统计全部
+    """
+    issue_counts = select(
+        func.count().filter(Issue.status == "pending").label("pending"),
+        func.count().filter(Issue.status == "processing").label("processing"),
+        func.count().label("total"),
+    ).select_from(Issue)
+    node_counts = select(
+        func.count().filter(Node.status == "online").label("online"),
+        func.count().filter(Node.status == "offline").label("offline"),
+        func.count().label("total"),
+    ).select_from(Node)
+    # 运行中的node: 有processing状态issue的节点
+    running_nodes = select(
+        func.count(func.distinct(Issue.assigned_node_id))
+    ).select_from(Issue).where(Issue.status == "processing")
+    if owner_filter:
+        issue_counts = issue_counts.where(Issue.owner_id == owner_filter)
+        node_counts = node_counts.where(Node.owner_id == owner_filter)
+        running_nodes = running_nodes.join(
+            Node, Issue.assigned_node_id == Node.id
+        ).where(Node.owner_id == owner_filter)
+    issue_counts = issue_counts.subquery("issue_counts")
+    node_counts = node_counts.subquery("node_counts")
+
+    counts = session.exec(
+        select(
+            issue_counts.c.pending,
+            issue_counts.c.processing,
+            issue_counts.c.total,
+            node_counts.c.online,
+            node_counts.c.offline,
+            node_counts.c.total,
+            running_nodes.scalar_subquery(),
+            _count_scalar(Project, owner_filter),
+            _count_scalar(Prompt, owner_filter),
+            _count_scalar(Credential, owner_filter),
+            _count_scalar(Repository, owner_filter),
+        ).select_from(issue_counts, node_counts)
+    ).one()
+    (
+        pending_count, processing_count, total_issues,
+        online_nodes, offline_nodes, total_nodes, running_count,
+        projects_count, prompts_count, credentials_count, repositories_count,
+    ) = counts
+
+    issue_stats = IssueStats(
+        pending=pending_count,
+        processing=processing_count,
+        total=total_issues
+    )
+    # 空闲节点 = 在线节点 - 运行中节点
+    node_stats = NodeStats(
+        idle=max(online_nodes - running_count, 0),
+        running=running_count,
+        offline=offline_nodes,
+        total=total_nodes
+    )
+
+    # 运行中的任务列表
+    running_tasks_stmt = (
+        select(Task, Issue, Node)
+        .join(Issue, Task.issue_id == Issue.id)
+        .join(Node, Task.node_id == Node.id)
+        .where(Task.status == "running")
+        .order_by(Task.started_at.desc())
+        .limit(10)
+    )
+    if owner_filter:
+        running_tasks_stmt = running_tasks_stmt.where(Task.owner_id == owner_filter)
+
+    running_tasks = []
+    for task, issue, node in session.exec(running_tasks_stmt).all():
+        if task.started_at:
+            running_tasks.append(RunningTask(
+                task_id=task.id,
+                issue_id=issue.id,
+                issue_title=issue.title,
+                node_name=node.name,
+                started_at=task.started_at
+            ))
+
+    return DashboardStats(
+        issues=issue_stats,
+        nodes=node_stats,
+        projects_count=projects_count,
+        prompts_count=prompts_count,
+        credentials_count=credentials_count,
+        repositories_count=repositories_count,
+        running_tasks=running_tasks
+    )
+
+
+def merge_patch(old: Any, new: Any) -> Any:
+    """
+    计算从 old 到 new 的 JSON Merge Patch (RFC 7396)
+    字典逐键递归比较, 只保留变化的部分; 列表等其他值整体替换
+    """
+    if not isinstance(old, dict) or not isinstance(new, dict):
+        return new
+    patch = {}
+    for key, value in new.items():
+        if key not in old:
+            patch[key] = value
+        elif old[key] != value:
+            patch[key] = merge_patch(old[key], value)
+    for key in old.keys() - new.keys():
+        patch[key] = None
+    return patch
+
+
+# 写入这些表会影响统计结果
+_TRACKED_MODELS = (Issue, Task, Node, Project, Prompt, Credential, Repository)
+_TRACKED_TABLES = {model.__tablename__ for model in _TRACKED_MODELS}
+# 无法确定具体用户的写入 (如批量 UPDATE), 使全部快照失效
+ALL_SCOPES = "*"
+
+
+class DashboardSnapshotService:
+    """
+    按用户范围 (owner_id, 超级管理员为None) 缓存的Dashboard快照
+    同一范围并发读取时只计算一次; 快照过期或收到变更事件后, 下一次读取才会重算,
+    且两次重算至少间隔 DASHBOARD_SNAPSHOT_MIN_INTERVAL_SECONDS, 避免写入频繁时反复计算
+    """
+
+    def __init__(
+        self,
+        interval: Optional[float] = None,
+        min_interval: Optional[float] = None
+    ) -> None:
+        self.interval = settings.DASHBOARD_SNAPSHOT_INTERVAL_SECONDS if interval is None else interval
+        self.min_interval = (
+            settings.DASHBOARD_SNAPSHOT_MIN_INTERVAL_SECONDS if min_interval is None else min_interval
+        )
+        self._snapshots: dict[Optional[uuid.UUID], tuple[int, float, DashboardStats]] = {}
+        self._dirty: set[Optional[uuid.UUID]] = set()
+        self._all_dirty = False
+        self._version = 0
+        self._refresh_locks: dict[Optional[uuid.UUID], asyncio.Lock] = {}
+        # 失效通知可能来自后台线程 (如节点监控)
+        self._lock = threading.Lock()
+
+    def invalidate(self, owner_ids: set) -> None:
+        """标记受影响的快照需要重算, ALL_SCOPES 表示全部"""
+        with self._lock:
+            if ALL_SCOPES in owner_ids:
+                self._all_dirty = True
+            else:
+                self._dirty.update(owner_ids)
+                # 超级管理员的快照统计全部用户
+                self._dirty.add(None)
+
+    def _is_stale(self, scope: Optional[uuid.UUID], now: float) -> bool:
+        cached = self._snapshots.get(scope)
+        if cached is None:
+            return True
+        age = now - cached[1]
+        if age >= self.interval:
+            return True
+        with self._lock:
+            dirty = self._all_dirty or scope in self._dirty
+        return dirty and age >= self.min_interval
+
+    def _compute(self, scope: Optional[uuid.UUID]) -> DashboardStats:
+        with Session(engine) as session:
+            return collect_dashboard_stats(session, scope)
+
+    async def get_snapshot(self, scope: Optional[uuid.UUID]) -> tuple[int, DashboardStats]:
+        """
+        获取范围内的快照, 需要时重算
+        :return: (版本号, 统计数据), 版本号只在内容变化时递增
+        """
+        if not self._is_stale(scope, time.monotonic()):
+            version, _, stats = self._snapshots[scope]
+            return version, stats
+
+        lock = self._refresh_locks.setdefault(scope, asyncio.Lock())
+        async with lock:
+            # 等锁期间其他请求可能已经重算过
+            now = time.monotonic()
+            if not self._is_stale(scope, now):
+                version, _, stats = self._snapshots[scope]
+                return version, stats
+
+            with self._lock:
+                # 先清除标记再计算, 计算期间到达的变更会让下一次读取重算
+                if self._all_dirty:
+                    self._dirty.update(self._snapshots)
+                    self._all_dirty = False
+                self._dirty.discard(scope)
+            stats = await asyncio.to_thread(self._compute, scope)
+
+            cached = self._snapshots.get(scope)
+            if cached is not None and cached[2] == stats:
+                version = cached[0]
+            else:
+                self._version += 1
+                version = self._version
+            self._snapshots[scope] = (version, now, stats)
+            return version, stats
+
+    def clear(self) -> None:
+        """丢弃所有快照"""
+        with self._lock:
+            self._snapshots.clear()
+            self._dirty.clear()
+            self._all_dirty = False
+
+
+# 全局Dashboard快照
+dashboard_snapshots = DashboardSnapshotService()
+
+
+def _pending_changes(session: Session) -> set:
+    return session.info.setdefault("dashboard_changes", set())
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_flush_changes(session: Session, _flush_context: Any) -> None:
+    """记录本次事务中写入的统计相关对象所属用户"""
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, _TRACKED_MODELS):
+            owner_id = getattr(obj, "owner_id", None)
+            _pending_changes(session).add(owner_id if owner_id else ALL_SCOPES)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk_changes(state: ORMExecuteState) -> None:
+    """
+    批量 INSERT/UPDATE/DELETE 语句无法区分用户, 使全部快照失效
+    带 dashboard_untracked 执行选项的语句 (如只写心跳时间) 不影响统计, 跳过
+    """
+    if not (state.is_insert or state.is_update or state.is_delete):
+        return
+    if state.execution_options.get("dashboard_untracked"):
+        return
+    table = getattr(state.statement, "table", None)
+    if table is not None and table.name in _TRACKED_TABLES:
+        _pending_changes(state.session).add(ALL_SCOPES)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_changes(session: Session) -> None:
+    changes = session.info.pop("dashboard_changes", None)
+    if changes:
+        dashboard_snapshots.invalidate(changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session: Session) -> None:
+    session.info.pop("dashboard_changes", None)
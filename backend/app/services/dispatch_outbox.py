@@ -0,0 +1,367 @@
+"""
+任务下发发件箱
+start_issue_task 把下发请求写入 dispatch_outbox, 与任务记录在同一个事务中提交, 接口不再等待节点响应.
+后台投递器 (OutboxDispatcher) 批量取出到期的记录并发投递给节点:
+- 取记录时用 SKIP LOCKED 并把 next_attempt_at 推到租约到期, 多个进程可以同时投递而不会重复取到同一条;
+  投递途中进程退出的记录在租约到期后被重新投递 (至少一次), 节点按 Idempotency-Key 去重
+- 失败按指数退避 (带抖动) 重试; 节点返回不可重试的4xx或超过最大次数后, 任务置为 failed、issue 置为 terminated
+- 只投递仍在目标节点上运行的任务; 任务已结束或issue已被回收到其它节点时, 记录直接置为 failed, 不再投递
+"""
+import asyncio
+import logging
+import random
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Optional, Sequence
+
+import httpx
+from sqlalchemy import or_, update
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.core.db import engine
+from app.models.credential import Credential
+from app.models.dispatch_outbox import DispatchOutbox
+from app.models.issue import Issue
+from app.models.node import Node
+from app.models.task import Task
+from app.services.node_rpc import node_rpc
+
+logger = logging.getLogger(__name__)
+
+# 这些4xx表示节点暂时无法处理, 可以重试; 其它4xx重试也不会成功
+RETRYABLE_STATUS_CODES = {408, 425, 429}
+STALE_TASK_ERROR = "Task is no longer running on this node"
+
+
+def retry_delay(attempts: int, rng: random.Random | None = None) -> float:
+    """第 attempts 次投递失败后的等待秒数: base * 2^(attempts-1), 不超过上限, 再加上最多10%的随机抖动"""
+    delay = min(
+        settings.OUTBOX_RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0),
+        settings.OUTBOX_RETRY_MAX_SECONDS,
+    )
+    return delay * (1 + 0.1 * (rng or random).random())
+
+
+@dataclass
+class DeliveryResult:
+    """一条记录的投递结果"""
+    entry_id: uuid.UUID
+    error: Optional[str] = None
+    retryable: bool = True
+
+    @property
+    def delivered(self) -> bool:
+        return self.error is None
+
+
+class DispatchOutboxService:
+    """任务下发发件箱服务"""
+
+    @staticmethod
+    def enqueue(
+        session: Session,
+        task: Task,
+        payload: dict[str, Any],
+        credential_id: Optional[uuid.UUID] = None,
+        path: str = "/process-issue"
+    ) -> DispatchOutbox:
+        """写入一条待投递记录, 由调用方与任务记录一起提交"""
+        entry = DispatchOutbox(
+            task_id=task.id,
+            node_id=task.node_id,
+            credential_id=credential_id,
+            credential_required=credential_id is not None,
+            path=path,
+            payload=payload,
+            idempotency_key=str(task.id),
+        )
+        session.add(entry)
+        return entry
+
+    @staticmethod
+    def claim_due(session: Session, limit: int, lease_seconds: float) -> list[DispatchOutbox]:
+        """
+        原子地取出最多 limit 条到期的待投递记录并提交
+        只取任务仍在目标节点上运行的记录, 其余的待投递记录先置为 failed
+        取出的记录投递次数加一, next_attempt_at 推迟到租约到期, 租约内其它投递器不会再取到
+        :return: 取出的记录 (已脱离会话)
+        """
+        if limit <= 0:
+            return []
+
+        DispatchOutboxService.cancel_stale(session)
+        now = datetime.utcnow()
+        candidates = (
+            select(DispatchOutbox.id)
+            .join(Task, Task.id == DispatchOutbox.task_id)
+            .where(
+                DispatchOutbox.status == "pending",
+                DispatchOutbox.next_attempt_at <= now,
+                Task.status == "running",
+                Task.node_id == DispatchOutbox.node_id,
+            )
+            .order_by(DispatchOutbox.next_attempt_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True, of=DispatchOutbox)
+        )
+        statement = (
+            update(DispatchOutbox)
+            .where(DispatchOutbox.id.in_(candidates.scalar_subquery()))
+            .values(
+                attempts=DispatchOutbox.attempts + 1,
+                next_attempt_at=now + timedelta(seconds=lease_seconds),
+            )
+            .returning(DispatchOutbox)
+            .execution_options(synchronize_session=False)
+        )
+        entries = list(session.exec(statement).scalars().all())
+        for entry in entries:
+            session.expunge(entry)
+        session.commit()
+        return entries
+
+    @staticmethod
+    def cancel_stale(session: Session) -> None:
+        """
+        把任务已不在目标节点上运行的待投递记录置为 failed, 不提交事务
+        节点离线后任务被置为失败、issue被重新分配到其它节点时, 旧记录不应再投递给原节点
+        """
+        session.exec(
+            update(DispatchOutbox)
+            .where(
+                DispatchOutbox.status == "pending",
+                DispatchOutbox.task_id == Task.id,
+                or_(Task.status != "running", Task.node_id.is_distinct_from(DispatchOutbox.node_id)),
+            )
+            .values(status="failed", last_error=STALE_TASK_ERROR)
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    def cancel_for_nodes(session: Session, node_ids: Sequence[uuid.UUID]) -> None:
+        """节点离线回收任务时, 把发往这些节点的待投递记录置为 failed, 不提交事务"""
+        if not node_ids:
+            return
+        session.exec(
+            update(DispatchOutbox)
+            .where(DispatchOutbox.status == "pending", DispatchOutbox.node_id.in_(node_ids))
+            .values(status="failed", last_error=STALE_TASK_ERROR)
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    def load_targets(
+        session: Session,
+        entries: list[DispatchOutbox]
+    ) -> tuple[dict[uuid.UUID, Node], dict[uuid.UUID, str]]:
+        """一次查询取出这批记录的节点, 一次查询取出凭证密钥"""
+        node_ids = {entry.node_id for entry in entries}
+        credential_ids = {entry.credential_id for entry in entries if entry.credential_id}
+        nodes = {
+            node.id: node
+            for node in session.exec(select(Node).where(Node.id.in_(node_ids))).all()
+        }
+        secrets: dict[uuid.UUID, str] = {}
+        if credential_ids:
+            secrets = dict(
+                session.exec(
+                    select(Credential.id, Credential.secret).where(Credential.id.in_(credential_ids))
+                ).all()
+            )
+        for node in nodes.values():
+            session.expunge(node)
+        return nodes, secrets
+
+    @staticmethod
+    async def deliver(
+        entries: list[DispatchOutbox],
+        nodes: dict[uuid.UUID, Node],
+        secrets: dict[uuid.UUID, str]
+    ) -> list[DeliveryResult]:
+        """并发投递一批记录, 每个节点的并发受 node_rpc 连接池限制"""
+
+        async def _deliver(entry: DispatchOutbox) -> DeliveryResult:
+            node = nodes.get(entry.node_id)
+            if node is None:
+                return DeliveryResult(entry.id, "Node not found", retryable=False)
+            payload = dict(entry.payload)
+            if entry.credential_required:
+                if entry.credential_id not in secrets:
+                    return DeliveryResult(entry.id, "Credential not found", retryable=False)
+                payload["credential_token"] = secrets[entry.credential_id]
+            try:
+                await node_rpc.post(
+                    node,
+                    entry.path,
+                    payload,
+                    timeout=settings.NODE_RPC_DISPATCH_TIMEOUT_SECONDS,
+                    headers={"Idempotency-Key": entry.idempotency_key},
+                )
+            except httpx.HTTPStatusError as e:
+                code = e.response.status_code
+                retryable = code >= 500 or code in RETRYABLE_STATUS_CODES
+                return DeliveryResult(entry.id, f"Node responded {code}: {e.response.text[:200]}", retryable)
+            except Exception as e:
+                return DeliveryResult(entry.id, str(e) or type(e).__name__)
+            return DeliveryResult(entry.id)
+
+        return list(await asyncio.gather(*(_deliver(entry) for entry in entries)))
+
+    @staticmethod
+    def record_results(
+        session: Session,
+        entries: list[DispatchOutbox],
+        results: list[DeliveryResult],
+        max_attempts: Optional[int] = None
+    ) -> dict[str, int]:
+        """
+        批量写回投递结果并提交
+        投递成功的记录置为 delivered; 可重试且未超过次数的记录按退避时间重新排队;
+        其余记录置为 failed, 对应的任务和issue按下发失败处理
+        """
+        max_attempts = max_attempts or settings.OUTBOX_MAX_ATTEMPTS
+        by_id = {entry.id: entry for entry in entries}
+        now = datetime.utcnow()
+        delivered: list[uuid.UUID] = []
+        retries: list[dict[str, Any]] = []
+        failures: list[dict[str, Any]] = []
+        for result in results:
+            entry = by_id[result.entry_id]
+            if result.delivered:
+                delivered.append(entry.id)
+            elif result.retryable and entry.attempts < max_attempts:
+                retries.append({
+                    "id": entry.id,
+                    "next_attempt_at": now + timedelta(seconds=retry_delay(entry.attempts)),
+                    "last_error": result.error[:1024],
+                })
+            else:
+                failures.append({
+                    "id": entry.id,
+                    "task_id": entry.task_id,
+                    "status": "failed",
+                    "last_error": result.error[:1024],
+                })
+
+        if delivered:
+            session.exec(
+                update(DispatchOutbox)
+                .where(DispatchOutbox.id.in_(delivered))
+                .values(status="delivered", delivered_at=now, last_error=None)
+                .execution_options(synchronize_session=False)
+            )
+        # 按主键批量更新, 每条记录的值不同, 一次 executemany 完成
+        if retries:
+            session.execute(update(DispatchOutbox), retries)
+        if failures:
+            session.execute(
+                update(DispatchOutbox),
+                [{key: item[key] for key in ("id", "status", "last_error")} for item in failures],
+            )
+            DispatchOutboxService._fail_tasks(session, failures, now)
+        session.commit()
+        return {"delivered": len(delivered), "retried": len(retries), "failed": len(failures)}
+
+    @staticmethod
+    def _fail_tasks(session: Session, failures: list[dict[str, Any]], now: datetime) -> None:
+        """下发最终失败: 仍在运行的任务置为失败, 其issue置为 terminated"""
+        errors = {item["task_id"]: item["last_error"] for item in failures}
+        tasks = session.exec(
+            select(Task).where(Task.id.in_(errors), Task.status == "running")
+        ).all()
+        for task in tasks:
+            error = f"Failed to dispatch task to node: {errors[task.id]}"
+            task.status = "failed"
+            task.result = error[:255]
+            task.completed_at = now
+            task.updated_at = now
+            session.add(task)
+            issue = session.get(Issue, task.issue_id)
+            if issue and issue.status == "processing":
+                issue.status = "terminated"
+                issue.error_message = error[:1024]
+                issue.updated_at = now
+                session.add(issue)
+            logger.warning(f"Task {task.id} dispatch failed permanently: {errors[task.id]}")
+
+    @staticmethod
+    async def dispatch_once(limit: Optional[int] = None) -> dict[str, int]:
+        """取出一批到期记录并投递, 数据库操作在线程中执行, 投递期间不占用数据库连接"""
+        limit = limit or settings.OUTBOX_BATCH_SIZE
+        # 租约需覆盖一次投递的最长耗时
+        lease_seconds = settings.NODE_RPC_DISPATCH_TIMEOUT_SECONDS * 2
+
+        def _claim() -> tuple[list[DispatchOutbox], dict, dict]:
+            with Session(engine) as session:
+                entries = DispatchOutboxService.claim_due(session, limit, lease_seconds)
+                if not entries:
+                    return [], {}, {}
+                return (entries, *DispatchOutboxService.load_targets(session, entries))
+
+        entries, nodes, secrets = await asyncio.to_thread(_claim)
+        if not entries:
+            return {"claimed": 0, "delivered": 0, "retried": 0, "failed": 0}
+        results = await DispatchOutboxService.deliver(entries, nodes, secrets)
+
+        def _record() -> dict[str, int]:
+            with Session(engine) as session:
+                return DispatchOutboxService.record_results(session, entries, results)
+
+        stats = await asyncio.to_thread(_record)
+        return {"claimed": len(entries), **stats}
+
+
+class OutboxDispatcher:
+    """后台投递循环, 每个进程一个; 有新记录时由 notify 立即唤醒, 否则按轮询间隔检查"""
+
+    def __init__(self) -> None:
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def start(self) -> None:
+        """在事件循环中启动投递循环"""
+        if self._task is not None and not self._task.done():
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        logger.info("Dispatch outbox worker started")
+
+    def notify(self) -> None:
+        """有新的待投递记录"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                stats = await DispatchOutboxService.dispatch_once()
+                if stats["claimed"]:
+                    logger.info(f"Dispatch outbox: {stats}")
+                # 取满一批说明还有积压, 不等待直接取下一批
+                if stats["claimed"] >= settings.OUTBOX_BATCH_SIZE:
+                    continue
+            except Exception as e:
+                logger.error(f"Dispatch outbox error: {str(e)}")
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), timeout=settings.OUTBOX_POLL_INTERVAL_SECONDS
+                )
+            except asyncio.TimeoutError:
+                pass
+
+
+# 全局投递器
+outbox_dispatcher = OutboxDispatcher()
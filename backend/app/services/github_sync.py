@@ -2,15 +2,116 @@
 GitHub Issue同步服务
 自动从GitHub仓库拉取issues并同步到本地数据库
 """
+import asyncio
+import contextvars
+import logging
+import time
 import httpx
 import uuid
-from typing import Optional, List
-from datetime import datetime
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional, List
+from datetime import datetime, timezone
+from sqlalchemy import literal_column
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlmodel import Session, select
 
 from app.models.issue import Issue, IssueCreate
+from app.models.repository import RepositorySyncState
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
+# 处于这些状态的issue同步时不再更新
+TERMINAL_STATUSES = ('completed', 'failed')
+
+# 当前任务所在的 shared_client 上下文中的连接池; 按 asyncio 任务的上下文隔离,
+# 并发的多次 sync_multiple_repos 各自使用、各自关闭自己的连接池
+_active_client: contextvars.ContextVar[Optional[httpx.AsyncClient]] = contextvars.ContextVar(
+    'github_sync_client', default=None
+)
+
+
+def parse_github_datetime(value: Optional[str]) -> Optional[datetime]:
+    """解析GitHub的ISO时间 (如 2024-01-01T00:00:00Z) 为naive UTC时间"""
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def max_updated_at(gh_issues: List[dict], current: Optional[datetime] = None) -> Optional[datetime]:
+    """取一页issues的最大 updated_at 与当前高水位中的较大者"""
+    for gh_issue in gh_issues:
+        updated_at = parse_github_datetime(gh_issue.get('updated_at'))
+        if updated_at and (current is None or updated_at > current):
+            current = updated_at
+    return current
+
+
+class GitHubRateLimiter:
+    """
+    GitHub API 自适应限速器, 同一个同步服务的所有并发请求共享
+    根据响应头 X-RateLimit-Remaining / X-RateLimit-Reset 在配额不足时把剩余请求均摊到重置前,
+    收到 403/429 限流响应时按 Retry-After (或重置时间) 暂停所有请求
+    """
+
+    def __init__(
+        self,
+        min_remaining: Optional[int] = None,
+        max_wait: Optional[float] = None
+    ):
+        self.min_remaining = (
+            settings.GITHUB_RATE_LIMIT_MIN_REMAINING if min_remaining is None else min_remaining
+        )
+        self.max_wait = settings.GITHUB_RATE_LIMIT_MAX_WAIT_SECONDS if max_wait is None else max_wait
+        self.remaining: Optional[int] = None
+        self.reset_at: Optional[float] = None  # epoch 秒
+        self.blocked_until = 0.0
+
+    def delay(self, now: Optional[float] = None) -> float:
+        """发送下一个请求前需要等待的秒数"""
+        now = time.time() if now is None else now
+        if self.blocked_until > now:
+            return min(self.blocked_until - now, self.max_wait)
+        if self.remaining is not None and self.reset_at and self.remaining < self.min_remaining:
+            window = max(self.reset_at - now, 0.0)
+            return min(window / max(self.remaining, 1), self.max_wait)
+        return 0.0
+
+    async def acquire(self) -> None:
+        """按当前配额情况等待后再放行请求"""
+        delay = self.delay()
+        if delay > 0:
+            logger.info(f"GitHub rate limit low, waiting {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    def update(self, response: httpx.Response, now: Optional[float] = None) -> Optional[float]:
+        """
+        记录响应中的配额信息
+        :return: 限流响应 (403/429) 需要等待的秒数, 其他响应返回None
+        """
+        now = time.time() if now is None else now
+        headers = response.headers
+        if headers.get('X-RateLimit-Remaining', '').isdigit():
+            self.remaining = int(headers['X-RateLimit-Remaining'])
+        if headers.get('X-RateLimit-Reset', '').isdigit():
+            self.reset_at = float(headers['X-RateLimit-Reset'])
+
+        if response.status_code not in (403, 429):
+            return None
+        retry_after = headers.get('Retry-After', '')
+        if retry_after.isdigit():
+            wait = float(retry_after)
+        elif self.remaining == 0 and self.reset_at:
+            wait = max(self.reset_at - now, 1.0)
+        elif response.status_code == 429:
+            wait = 60.0
+        else:
+            # 普通的 403 (如无权限), 不是限流
+            return None
+        wait = min(wait, self.max_wait)
+        self.blocked_until = max(self.blocked_until, now + wait)
+        return wait
+
 
 class GitHubSyncService:
     """GitHub同步服务"""
@@ -25,23 +126,61 @@ class GitHubSyncService:
         if self.github_token:
             self.headers['Authorization'] = f'token {self.github_token}'
         self.headers['Accept'] = 'application/vnd.github.v3+json'
+        self.rate_limiter = GitHubRateLimiter()
     
-    async def fetch_issues_from_repo(
-        self, 
-        repo_owner: str, 
+    @asynccontextmanager
+    async def shared_client(self, max_connections: int) -> AsyncIterator[httpx.AsyncClient]:
+        """
+        在上下文内让所有请求复用同一个连接池
+        已处于外层 shared_client 上下文中时直接复用外层的连接池, 由外层负责关闭
+        """
+        client = _active_client.get()
+        if client is not None:
+            yield client
+            return
+        async with httpx.AsyncClient(
+            timeout=settings.GITHUB_SYNC_TIMEOUT_SECONDS,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+        ) as client:
+            _active_client.set(client)
+            try:
+                yield client
+            finally:
+                # 外层上下文中一定没有连接池; 生成器被回收时可能在其它上下文中关闭, 不使用 reset
+                _active_client.set(None)
+    
+    async def _get(
+        self,
+        client: httpx.AsyncClient,
+        url: str,
+        headers: dict,
+        params: dict
+    ) -> httpx.Response:
+        """发送GET请求, 先按配额限速, 被限流时等待后重试"""
+        for attempt in range(settings.GITHUB_RATE_LIMIT_MAX_RETRIES + 1):
+            await self.rate_limiter.acquire()
+            response = await client.get(url, headers=headers, params=params)
+            wait = self.rate_limiter.update(response)
+            if wait is None or attempt == settings.GITHUB_RATE_LIMIT_MAX_RETRIES:
+                return response
+            logger.warning(
+                f"GitHub rate limited ({response.status_code}) on {url}, "
+                f"retrying in {wait:.1f}s"
+            )
+        return response
+    
+    @staticmethod
+    def _build_issue_query(
+        repo_owner: str,
         repo_name: str,
         state: str = "open",
         labels: Optional[List[str]] = None,
         since: Optional[datetime] = None
-    ) -> List[dict]:
-        """
-        从GitHub仓库获取issues
-        :param repo_owner: 仓库所有者
-        :param repo_name: 仓库名称
-        :param state: issue状态 (open/closed/all)
-        :param labels: 标签过滤
-        :param since: 只获取此时间之后更新的issues
-        """
+    ) -> tuple[str, dict]:
+        """构造 GitHub issues API 的地址和查询参数"""
         url = f"https://api.github.com/repos/{repo_owner}/{repo_name}/issues"
         params = {
             "state": state,
@@ -54,32 +193,81 @@ class GitHubSyncService:
             params['labels'] = ','.join(labels)
         
         if since:
-            params['since'] = since.isoformat()
+            # GitHub 要求 ISO 8601 格式, naive 时间按 UTC 处理
+            if since.tzinfo is None:
+                params['since'] = since.strftime('%Y-%m-%dT%H:%M:%SZ')
+            else:
+                params['since'] = since.isoformat()
+        
+        return url, params
+    
+    async def fetch_issues_from_repo(
+        self, 
+        repo_owner: str, 
+        repo_name: str,
+        state: str = "open",
+        labels: Optional[List[str]] = None,
+        since: Optional[datetime] = None
+    ) -> List[dict]:
+        """
+        从GitHub仓库获取issues
+        :param repo_owner: 仓库所有者
+        :param repo_name: 仓库名称
+        :param state: issue状态 (open/closed/all)
+        :param labels: 标签过滤
+        :param since: 只获取此时间之后更新的issues
+        """
+        url, params = self._build_issue_query(repo_owner, repo_name, state, labels, since)
         
         all_issues = []
+        async for issues in self.iter_issue_pages(url, params):
+            all_issues.extend(issues)
+        
+        return all_issues
+    
+    async def iter_issue_pages(
+        self,
+        url: str,
+        params: dict,
+        etags: Optional[dict] = None
+    ) -> AsyncIterator[List[dict]]:
+        """
+        逐页获取issues, 每拿到一页就交给调用方处理
+        :param url: GitHub issues API 地址
+        :param params: 查询参数 (page 由本方法维护)
+        :param etags: 页码 -> ETag, 传入时发送条件请求并写回新的ETag;
+            结果按 updated 倒序, 某页返回304说明该页及之后的页都没有变化, 直接结束
+        """
+        params = dict(params)
         page = 1
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
+        async with self.shared_client(max_connections=1) as client:
             while True:
                 params['page'] = page
-                response = await client.get(url, headers=self.headers, params=params)
+                headers = dict(self.headers)
+                if etags is not None and etags.get(str(page)):
+                    headers['If-None-Match'] = etags[str(page)]
+                response = await self._get(client, url, headers, params)
+                if response.status_code == 304:
+                    break
                 response.raise_for_status()
+                if etags is not None and response.headers.get('ETag'):
+                    etags[str(page)] = response.headers['ETag']
                 
-                issues = response.json()
-                if not issues:
+                raw_issues = response.json()
+                if not raw_issues:
                     break
                 
                 # 过滤掉pull requests (GitHub API会把PR也当作issue返回)
-                issues = [issue for issue in issues if 'pull_request' not in issue]
-                all_issues.extend(issues)
+                issues = [issue for issue in raw_issues if 'pull_request' not in issue]
+                if issues:
+                    yield issues
                 
-                # 如果返回的issues少于per_page,说明已经是最后一页
-                if len(issues) < params['per_page']:
+                # 如果返回的条目少于per_page,说明已经是最后一页
+                if len(raw_issues) < params['per_page']:
                     break
                 
                 page += 1
-        
-        return all_issues
     
     async def sync_issues_to_db(
         self,
@@ -88,16 +276,20 @@ class GitHubSyncService:
         repo_owner: str,
         repo_name: str,
         labels: Optional[List[str]] = None,
-        priority_mapping: Optional[dict] = None
+        priority_mapping: Optional[dict] = None,
+        full_sync: bool = False
     ) -> dict:
         """
         同步GitHub issues到数据库
+        默认增量同步: 以上次同步的 updated_at 高水位作为 since, 并对每页发送 If-None-Match,
+        仓库没有变化时只消耗一次304请求
         :param session: 数据库会话
         :param owner_id: Issue拥有者ID
         :param repo_owner: GitHub仓库所有者
         :param repo_name: GitHub仓库名称
         :param labels: 要同步的标签过滤
         :param priority_mapping: 标签到优先级的映射
+        :param full_sync: 忽略已保存的游标, 重新拉取全部issues
         :return: 同步结果统计
         """
         if priority_mapping is None:
@@ -111,109 +303,171 @@ class GitHubSyncService:
             }
         
         repo_url = f"https://github.com/{repo_owner}/{repo_name}"
-        
-        # 获取GitHub issues
-        github_issues = await self.fetch_issues_from_repo(
-            repo_owner, repo_name, labels=labels
-        )
+        sync_state = self.get_sync_state(session, repo_url, labels)
+        since = None if full_sync else sync_state.last_updated_at
+        etags = {} if full_sync else dict(sync_state.etags or {})
+        url, params = self._build_issue_query(repo_owner, repo_name, labels=labels, since=since)
         
         stats = {
-            'fetched': len(github_issues),
+            'fetched': 0,
             'created': 0,
             'updated': 0,
             'skipped': 0
         }
+        high_water_mark = since
         
-        for gh_issue in github_issues:
-            issue_number = gh_issue['number']
-            
-            # 检查是否已存在
-            statement = select(Issue).where(
-                Issue.repository_url == repo_url,
-                Issue.issue_number == issue_number
+        # 每页一条 INSERT ... ON CONFLICT DO UPDATE
+        async for page in self.iter_issue_pages(url, params, etags=etags):
+            page_stats = self.upsert_issue_page(
+                session, owner_id, repo_url, page, priority_mapping
             )
-            existing_issue = session.exec(statement).first()
-            
-            # 计算优先级
-            priority = 0
-            for label in gh_issue.get('labels', []):
-                label_name = label['name'].lower()
-                if label_name in priority_mapping:
-                    priority = max(priority, priority_mapping[label_name])
-            
-            if existing_issue:
-                # 更新现有issue
-                if existing_issue.status in ['completed', 'failed']:
-                    # 已完成或失败的issue不再更新
-                    stats['skipped'] += 1
-                    continue
-                
-                existing_issue.title = gh_issue['title']
-                existing_issue.content = gh_issue.get('body', '')
-                existing_issue.priority = priority
-                existing_issue.updated_at = datetime.utcnow()
-                session.add(existing_issue)
-                stats['updated'] += 1
-            else:
-                # 创建新issue
-                new_issue = Issue(
-                    owner_id=owner_id,
-                    title=gh_issue['title'],
-                    content=gh_issue.get('body', ''),
-                    repository_url=repo_url,
-                    issue_number=issue_number,
-                    priority=priority,
-                    status='pending'
-                )
-                session.add(new_issue)
-                stats['created'] += 1
+            for key, value in page_stats.items():
+                stats[key] += value
+            high_water_mark = max_updated_at(page, high_water_mark)
         
+        # 游标与issues在同一事务中提交, 同步中途失败时不会前移
+        now = datetime.utcnow()
+        sync_state.last_updated_at = high_water_mark
+        sync_state.etags = etags
+        sync_state.last_synced_at = now
+        sync_state.updated_at = now
+        session.add(sync_state)
         session.commit()
         return stats
     
+    @staticmethod
+    def get_sync_state(
+        session: Session,
+        repo_url: str,
+        labels: Optional[List[str]] = None
+    ) -> RepositorySyncState:
+        """获取 (仓库, 标签过滤) 的同步游标, 不存在时创建一个空游标 (未提交)"""
+        labels_key = ','.join(sorted(labels)) if labels else ''
+        statement = select(RepositorySyncState).where(
+            RepositorySyncState.repository_url == repo_url,
+            RepositorySyncState.labels == labels_key
+        )
+        sync_state = session.exec(statement).first()
+        if not sync_state:
+            sync_state = RepositorySyncState(repository_url=repo_url, labels=labels_key)
+        return sync_state
+    
+    @staticmethod
+    def _compute_priority(gh_issue: dict, priority_mapping: dict) -> int:
+        """按标签映射计算优先级, 取匹配标签中的最大值"""
+        priority = 0
+        for label in gh_issue.get('labels', []):
+            label_name = label['name'].lower()
+            if label_name in priority_mapping:
+                priority = max(priority, priority_mapping[label_name])
+        return priority
+    
+    @staticmethod
+    def upsert_issue_page(
+        session: Session,
+        owner_id: uuid.UUID,
+        repo_url: str,
+        gh_issues: List[dict],
+        priority_mapping: dict
+    ) -> dict:
+        """
+        用一条 INSERT ... ON CONFLICT (repository_url, issue_number) DO UPDATE 写入一页issues
+        已完成或失败的issue不再更新, 计入 skipped
+        :return: 本页的 fetched/created/updated/skipped 统计
+        """
+        now = datetime.utcnow()
+        rows = {}
+        for gh_issue in gh_issues:
+            rows[gh_issue['number']] = {
+                'id': uuid.uuid4(),
+                'owner_id': owner_id,
+                'title': gh_issue['title'][:255],
+                'content': (gh_issue.get('body') or '')[:2048],
+                'repository_url': repo_url,
+                'issue_number': gh_issue['number'],
+                'priority': GitHubSyncService._compute_priority(gh_issue, priority_mapping),
+                'status': 'pending',
+                'created_at': now,
+                'updated_at': now,
+            }
+        
+        stats = {'fetched': len(gh_issues), 'created': 0, 'updated': 0, 'skipped': 0}
+        if not rows:
+            return stats
+        
+        statement = pg_insert(Issue.__table__).values(list(rows.values()))
+        statement = statement.on_conflict_do_update(
+            index_elements=[Issue.repository_url, Issue.issue_number],
+            set_={
+                'title': statement.excluded.title,
+                'content': statement.excluded.content,
+                'priority': statement.excluded.priority,
+                'updated_at': statement.excluded.updated_at,
+            },
+            # 已完成或失败的issue不再更新
+            where=Issue.status.not_in(TERMINAL_STATUSES),
+        ).returning(literal_column("xmax = 0").label("inserted"))
+        
+        # 冲突但未更新的行不会出现在 RETURNING 中; xmax = 0 表示本次新插入
+        results = session.exec(statement).all()
+        stats['created'] = sum(1 for row in results if row.inserted)
+        stats['updated'] = len(results) - stats['created']
+        stats['skipped'] = len(gh_issues) - len(results)
+        return stats
+    
     async def sync_multiple_repos(
         self,
         session: Session,
         owner_id: uuid.UUID,
-        repos: List[dict]
+        repos: List[dict],
+        concurrency: Optional[int] = None
     ) -> dict:
         """
-        同步多个仓库的issues
-        :param session: 数据库会话
+        并发同步多个仓库的issues
+        最多同时同步 concurrency 个仓库, 共享一个 GitHub 连接池和限速器;
+        每个仓库使用独立的数据库会话, 逐页写入并各自提交, 一个仓库失败不影响其他仓库
+        :param session: 数据库会话 (只用于获取数据库连接)
         :param owner_id: Issue拥有者ID
-        :param repos: 仓库列表，每个元素包含 {owner, name, labels}
-        :return: 总的同步统计
+        :param repos: 仓库列表，每个元素包含 {owner, name, labels, full_sync}
+        :param concurrency: 并发同步的仓库数, 默认取 GITHUB_SYNC_CONCURRENCY
+        :return: 总的同步统计, repo_details 与 repos 顺序一致
         """
+        concurrency = max(1, concurrency or settings.GITHUB_SYNC_CONCURRENCY)
+        semaphore = asyncio.Semaphore(concurrency)
+        bind = session.get_bind()
+        
+        async def _sync_repo(repo: dict) -> dict:
+            repo_owner = repo['owner']
+            repo_name = repo['name']
+            async with semaphore:
+                try:
+                    with Session(bind) as repo_session:
+                        stats = await self.sync_issues_to_db(
+                            repo_session, owner_id, repo_owner, repo_name, repo.get('labels'),
+                            full_sync=repo.get('full_sync', False)
+                        )
+                    return {'repo': f"{repo_owner}/{repo_name}", 'stats': stats}
+                except Exception as e:
+                    logger.warning(f"Failed to sync {repo_owner}/{repo_name}: {e}")
+                    return {'repo': f"{repo_owner}/{repo_name}", 'error': str(e)}
+        
+        async with self.shared_client(max_connections=concurrency):
+            repo_details = await asyncio.gather(*(_sync_repo(repo) for repo in repos))
+        
         total_stats = {
             'repos': len(repos),
             'total_fetched': 0,
             'total_created': 0,
             'total_updated': 0,
             'total_skipped': 0,
-            'repo_details': []
+            'repo_details': list(repo_details)
         }
-        
-        for repo in repos:
-            repo_owner = repo['owner']
-            repo_name = repo['name']
-            labels = repo.get('labels')
-            
-            try:
-                stats = await self.sync_issues_to_db(
-                    session, owner_id, repo_owner, repo_name, labels
-                )
+        for detail in repo_details:
+            stats = detail.get('stats')
+            if stats:
                 total_stats['total_fetched'] += stats['fetched']
                 total_stats['total_created'] += stats['created']
                 total_stats['total_updated'] += stats['updated']
                 total_stats['total_skipped'] += stats['skipped']
-                total_stats['repo_details'].append({
-                    'repo': f"{repo_owner}/{repo_name}",
-                    'stats': stats
-                })
-            except Exception as e:
-                total_stats['repo_details'].append({
-                    'repo': f"{repo_owner}/{repo_name}",
-                    'error': str(e)
-                })
         
         return total_stats
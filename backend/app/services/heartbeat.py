@@ -0,0 +1,274 @@
+"""
+节点心跳登记 (write-behind)
+心跳只写入进程内的登记表, 后台线程每隔 HEARTBEAT_FLUSH_INTERVAL_SECONDS 用一条
+UPDATE ... FROM (VALUES ...) 把这段时间内收到的心跳批量写回 Node.last_heartbeat.
+节点健康判断优先读取内存中的最新心跳, 数据库中的值最多落后一个写回周期.
+心跳附带的资源指标同样在写回时批量 upsert 到 node_metrics, 每个节点只保留最新值.
+"""
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Optional
+
+from sqlalchemy import DateTime, Float, Integer, Uuid, cast, column, or_, select, update, values
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.db import engine
+from app.models.node import Node, NodeMetrics, NodeMetricsBase
+from app.models.register_key import RegisterKey
+
+logger = logging.getLogger(__name__)
+
+# 单条批量UPDATE携带的最大行数
+FLUSH_CHUNK_SIZE = 5000
+
+# 心跳中可上报的资源指标字段
+METRIC_FIELDS = tuple(NodeMetricsBase.model_fields)
+_METRIC_TYPES = {
+    "cpu_count": Integer,
+    "load_avg": Float,
+    "mem_free_mb": Integer,
+    "disk_free_mb": Integer,
+    "running_tasks": Integer,
+}
+
+
+class HeartbeatRegistry:
+    """进程内的心跳登记表, 线程安全"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # 本进程收到的每个节点的最新心跳
+        self._last_seen: dict[uuid.UUID, datetime] = {}
+        # 尚未写回数据库的心跳
+        self._pending: dict[uuid.UUID, datetime] = {}
+        # 尚未写回数据库的资源指标: 节点 -> (上报时间, 指标)
+        self._pending_metrics: dict[uuid.UUID, tuple[datetime, dict[str, Any]]] = {}
+        # 已确认存在的节点 -> 确认的时间, HEARTBEAT_NODE_CACHE_SECONDS 内的心跳不再查询 Node 表
+        self._known_nodes: dict[uuid.UUID, float] = {}
+        # 注册密钥缓存: (密钥, 加载时间)
+        self._register_key: Optional[tuple[str, float]] = None
+        self.flushed_rows = 0
+        self.flush_count = 0
+
+    def record(
+        self,
+        node_id: uuid.UUID,
+        at: Optional[datetime] = None,
+        metrics: Optional[dict[str, Any]] = None
+    ) -> None:
+        """
+        记录一次心跳
+        :param metrics: 心跳附带的资源指标 (METRIC_FIELDS 的子集), 未上报的字段写回为空
+        """
+        at = at or datetime.utcnow()
+        with self._lock:
+            self._last_seen[node_id] = at
+            self._pending[node_id] = at
+            if metrics:
+                self._pending_metrics[node_id] = (at, metrics)
+
+    def last_seen(self, node_id: uuid.UUID) -> Optional[datetime]:
+        """本进程收到的该节点最近一次心跳"""
+        with self._lock:
+            return self._last_seen.get(node_id)
+
+    def last_heartbeat(self, node: Node) -> Optional[datetime]:
+        """节点的最新心跳: 内存与数据库中较新的一个"""
+        seen = self.last_seen(node.id)
+        if seen is None:
+            return node.last_heartbeat
+        if node.last_heartbeat is None or node.last_heartbeat < seen:
+            return seen
+        return node.last_heartbeat
+
+    def fresh_node_ids(self, threshold: datetime) -> list[uuid.UUID]:
+        """内存中心跳晚于 threshold 的节点"""
+        with self._lock:
+            return [node_id for node_id, seen in self._last_seen.items() if seen >= threshold]
+
+    def is_known_node(self, session: Session, node_id: uuid.UUID) -> bool:
+        """
+        节点是否存在, 确认过的节点缓存 HEARTBEAT_NODE_CACHE_SECONDS 秒;
+        节点在其它进程中被删除时, 本进程最多在缓存过期前继续接受其心跳
+        """
+        now = time.monotonic()
+        with self._lock:
+            confirmed_at = self._known_nodes.get(node_id)
+        if confirmed_at is not None and now - confirmed_at < settings.HEARTBEAT_NODE_CACHE_SECONDS:
+            return True
+        if session.get(Node, node_id) is None:
+            with self._lock:
+                self._known_nodes.pop(node_id, None)
+            return False
+        with self._lock:
+            self._known_nodes[node_id] = now
+        return True
+
+    def check_register_key(self, session: Session, key: str) -> Optional[bool]:
+        """
+        校验注册密钥, 密钥缓存 HEARTBEAT_KEY_CACHE_SECONDS 秒;
+        不匹配时重新加载一次, 轮换后的新密钥立即生效.
+        本进程轮换密钥时调用 invalidate_register_key, 其它进程在缓存过期后拒绝旧密钥
+        :return: 密钥尚未初始化时返回None
+        """
+        cached = self._register_key
+        if cached and time.monotonic() - cached[1] < settings.HEARTBEAT_KEY_CACHE_SECONDS and cached[0] == key:
+            return True
+        db_key_obj = session.get(RegisterKey, 1)
+        if not db_key_obj:
+            self._register_key = None
+            return None
+        self._register_key = (db_key_obj.key, time.monotonic())
+        return db_key_obj.key == key
+
+    def invalidate_register_key(self) -> None:
+        """丢弃缓存的注册密钥, 下一次心跳重新从数据库加载"""
+        self._register_key = None
+
+    def forget(self, node_id: uuid.UUID) -> None:
+        """节点被删除后清理内存中的记录"""
+        with self._lock:
+            self._last_seen.pop(node_id, None)
+            self._pending.pop(node_id, None)
+            self._pending_metrics.pop(node_id, None)
+            self._known_nodes.pop(node_id, None)
+
+    def flush(self, session: Session) -> int:
+        """
+        把待写回的心跳批量写入数据库, 同时把不在线的节点置为 online
+        只在数据库中的心跳更旧时才覆盖, 多个进程同时写回不会回退时间
+        :return: 写回的心跳数
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            pending_metrics, self._pending_metrics = self._pending_metrics, {}
+        if not pending:
+            return 0
+
+        try:
+            items = list(pending.items())
+            for offset in range(0, len(items), FLUSH_CHUNK_SIZE):
+                rows = values(
+                    column("node_id", Uuid),
+                    column("beat_at", DateTime),
+                    name="heartbeat",
+                ).data(items[offset:offset + FLUSH_CHUNK_SIZE])
+                # 只写心跳时间的批量 UPDATE 不影响Dashboard统计, 不使快照失效
+                session.exec(
+                    update(Node)
+                    .where(
+                        Node.id == rows.c.node_id,
+                        or_(Node.last_heartbeat.is_(None), Node.last_heartbeat < rows.c.beat_at),
+                    )
+                    .values(last_heartbeat=rows.c.beat_at)
+                    .execution_options(synchronize_session=False, dashboard_untracked=True)
+                )
+                # 状态变化很少, 逐个对象更新, 只使所属用户的快照失效
+                chunk_ids = [node_id for node_id, _ in items[offset:offset + FLUSH_CHUNK_SIZE]]
+                for node in session.scalars(
+                    select(Node).where(Node.id.in_(chunk_ids), Node.status.is_distinct_from("online"))
+                ):
+                    node.status = "online"
+            self._upsert_metrics(session, pending_metrics)
+            session.commit()
+        except Exception:
+            session.rollback()
+            # 写回失败时放回队列, 保留较新的心跳
+            with self._lock:
+                for node_id, at in pending.items():
+                    current = self._pending.get(node_id)
+                    if current is None or current < at:
+                        self._pending[node_id] = at
+                for node_id, (at, metrics) in pending_metrics.items():
+                    current_metrics = self._pending_metrics.get(node_id)
+                    if current_metrics is None or current_metrics[0] < at:
+                        self._pending_metrics[node_id] = (at, metrics)
+            raise
+
+        self.flush_count += 1
+        self.flushed_rows += len(pending)
+        return len(pending)
+
+    @staticmethod
+    def _upsert_metrics(
+        session: Session,
+        pending_metrics: dict[uuid.UUID, tuple[datetime, dict[str, Any]]]
+    ) -> None:
+        """
+        INSERT ... SELECT FROM (VALUES ...) JOIN node ... ON CONFLICT DO UPDATE 批量写入最新指标
+        与 node 表连接, 写回前已被删除的节点直接跳过, 不会违反外键
+        """
+        items = [
+            (node_id, at, *(metrics.get(field) for field in METRIC_FIELDS))
+            for node_id, (at, metrics) in pending_metrics.items()
+        ]
+        for offset in range(0, len(items), FLUSH_CHUNK_SIZE):
+            rows = values(
+                column("node_id", Uuid),
+                column("reported_at", DateTime),
+                *(column(field, _METRIC_TYPES[field]) for field in METRIC_FIELDS),
+                name="metrics",
+            ).data(items[offset:offset + FLUSH_CHUNK_SIZE])
+            # 整列都是 NULL 时 VALUES 推断为 text, 显式转换为目标列类型
+            source = select(
+                rows.c.node_id,
+                rows.c.reported_at,
+                *(cast(rows.c[field], _METRIC_TYPES[field]) for field in METRIC_FIELDS),
+            ).join(Node, Node.id == rows.c.node_id)
+            statement = insert(NodeMetrics).from_select(
+                ["node_id", "reported_at", *METRIC_FIELDS], source
+            )
+            statement = statement.on_conflict_do_update(
+                index_elements=[NodeMetrics.node_id],
+                set_={
+                    name: statement.excluded[name]
+                    for name in ("reported_at", *METRIC_FIELDS)
+                },
+                where=NodeMetrics.reported_at < statement.excluded.reported_at,
+            )
+            session.exec(statement)
+
+
+# 全局心跳登记表
+heartbeat_registry = HeartbeatRegistry()
+
+
+def _flush_loop() -> None:  # runs in background thread
+    while not _stop.wait(settings.HEARTBEAT_FLUSH_INTERVAL_SECONDS):
+        flush_heartbeats()
+
+
+def flush_heartbeats() -> int:
+    """立即写回一次, 出错时记录日志并返回0"""
+    try:
+        with Session(engine) as session:
+            return heartbeat_registry.flush(session)
+    except Exception as exc:  # noqa: BLE001
+        logger.error(f"[heartbeat] flush failed: {exc}")
+        return 0
+
+
+_thread: threading.Thread | None = None
+_stop = threading.Event()
+
+
+def start_heartbeat_flusher() -> None:
+    global _thread
+    if _thread and _thread.is_alive():  # 已启动
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_flush_loop, name="heartbeat-flusher", daemon=True)
+    _thread.start()
+
+
+def stop_heartbeat_flusher() -> None:
+    """停止后台线程并写回剩余的心跳"""
+    _stop.set()
+    if _thread:
+        _thread.join(timeout=settings.HEARTBEAT_FLUSH_INTERVAL_SECONDS)
+    flush_heartbeats()
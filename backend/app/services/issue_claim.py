@@ -0,0 +1,116 @@
+"""
+Issue认领服务
+多个后端进程/副本并发消费待处理队列时, 用行锁 + SKIP LOCKED 保证同一个issue只会被认领一次
+"""
+import uuid
+from datetime import datetime
+from typing import Optional, Sequence
+
+from sqlalchemy import update
+from sqlmodel import Session, select
+
+from app.models.issue import Issue
+from app.models.task import Task
+from app.services.dispatch_outbox import DispatchOutboxService
+from app.services.issue_dependency import ready_condition
+
+
+class IssueClaimService:
+    """Issue认领服务"""
+
+    @staticmethod
+    def claim_pending_issues(
+        session: Session,
+        limit: int = 1,
+        node_id: Optional[uuid.UUID] = None,
+        assigned_only: bool = False,
+        owner_id: Optional[uuid.UUID] = None
+    ) -> list[Issue]:
+        """
+        原子地认领接下来的N个待处理issue
+        只认领依赖都已 merged 的issue, 按 priority DESC, created_at ASC 选取, 被其他事务锁住的行直接跳过,
+        选中的行在同一条 UPDATE 中置为 processing 并提交, 不会被重复下发
+        :param session: 数据库会话
+        :param limit: 最多认领的数量
+        :param node_id: 认领后分配到的节点, 为空时保留issue原有的分配
+        :param assigned_only: 只认领已分配节点的issue
+        :param owner_id: 只认领指定用户的issue
+        :return: 认领到的issues (已脱离会话), 按优先级排序
+        """
+        if limit <= 0:
+            return []
+
+        candidates = select(Issue.id).where(ready_condition())
+        if assigned_only:
+            candidates = candidates.where(Issue.assigned_node_id.is_not(None))
+        if owner_id:
+            candidates = candidates.where(Issue.owner_id == owner_id)
+        candidates = (
+            candidates
+            .order_by(Issue.priority.desc(), Issue.created_at.asc())
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+
+        now = datetime.utcnow()
+        changes = {"status": "processing", "started_at": now, "updated_at": now}
+        if node_id:
+            changes["assigned_node_id"] = node_id
+
+        statement = (
+            update(Issue)
+            .where(Issue.id.in_(candidates.scalar_subquery()))
+            .values(**changes)
+            .returning(Issue)
+            .execution_options(synchronize_session=False)
+        )
+        issues = list(session.exec(statement).scalars().all())
+        # 提交前脱离会话, 返回的对象保留RETURNING的值, 访问时不会逐个刷新
+        for issue in issues:
+            session.expunge(issue)
+        session.commit()
+
+        issues.sort(key=lambda issue: (-issue.priority, issue.created_at))
+        return issues
+
+    @staticmethod
+    def lock_issue(session: Session, issue_id: uuid.UUID) -> Optional[Issue]:
+        """
+        对单个issue加行锁并重新读取最新状态
+        行已被其他事务锁住时立即返回None而不是等待, 锁在当前事务提交或回滚时释放
+        """
+        statement = (
+            select(Issue)
+            .where(Issue.id == issue_id)
+            .with_for_update(skip_locked=True)
+            .execution_options(populate_existing=True)
+        )
+        return session.exec(statement).first()
+
+    @staticmethod
+    def requeue_node_issues(session: Session, node_ids: Sequence[uuid.UUID]) -> list[uuid.UUID]:
+        """
+        把分配在这些节点上且仍在处理中的issue放回待处理队列, 节点上运行中的任务标记为失败,
+        发往这些节点的待投递记录置为 failed, 节点恢复后不会再收到已被回收的任务
+        用于节点离线后回收任务, 不提交事务
+        :return: 重新排队的issue id
+        """
+        if not node_ids:
+            return []
+
+        now = datetime.utcnow()
+        issue_ids = list(session.exec(
+            update(Issue)
+            .where(Issue.status == "processing", Issue.assigned_node_id.in_(node_ids))
+            .values(status="pending", assigned_node_id=None, started_at=None, updated_at=now)
+            .returning(Issue.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all())
+        session.exec(
+            update(Task)
+            .where(Task.status == "running", Task.node_id.in_(node_ids))
+            .values(status="failed", result="Node went offline", completed_at=now, updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        DispatchOutboxService.cancel_for_nodes(session, node_ids)
+        return issue_ids
@@ -0,0 +1,359 @@
+"""
+Issue依赖调度
+issue 上的 unmet_dependency_count 记录直接依赖中尚未 merged 的数量 (入度计数器):
+- 写入依赖时重新计算该issue的计数, 并检查不会形成环
+- 某个issue变为 merged / 离开 merged 时, 依赖它的issue计数各减一 / 加一
+- 被删除的未 merged issue 不再阻塞依赖它的issue
+写入依赖持有排他的事务级 advisory lock, 调整依赖方计数持有同一个锁的共享模式:
+并发的 merge 与新增依赖总有一方在另一方提交后执行, 计数不会漏掉对方的修改
+计数为0的 pending issue 即为就绪集合, 调度只从就绪集合中认领和分配, 不需要遍历依赖图
+依赖图查询 (get_graph) 用一条递归CTE取出一组issue的传递依赖闭包, 拓扑排序和关键路径在内存中计算
+"""
+import heapq
+import uuid
+from collections.abc import Iterable
+from typing import Any, Literal, Optional
+
+from sqlalchemy import and_, delete, event, func, insert, literal, union_all, update
+from sqlalchemy.orm import attributes
+from sqlmodel import Session, select
+
+from app.models.issue import (
+    DependencyGraphEdge,
+    DependencyGraphNode,
+    Issue,
+    IssueDependencyGraph,
+    IssueDependencyLink,
+)
+from app.services.leader import LOCK_NAMESPACE
+
+# 依赖写入互斥锁 (事务级 advisory lock), 避免两个并发事务各加一条边形成环
+DEPENDENCY_WRITE_LOCK_KEY = 100
+
+MERGED_STATUS = "merged"
+
+GraphDirection = Literal["both", "ancestors", "descendants"]
+# 闭包中节点的关系, 一个issue同时满足多个关系时取靠前的
+GRAPH_RELATIONS = ("seed", "ancestor", "descendant")
+
+
+class DependencyCycleError(ValueError):
+    """写入的依赖会形成环"""
+
+    def __init__(self, issue_id: uuid.UUID, dependency_id: uuid.UUID) -> None:
+        super().__init__(
+            f"Issue {dependency_id} already depends on issue {issue_id}, dependency would create a cycle"
+        )
+        self.issue_id = issue_id
+        self.dependency_id = dependency_id
+
+
+def ready_condition() -> Any:
+    """就绪issue的过滤条件: 待处理且所有依赖都已 merged"""
+    return (Issue.status == "pending") & (Issue.unmet_dependency_count == 0)
+
+
+class IssueDependencyService:
+    """Issue依赖服务"""
+
+    @staticmethod
+    def find_cycle(
+        session: Session,
+        issue_id: uuid.UUID,
+        dependency_ids: Iterable[uuid.UUID]
+    ) -> uuid.UUID | None:
+        """
+        检查 issue_id 依赖 dependency_ids 后是否成环: 从这些依赖出发沿已有的边递归查找,
+        能回到 issue_id 即成环. 一条递归CTE完成, UNION 去重, 已有的环也不会导致死循环
+        :return: 导致成环的直接依赖, 不成环时返回None
+        """
+        dependency_ids = list(dependency_ids)
+        if not dependency_ids:
+            return None
+        if issue_id in dependency_ids:
+            return issue_id
+
+        link = IssueDependencyLink.__table__
+        seeds = select(
+            link.c.depends_on_issue_id.label("issue_id"),
+            link.c.issue_id.label("root_id"),
+        ).where(link.c.issue_id.in_(dependency_ids))
+        reachable = seeds.cte("reachable", recursive=True)
+        reachable = reachable.union(
+            select(link.c.depends_on_issue_id, reachable.c.root_id).join(
+                reachable, link.c.issue_id == reachable.c.issue_id
+            )
+        )
+        statement = select(reachable.c.root_id).where(reachable.c.issue_id == issue_id).limit(1)
+        return session.exec(statement).first()
+
+    @staticmethod
+    def set_dependencies(
+        session: Session,
+        issue_id: uuid.UUID,
+        dependency_ids: set[uuid.UUID]
+    ) -> None:
+        """
+        替换issue的全部依赖并重新计算入度计数, 成环时抛出 DependencyCycleError
+        持有事务级锁直到提交, 不提交事务
+        """
+        session.exec(
+            select(func.pg_advisory_xact_lock(LOCK_NAMESPACE, DEPENDENCY_WRITE_LOCK_KEY))
+        )
+        cycle = IssueDependencyService.find_cycle(session, issue_id, dependency_ids)
+        if cycle is not None:
+            raise DependencyCycleError(issue_id, cycle)
+
+        session.exec(delete(IssueDependencyLink).where(IssueDependencyLink.issue_id == issue_id))
+        if dependency_ids:
+            session.exec(
+                insert(IssueDependencyLink),
+                params=[
+                    {"issue_id": issue_id, "depends_on_issue_id": dependency_id}
+                    for dependency_id in dependency_ids
+                ],
+            )
+        IssueDependencyService.refresh_counts(session, [issue_id])
+
+    @staticmethod
+    def refresh_counts(session: Session, issue_ids: list[uuid.UUID]) -> None:
+        """按当前依赖重新计算这些issue的入度计数"""
+        if not issue_ids:
+            return
+        dependency = Issue.__table__.alias("dependency")
+        unmet = (
+            select(func.count())
+            .select_from(IssueDependencyLink)
+            .join(dependency, dependency.c.id == IssueDependencyLink.depends_on_issue_id)
+            .where(
+                IssueDependencyLink.issue_id == Issue.id,
+                dependency.c.status != MERGED_STATUS,
+            )
+            .scalar_subquery()
+        )
+        session.exec(
+            update(Issue)
+            .where(Issue.id.in_(issue_ids))
+            .values(unmet_dependency_count=unmet)
+            .execution_options(synchronize_session="fetch")
+        )
+
+    @staticmethod
+    def adjust_dependents(
+        connection: Any,
+        issue_ids: list[uuid.UUID],
+        delta: int
+    ) -> None:
+        """
+        依赖 issue_ids 的issue入度计数加上 delta, 一条UPDATE完成
+        先取得依赖写入锁的共享模式 (直到事务结束), 与 set_dependencies 互斥, 彼此之间不互斥
+        """
+        if not issue_ids:
+            return
+        connection.execute(
+            select(func.pg_advisory_xact_lock_shared(LOCK_NAMESPACE, DEPENDENCY_WRITE_LOCK_KEY))
+        )
+        link = IssueDependencyLink.__table__
+        dependents = select(link.c.issue_id).where(link.c.depends_on_issue_id.in_(issue_ids))
+        connection.execute(
+            Issue.__table__.update()
+            .where(Issue.__table__.c.id.in_(dependents))
+            .values(
+                unmet_dependency_count=func.greatest(
+                    Issue.__table__.c.unmet_dependency_count + literal(delta), 0
+                )
+            )
+        )
+
+    @staticmethod
+    def get_ready_issues(
+        session: Session,
+        limit: int = 100,
+        owner_id: uuid.UUID | None = None
+    ) -> list[Issue]:
+        """就绪集合: 按 priority DESC, created_at ASC 返回依赖都已 merged 的 pending issue"""
+        statement = select(Issue).where(ready_condition())
+        if owner_id:
+            statement = statement.where(Issue.owner_id == owner_id)
+        statement = statement.order_by(Issue.priority.desc(), Issue.created_at.asc()).limit(limit)
+        return list(session.exec(statement).all())
+
+    @staticmethod
+    def get_graph(
+        session: Session,
+        issue_ids: Iterable[uuid.UUID],
+        direction: GraphDirection = "both",
+        owner_id: Optional[uuid.UUID] = None
+    ) -> IssueDependencyGraph:
+        """
+        一组issue的依赖图: 传递依赖的祖先 (被依赖) 和后代 (依赖它们的issue), 以及闭包内的全部边
+        闭包、节点属性和边在一条语句中取出: 两个递归CTE沿依赖边向上/向下展开 (UNION 去重, 线性于闭包大小),
+        结果每行是一个节点和它在闭包内的一条依赖边
+        :param issue_ids: 查询的issue, 不存在的忽略
+        :param direction: 只展开祖先或后代时可减少查询量
+        :param owner_id: 只返回该用户的issue, 边的两端都须在结果中
+        """
+        seeds = list(dict.fromkeys(issue_ids))
+        if not seeds:
+            return IssueDependencyService.build_graph([], [])
+
+        link = IssueDependencyLink.__table__
+        issue = Issue.__table__
+        parts = [
+            select(issue.c.id.label("id"), literal(0).label("rank")).where(issue.c.id.in_(seeds))
+        ]
+        if direction in ("both", "ancestors"):
+            ancestors = select(link.c.depends_on_issue_id.label("id")).where(
+                link.c.issue_id.in_(seeds)
+            ).cte("ancestors", recursive=True)
+            ancestors = ancestors.union(
+                select(link.c.depends_on_issue_id).join(ancestors, link.c.issue_id == ancestors.c.id)
+            )
+            parts.append(select(ancestors.c.id, literal(1)))
+        if direction in ("both", "descendants"):
+            descendants = select(link.c.issue_id.label("id")).where(
+                link.c.depends_on_issue_id.in_(seeds)
+            ).cte("descendants", recursive=True)
+            descendants = descendants.union(
+                select(link.c.issue_id).join(descendants, link.c.depends_on_issue_id == descendants.c.id)
+            )
+            parts.append(select(descendants.c.id, literal(2)))
+
+        closure = union_all(*parts).subquery("closure")
+        members = select(closure.c.id, func.min(closure.c.rank).label("rank")).group_by(
+            closure.c.id
+        ).cte("members")
+        edge = link.alias("edge")
+        statement = (
+            select(
+                issue.c.id,
+                issue.c.title,
+                issue.c.status,
+                issue.c.priority,
+                issue.c.unmet_dependency_count,
+                members.c.rank,
+                edge.c.depends_on_issue_id,
+            )
+            .join(members, members.c.id == issue.c.id)
+            .outerjoin(
+                edge,
+                and_(
+                    edge.c.issue_id == issue.c.id,
+                    edge.c.depends_on_issue_id.in_(select(members.c.id)),
+                ),
+            )
+        )
+        if owner_id:
+            statement = statement.where(issue.c.owner_id == owner_id)
+
+        nodes: dict[uuid.UUID, DependencyGraphNode] = {}
+        edges: list[DependencyGraphEdge] = []
+        for row in session.exec(statement):
+            if row.id not in nodes:
+                nodes[row.id] = DependencyGraphNode(
+                    id=row.id,
+                    title=row.title,
+                    status=row.status,
+                    priority=row.priority,
+                    unmet_dependency_count=row.unmet_dependency_count,
+                    relation=GRAPH_RELATIONS[row.rank],
+                )
+            if row.depends_on_issue_id is not None:
+                edges.append(
+                    DependencyGraphEdge(issue_id=row.id, depends_on_issue_id=row.depends_on_issue_id)
+                )
+        # owner_id 过滤掉的issue不能作为边的端点
+        edges = [item for item in edges if item.depends_on_issue_id in nodes]
+        return IssueDependencyService.build_graph(list(nodes.values()), edges)
+
+    @staticmethod
+    def build_graph(
+        nodes: list[DependencyGraphNode],
+        edges: list[DependencyGraphEdge]
+    ) -> IssueDependencyGraph:
+        """
+        拓扑排序 (Kahn, 被依赖的issue在前, 同一层按 priority 倒序) 并沿拓扑序计算关键路径:
+        每个issue的最长依赖链 = 自身 (未 merged 计1, 已 merged 计0) + 其依赖中最长的链
+        """
+        by_id = {node.id: node for node in nodes}
+        dependencies: dict[uuid.UUID, list[uuid.UUID]] = {node.id: [] for node in nodes}
+        dependents: dict[uuid.UUID, list[uuid.UUID]] = {node.id: [] for node in nodes}
+        for item in edges:
+            dependencies[item.issue_id].append(item.depends_on_issue_id)
+            dependents[item.depends_on_issue_id].append(item.issue_id)
+
+        def _key(issue_id: uuid.UUID) -> tuple[int, uuid.UUID]:
+            return -by_id[issue_id].priority, issue_id
+
+        remaining = {issue_id: len(deps) for issue_id, deps in dependencies.items()}
+        heap = [_key(issue_id) for issue_id, count in remaining.items() if count == 0]
+        heapq.heapify(heap)
+        order: list[uuid.UUID] = []
+        while heap:
+            _, issue_id = heapq.heappop(heap)
+            order.append(issue_id)
+            for dependent in dependents[issue_id]:
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    heapq.heappush(heap, _key(dependent))
+
+        longest: dict[uuid.UUID, int] = {}
+        previous: dict[uuid.UUID, Optional[uuid.UUID]] = {}
+        for issue_id in order:
+            best = max(dependencies[issue_id], key=lambda dep: longest[dep], default=None)
+            weight = 0 if by_id[issue_id].status == MERGED_STATUS else 1
+            longest[issue_id] = weight + (longest[best] if best is not None else 0)
+            previous[issue_id] = best
+
+        critical_path: list[uuid.UUID] = []
+        tail = max(order, key=lambda issue_id: longest[issue_id], default=None)
+        while tail is not None:
+            critical_path.append(tail)
+            tail = previous[tail]
+        critical_path.reverse()
+
+        ordered = set(order)
+        return IssueDependencyGraph(
+            nodes=nodes,
+            edges=edges,
+            ancestor_ids=[node.id for node in nodes if node.relation == "ancestor"],
+            descendant_ids=[node.id for node in nodes if node.relation == "descendant"],
+            topological_order=order,
+            critical_path=critical_path,
+            critical_path_length=longest[critical_path[-1]] if critical_path else 0,
+            cycle_issue_ids=[node.id for node in nodes if node.id not in ordered],
+        )
+
+
+@event.listens_for(Session, "before_flush")
+def _track_merged_transitions(session: Session, _flush_context: Any, _instances: Any) -> None:
+    """
+    ORM 写入 issue 状态时维护依赖它的issue的入度计数
+    批量 UPDATE 改变 merged 状态时须自行调用 IssueDependencyService.adjust_dependents
+    """
+    became_merged: list[uuid.UUID] = []
+    left_merged: list[uuid.UUID] = []
+    for obj in session.dirty:
+        if not isinstance(obj, Issue):
+            continue
+        history = attributes.get_history(obj, "status")
+        if not history.has_changes():
+            continue
+        was_merged = MERGED_STATUS in (history.deleted or ())
+        if obj.status == MERGED_STATUS and not was_merged:
+            became_merged.append(obj.id)
+        elif obj.status != MERGED_STATUS and was_merged:
+            left_merged.append(obj.id)
+
+    # 删除未 merged 的issue: 依赖它的issue少了一个未满足的依赖 (边由外键级联删除)
+    removed = [
+        obj.id
+        for obj in session.deleted
+        if isinstance(obj, Issue) and obj.status != MERGED_STATUS
+    ]
+
+    if not (became_merged or left_merged or removed):
+        return
+    connection = session.connection()
+    IssueDependencyService.adjust_dependents(connection, became_merged + removed, -1)
+    IssueDependencyService.adjust_dependents(connection, left_merged, 1)
@@ -0,0 +1,174 @@
+"""
+后台任务选主
+多个 uvicorn worker / 多副本部署时, 每个周期任务 (节点监控、GitHub同步、自动处理、工作空间清理)
+只应由一个进程执行. 各进程用 Postgres 会话级 advisory lock 竞争任务对应的锁, 拿到锁的进程成为 leader;
+leader 进程退出或数据库连接断开时锁由 Postgres 自动释放, 其它进程下一次尝试时接管.
+"""
+import logging
+import os
+import socket
+import threading
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+from sqlalchemy import Connection, Engine, text
+
+from app.core.db import engine
+
+logger = logging.getLogger(__name__)
+
+# advisory lock 的第一个键, 区分本服务的锁与其它应用的锁 ("AISE")
+LOCK_NAMESPACE = 0x41495345
+
+# 周期任务 -> advisory lock 的第二个键, 已分配的值不要修改
+JOB_LOCK_KEYS = {
+    "node-monitor": 1,
+    "github-sync": 2,
+    "auto-process": 3,
+    "workspace-cleanup": 4,
+}
+
+# 本进程标识, 写入 leader 连接的 application_name, 状态接口据此显示持有者
+PROCESS_IDENTITY = f"aise:{socket.gethostname()}:{os.getpid()}"
+
+
+class LeaderStatus(BaseModel):
+    """周期任务锁的持有情况"""
+    job: str
+    held: bool  # 是否有进程持有锁
+    holder: Optional[str] = None  # 持有者的 application_name (aise:主机名:进程号)
+    backend_pid: Optional[int] = None  # 持有锁的数据库连接进程号
+    client_addr: Optional[str] = None
+    connected_at: Optional[datetime] = None
+    is_current_process: bool = False  # 是否由响应本次请求的进程持有
+    acquired_at: Optional[datetime] = None  # 本进程取得锁的时间, 仅 is_current_process 时有值
+
+
+class LeaderElection:
+    """
+    单个周期任务的选主
+    成为 leader 后一直占用一条独立的数据库连接, 锁随连接存在;
+    每次 try_acquire 都会确认连接仍然可用, 连接失效即视为失去 leader 身份
+    """
+
+    def __init__(self, job: str, bind: Engine = engine) -> None:
+        if job not in JOB_LOCK_KEYS:
+            raise ValueError(f"Unknown job: {job}")
+        self.job = job
+        self.key = JOB_LOCK_KEYS[job]
+        self._engine = bind
+        self._connection: Optional[Connection] = None
+        self._lock = threading.Lock()
+        self.acquired_at: Optional[datetime] = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._connection is not None
+
+    def try_acquire(self) -> bool:
+        """
+        尝试成为 leader, 已经是 leader 时检查锁是否仍然有效
+        :return: 本进程当前是否应执行该任务
+        """
+        with self._lock:
+            if self._connection is not None:
+                try:
+                    self._connection.execute(text("SELECT 1"))
+                    return True
+                except Exception as exc:  # noqa: BLE001
+                    logger.warning(f"[leader] lost connection holding {self.job}: {exc}")
+                    self._discard()
+
+            connection = self._engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+            try:
+                acquired = connection.execute(
+                    text("SELECT pg_try_advisory_lock(:namespace, :key)"),
+                    {"namespace": LOCK_NAMESPACE, "key": self.key},
+                ).scalar()
+                if not acquired:
+                    connection.close()
+                    return False
+                connection.execute(
+                    text("SELECT set_config('application_name', :name, false)"),
+                    {"name": PROCESS_IDENTITY},
+                )
+            except Exception:
+                connection.invalidate()
+                connection.close()
+                raise
+
+            self._connection = connection
+            self.acquired_at = datetime.utcnow()
+            logger.info(f"[leader] {PROCESS_IDENTITY} became leader of {self.job}")
+            return True
+
+    def release(self) -> None:
+        """主动释放锁 (进程退出时调用, 其它进程可以立即接管)"""
+        with self._lock:
+            if self._connection is None:
+                return
+            try:
+                self._connection.execute(
+                    text("SELECT pg_advisory_unlock(:namespace, :key)"),
+                    {"namespace": LOCK_NAMESPACE, "key": self.key},
+                )
+                # 连接会回到连接池, 恢复默认的 application_name
+                self._connection.execute(text("RESET application_name"))
+                self._connection.close()
+            except Exception:  # noqa: BLE001
+                self._discard()
+            self._connection = None
+            self.acquired_at = None
+
+    def _discard(self) -> None:
+        # 直接关闭底层连接, Postgres 随之释放该连接上的锁
+        try:
+            self._connection.invalidate()
+            self._connection.close()
+        except Exception:  # noqa: BLE001
+            pass
+        self._connection = None
+        self.acquired_at = None
+
+
+# 本进程中各周期任务的选主对象
+leader_elections = {job: LeaderElection(job) for job in JOB_LOCK_KEYS}
+
+
+def release_all() -> None:
+    for election in leader_elections.values():
+        election.release()
+
+
+def get_leader_status(connection: Connection) -> list[LeaderStatus]:
+    """从 pg_locks 查询每个周期任务锁的当前持有者"""
+    rows = connection.execute(
+        text(
+            """
+            SELECT l.objid::bigint AS key, a.pid, a.application_name,
+                   host(a.client_addr) AS client_addr, a.backend_start
+            FROM pg_locks l
+            JOIN pg_stat_activity a ON a.pid = l.pid
+            WHERE l.locktype = 'advisory' AND l.granted
+              AND l.objsubid = 2 AND l.classid::bigint = :namespace
+            """
+        ),
+        {"namespace": LOCK_NAMESPACE},
+    ).all()
+    holders = {row.key: row for row in rows}
+
+    statuses = []
+    for job, key in JOB_LOCK_KEYS.items():
+        row = holders.get(key)
+        election = leader_elections[job]
+        status = LeaderStatus(job=job, held=row is not None)
+        if row is not None:
+            status.holder = row.application_name or None
+            status.backend_pid = row.pid
+            status.client_addr = row.client_addr
+            status.connected_at = row.backend_start
+            status.is_current_process = election.is_leader
+            status.acquired_at = election.acquired_at
+        statuses.append(status)
+    return statuses
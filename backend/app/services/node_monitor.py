@@ -1,55 +1,109 @@
 """后台节点状态监控.
 
 定期扫描所有节点的 last_heartbeat 时间, 若超过阈值则置为 offline.
+心跳先记录在内存中再批量写回, 内存中仍有新鲜心跳的节点不会被置为 offline.
 """
 from __future__ import annotations
 
+import logging
 import threading
 import time
+import uuid
 from datetime import datetime, timedelta
-from typing import Iterable
 
+from sqlalchemy import or_, update
 from sqlmodel import Session, select
 
 from app.core.config import settings
-from app.models import Node
+from app.models import Issue, Node
 from app.core.db import engine
+from app.services.heartbeat import heartbeat_registry
+from app.services.leader import leader_elections
+from app.services.issue_claim import IssueClaimService
+from app.services.issue_dependency import ready_condition
+from app.services.node_selection import NodeSelectionService
+
+logger = logging.getLogger(__name__)
 
 
 def mark_offline_nodes(session: Session) -> int:
     """将超时未心跳的节点标记为 offline.
 
+    一条 UPDATE ... RETURNING 完成, 被标记离线的节点上处理中的issue
+    在同一事务中放回待处理队列, 提交后只把这些issue重新分配给其他在线节点.
     返回修改的节点数量.
     """
     threshold = datetime.utcnow() - timedelta(seconds=settings.NODE_OFFLINE_THRESHOLD_SECONDS)
-    # 选择仍标记为 online 但超过阈值或没有心跳的节点
-    statement = select(Node).where(
-        (Node.status == "online") & (
-            (Node.last_heartbeat.is_(None)) | (Node.last_heartbeat < threshold)
-        )
+    # 仍标记为 online 但超过阈值或没有心跳的节点, 排除心跳尚未写回数据库的节点
+    conditions = [
+        Node.status == "online",
+        or_(Node.last_heartbeat.is_(None), Node.last_heartbeat < threshold),
+    ]
+    fresh_ids = heartbeat_registry.fresh_node_ids(threshold)
+    if fresh_ids:
+        conditions.append(Node.id.not_in(fresh_ids))
+    statement = (
+        update(Node)
+        .where(*conditions)
+        .values(status="offline", updated_at=datetime.utcnow())
+        .returning(Node.id)
+        .execution_options(synchronize_session=False)
+    )
+    offline_ids = list(session.exec(statement).scalars().all())
+    if not offline_ids:
+        return 0
+
+    requeued = IssueClaimService.requeue_node_issues(session, offline_ids)
+    session.commit()
+    logger.warning(
+        f"Marked {len(offline_ids)} nodes offline, requeued {len(requeued)} in-flight issues"
+    )
+    if requeued:
+        stats = reassign_issues(session, requeued)
+        logger.info(f"Reassigned issues after node failure: {stats}")
+    return len(offline_ids)
+
+
+def reassign_issues(session: Session, issue_ids: list[uuid.UUID]) -> dict:
+    """把重新排队的issue按优先级分配到在线节点并提交, 其余待处理的issue仍由定时分配任务处理.
+
+    只分配仍处于就绪状态且未被其它进程分配的issue. 返回分配统计.
+    """
+    stats = {"assigned": 0, "skipped": 0, "no_available_nodes": 0}
+    ready_ids = list(session.exec(
+        select(Issue.id)
+        .where(Issue.id.in_(issue_ids), ready_condition(), Issue.assigned_node_id.is_(None))
+        .order_by(Issue.priority.desc(), Issue.created_at.asc())
+    ).all())
+    if not ready_ids:
+        return stats
+
+    candidates = NodeSelectionService.get_node_candidates(session)
+    if not candidates:
+        stats["no_available_nodes"] = len(ready_ids)
+        return stats
+    assignments, stats["skipped"] = NodeSelectionService.plan_issue_assignments(
+        [(node.id, load) for node, load, _ in candidates], ready_ids
     )
-    nodes: Iterable[Node] = session.exec(statement).all()
-    changed = 0
-    for node in nodes:
-        node.status = "offline"
-        session.add(node)
-        changed += 1
-    if changed:
+    if assignments:
+        NodeSelectionService.bulk_assign_issues(session, assignments)
         session.commit()
-    return changed
+        stats["assigned"] = len(assignments)
+    return stats
 
 
 def _loop():  # runs in background thread
     interval = settings.NODE_OFFLINE_CHECK_INTERVAL_SECONDS
+    election = leader_elections["node-monitor"]
     while True:
         try:
-            with Session(engine) as session:
-                changed = mark_offline_nodes(session)
-                # 可在未来替换为 logger
-                # print(f"[node_monitor] marked {changed} nodes offline")
+            # 多进程部署时只有 leader 执行扫描, 其它进程每个周期尝试接管
+            if election.try_acquire():
+                with Session(engine) as session:
+                    mark_offline_nodes(session)
         except Exception as exc:  # noqa: BLE001
             # 简单吞掉异常以避免线程退出
-            print(f"[node_monitor] error: {exc}")
+            logger.error(f"[node_monitor] error: {exc}")
         time.sleep(interval)
 
 
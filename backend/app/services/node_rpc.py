@@ -0,0 +1,219 @@
+"""
+节点RPC客户端
+应用生命周期内共享的 httpx 客户端, 每个节点一个长连接池, 避免每次调用都重新握手
+"""
+import importlib.util
+import logging
+import time
+from collections.abc import AsyncIterator
+from typing import Any, Optional
+
+import httpx
+
+from app.core.config import settings
+from app.models.command import (
+    CommandBatchRequest,
+    CommandBatchResponse,
+    CommandOutputChunk,
+    CommandRequest,
+    CommandResponse,
+    CommandStepResult,
+)
+from app.models.node import Node
+
+logger = logging.getLogger(__name__)
+
+
+def node_base_url(node: Node) -> str:
+    """节点 agent 的基础地址"""
+    return f"http://{node.ip}:{settings.NODE_AGENT_PORT}"
+
+
+class NodeRPCClient:
+    """节点RPC客户端, 按节点地址缓存 AsyncClient"""
+
+    def __init__(self) -> None:
+        self._clients: dict[str, httpx.AsyncClient] = {}
+        # 不支持 /execute/batch 的节点 (旧版本 agent), 直接走逐条执行
+        self._batch_unsupported: set[str] = set()
+        # 不支持 /execute/stream 的节点, 直接走缓冲执行
+        self._stream_unsupported: set[str] = set()
+        # HTTP/2 依赖可选的 h2 包, 未安装时回退到 HTTP/1.1 keep-alive
+        self._http2 = settings.NODE_RPC_HTTP2 and importlib.util.find_spec("h2") is not None
+
+    def _client_for(self, base_url: str) -> httpx.AsyncClient:
+        client = self._clients.get(base_url)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                base_url=base_url,
+                http2=self._http2,
+                limits=httpx.Limits(
+                    max_connections=settings.NODE_RPC_MAX_CONNECTIONS_PER_NODE,
+                    max_keepalive_connections=settings.NODE_RPC_MAX_KEEPALIVE_PER_NODE,
+                    keepalive_expiry=settings.NODE_RPC_KEEPALIVE_EXPIRY_SECONDS,
+                ),
+                timeout=httpx.Timeout(
+                    settings.NODE_RPC_TIMEOUT_SECONDS,
+                    connect=settings.NODE_RPC_CONNECT_TIMEOUT_SECONDS,
+                ),
+            )
+            self._clients[base_url] = client
+        return client
+
+    async def post(
+        self,
+        node: Node,
+        path: str,
+        json: Any,
+        timeout: Optional[float] = None,
+        headers: Optional[dict[str, str]] = None
+    ) -> httpx.Response:
+        """
+        向节点发送POST请求并检查响应状态
+        :param timeout: 覆盖默认读写超时, 建连超时保持不变
+        :param headers: 额外的请求头, 如下发任务的 Idempotency-Key
+        """
+        client = self._client_for(node_base_url(node))
+        request_timeout: Any = httpx.USE_CLIENT_DEFAULT
+        if timeout is not None:
+            request_timeout = httpx.Timeout(
+                timeout, connect=settings.NODE_RPC_CONNECT_TIMEOUT_SECONDS
+            )
+        response = await client.post(path, json=json, timeout=request_timeout, headers=headers)
+        response.raise_for_status()
+        return response
+
+    async def execute(
+        self,
+        node: Node,
+        cmd_request: CommandRequest,
+        timeout: Optional[float] = None
+    ) -> CommandResponse:
+        """在节点上执行命令"""
+        response = await self.post(node, "/execute", cmd_request.model_dump(), timeout=timeout)
+        return CommandResponse(**response.json())
+
+    async def execute_batch(
+        self,
+        node: Node,
+        batch: CommandBatchRequest,
+        timeout: Optional[float] = None
+    ) -> CommandBatchResponse:
+        """
+        在节点上按顺序执行一组命令, 一次请求返回每一步的结果和耗时
+        节点 agent 不支持批量接口时回退为逐条执行, 语义保持一致
+        :param timeout: 整批的超时, 默认按步骤数 x 单条命令超时
+        """
+        if timeout is None:
+            timeout = settings.NODE_RPC_TIMEOUT_SECONDS * max(len(batch.steps), 1)
+
+        base_url = node_base_url(node)
+        if base_url not in self._batch_unsupported:
+            try:
+                response = await self.post(node, "/execute/batch", batch.model_dump(), timeout=timeout)
+                return CommandBatchResponse(**response.json())
+            except httpx.HTTPStatusError as exc:
+                if exc.response.status_code not in (404, 405):
+                    raise
+                self._batch_unsupported.add(base_url)
+
+        return await self._execute_sequential(node, batch)
+
+    async def _execute_sequential(
+        self,
+        node: Node,
+        batch: CommandBatchRequest
+    ) -> CommandBatchResponse:
+        """逐条执行批量命令, 耗时在后端侧测量"""
+        batch_started = time.perf_counter()
+        steps: list[CommandStepResult] = []
+        failed = False
+        for cmd_request in batch.steps:
+            if failed and batch.stop_on_failure:
+                steps.append(
+                    CommandStepResult(
+                        **cmd_request.model_dump(),
+                        exit_code=-1,
+                        stdout="",
+                        stderr="",
+                        error_message="Skipped because a previous step failed",
+                        skipped=True,
+                    )
+                )
+                continue
+            started = time.perf_counter()
+            result = await self.execute(node, cmd_request)
+            steps.append(
+                CommandStepResult(
+                    **result.model_dump(),
+                    duration_ms=int((time.perf_counter() - started) * 1000),
+                )
+            )
+            if result.exit_code != 0:
+                failed = True
+
+        return CommandBatchResponse(
+            steps=steps,
+            success=not failed,
+            duration_ms=int((time.perf_counter() - batch_started) * 1000),
+        )
+
+    async def execute_stream(
+        self,
+        node: Node,
+        cmd_request: CommandRequest,
+        timeout: Optional[float] = None
+    ) -> AsyncIterator[CommandOutputChunk]:
+        """
+        在节点上执行命令并逐段返回输出 (节点以 NDJSON 逐行发送)
+        只在调用方取下一段时才继续读取响应, 调用方慢时 TCP 反压会传导到节点
+        节点 agent 不支持流式接口时回退为 /execute, 命令结束后一次返回全部输出
+        :param timeout: 两段输出之间的最长间隔, 默认取命令执行超时
+        """
+        base_url = node_base_url(node)
+        if base_url not in self._stream_unsupported:
+            client = self._client_for(base_url)
+            request_timeout = httpx.Timeout(
+                timeout or settings.NODE_RPC_TIMEOUT_SECONDS,
+                connect=settings.NODE_RPC_CONNECT_TIMEOUT_SECONDS,
+            )
+            async with client.stream(
+                "POST",
+                "/execute/stream",
+                json=cmd_request.model_dump(),
+                timeout=request_timeout,
+                headers={"Accept": "application/x-ndjson"},
+            ) as response:
+                if response.status_code not in (404, 405):
+                    if response.is_error:
+                        await response.aread()
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if line.strip():
+                            yield CommandOutputChunk.model_validate_json(line)
+                    return
+            self._stream_unsupported.add(base_url)
+
+        result = await self.execute(node, cmd_request, timeout=timeout)
+        for stream in ("stdout", "stderr"):
+            if getattr(result, stream):
+                yield CommandOutputChunk(stream=stream, data=getattr(result, stream))
+        if result.error_message:
+            yield CommandOutputChunk(stream="error", data=result.error_message)
+        yield CommandOutputChunk(stream="exit", exit_code=result.exit_code)
+
+    async def aclose(self) -> None:
+        """关闭所有连接池, 在应用退出时调用"""
+        clients = list(self._clients.values())
+        self._clients.clear()
+        self._batch_unsupported.clear()
+        self._stream_unsupported.clear()
+        for client in clients:
+            try:
+                await client.aclose()
+            except Exception as exc:  # noqa: BLE001
+                logger.warning(f"Failed to close node client: {exc}")
+
+
+# 全局节点RPC客户端
+node_rpc = NodeRPCClient()
@@ -1,14 +1,56 @@
 """
 节点选择和负载均衡服务
 智能选择最优节点处理任务
+- least_loaded: 正在处理的issue最少的节点优先
+- weighted: 结合心跳上报的资源指标 (空闲CPU/内存/磁盘/运行任务数) 加权打分, 分高者优先
+- weighted_round_robin / power_of_two / tag_affinity: 见 scheduling_strategies
 """
+import heapq
 import uuid
-from typing import Optional
+from typing import Any, Literal, Optional
 from datetime import datetime, timedelta
+from pydantic import BaseModel
+from sqlalchemy import Select, Text, Uuid, and_, cast, column, false, update, values
+from sqlalchemy.dialects import postgresql
 from sqlmodel import Session, select, func
 
-from app.models.node import Node
+from app.models.node import Node, NodeMetrics, NodeMetricsBase
 from app.models.issue import Issue
+from app.services.heartbeat import heartbeat_registry
+from app.services.issue_dependency import ready_condition
+from app.services.scheduling_strategies import NodeCandidate, SchedulingStrategy, get_strategy
+
+# 单条批量UPDATE携带的最大行数 (每行2个参数, 远低于驱动的65535参数上限)
+BULK_UPDATE_CHUNK_SIZE = 10000
+
+SelectionStrategy = Literal[
+    "least_loaded", "weighted", "weighted_round_robin", "power_of_two", "tag_affinity"
+]
+
+# 本进程的策略实例, 有状态的策略 (轮询位置、随机数) 在多次调度之间共享
+_strategy_instances: dict[str, SchedulingStrategy] = {}
+
+# 指标达到参考值即视为充足 (得满分), 参考值以上不再区分
+CPU_REFERENCE_CORES = 16
+MEM_REFERENCE_MB = 16 * 1024
+DISK_REFERENCE_MB = 50 * 1024
+# 未上报的指标按中间值计分, 旧版本 agent 的节点既不占优也不被排除
+NEUTRAL_SCORE = 0.5
+
+
+class ResourceRequirements(BaseModel):
+    """任务的最低资源需求, 上报了指标且不满足的节点不会被选中"""
+    min_cpu_count: int | None = None
+    min_mem_free_mb: int | None = None
+    min_disk_free_mb: int | None = None
+
+
+class ScoringWeights(BaseModel):
+    """weighted 策略各项得分的权重"""
+    cpu: float = 0.35  # 空闲CPU核数 (核数 - 平均负载)
+    memory: float = 0.2  # 可用内存
+    disk: float = 0.2  # 工作空间可用磁盘
+    tasks: float = 0.25  # 正在运行的任务数, 越少越好
 
 
 class NodeSelectionService:
@@ -33,70 +75,328 @@ class NodeSelectionService:
     
     @staticmethod
     def is_node_healthy(node: Node, max_offline_minutes: int = 5) -> bool:
-        """检查节点是否健康（最近心跳时间）"""
-        if not node.last_heartbeat:
+        """检查节点是否健康（最近心跳时间, 优先使用内存中尚未写回的心跳）"""
+        last_heartbeat = heartbeat_registry.last_heartbeat(node)
+        if not last_heartbeat:
             return False
         
         threshold = datetime.utcnow() - timedelta(minutes=max_offline_minutes)
-        return node.last_heartbeat > threshold
+        return last_heartbeat > threshold
     
+    @staticmethod
+    def get_node_candidates(
+        session: Session,
+        required_tags: Optional[list[str]] = None,
+        max_offline_minutes: int = 5,
+        limit: Optional[int] = None,
+    ) -> list[tuple[Node, int, bool]]:
+        """
+        一次聚合查询获取候选节点及其负载
+        在线 + 心跳健康的节点 LEFT JOIN 正在处理的issue, 按节点 GROUP BY 计数,
+        标签匹配也在SQL中计算, 查询次数与节点数量无关
+        :return: [(节点, 当前负载, 是否匹配标签)], 标签匹配优先、负载升序
+        """
+        statement, workload, tag_match = NodeSelectionService._candidate_statement(
+            required_tags, max_offline_minutes
+        )
+        statement = statement.order_by(tag_match.desc(), workload.asc(), Node.id)
+        if limit is not None:
+            statement = statement.limit(limit)
+
+        rows = session.exec(statement).all()
+        return [(node, load, bool(matched)) for node, load, matched in rows]
+
+    @staticmethod
+    def _candidate_statement(
+        required_tags: Optional[list[str]],
+        max_offline_minutes: int
+    ) -> tuple[Select, Any, Any]:
+        """候选节点聚合查询, 返回 (查询, 负载列, 标签匹配列), 排序由调用方决定"""
+        threshold = datetime.utcnow() - timedelta(minutes=max_offline_minutes)
+        workload = func.count(Issue.id).label("workload")
+
+        if required_tags:
+            # tags 为逗号分隔字符串, 拆分为数组后与所需标签做交集判断
+            node_tags = func.regexp_split_to_array(func.trim(Node.tags), r"\s*,\s*")
+            tag_match = func.coalesce(
+                node_tags.op("&&")(cast(postgresql.array(required_tags), postgresql.ARRAY(Text))),
+                false(),
+            )
+        else:
+            tag_match = false()
+        tag_match = tag_match.label("tag_match")
+
+        statement = (
+            select(Node, workload, tag_match)
+            .outerjoin(
+                Issue,
+                and_(Issue.assigned_node_id == Node.id, Issue.status == "processing"),
+            )
+            .where(
+                Node.status == "online",
+                Node.last_heartbeat.is_not(None),
+                Node.last_heartbeat > threshold,
+            )
+            .group_by(Node.id)
+        )
+        return statement, workload, tag_match
+
+    @staticmethod
+    def meets_requirements(
+        metrics: Optional[NodeMetricsBase],
+        requirements: Optional[ResourceRequirements]
+    ) -> bool:
+        """节点是否满足资源需求, 未上报的指标视为满足"""
+        if metrics is None or requirements is None:
+            return True
+        checks = (
+            (metrics.cpu_count, requirements.min_cpu_count),
+            (metrics.mem_free_mb, requirements.min_mem_free_mb),
+            (metrics.disk_free_mb, requirements.min_disk_free_mb),
+        )
+        return all(
+            actual is None or required is None or actual >= required
+            for actual, required in checks
+        )
+
+    @staticmethod
+    def score_node(
+        metrics: Optional[NodeMetricsBase],
+        workload: int,
+        weights: Optional[ScoringWeights] = None
+    ) -> float:
+        """
+        节点加权得分, 各项归一化到 [0, 1] 后按权重求和, 分数越高越适合接新任务
+        :param workload: 数据库中分配给该节点且正在处理的issue数
+        """
+        weights = weights or ScoringWeights()
+
+        def _ratio(value: Optional[float], reference: float) -> float:
+            if value is None:
+                return NEUTRAL_SCORE
+            return min(max(value, 0) / reference, 1.0)
+
+        idle_cores = None
+        running = workload
+        mem_free = disk_free = None
+        if metrics is not None:
+            if metrics.cpu_count:
+                idle_cores = metrics.cpu_count - (metrics.load_avg or 0)
+            mem_free = metrics.mem_free_mb
+            disk_free = metrics.disk_free_mb
+            # 节点自报的运行任务数包含手动执行的命令, 取两者较大值
+            running = max(workload, metrics.running_tasks or 0)
+
+        return (
+            weights.cpu * _ratio(idle_cores, CPU_REFERENCE_CORES)
+            + weights.memory * _ratio(mem_free, MEM_REFERENCE_MB)
+            + weights.disk * _ratio(disk_free, DISK_REFERENCE_MB)
+            + weights.tasks / (1 + running)
+        )
+
+    @staticmethod
+    def load_candidates(
+        session: Session,
+        required_tags: Optional[list[str]] = None,
+        requirements: Optional[ResourceRequirements] = None,
+        weights: Optional[ScoringWeights] = None,
+        max_per_node: int = 5,
+        max_offline_minutes: int = 5
+    ) -> list[tuple[Node, NodeCandidate, bool]]:
+        """
+        候选节点与 node_metrics 在同一次查询中取出, 转换为策略使用的 NodeCandidate
+        不满足资源需求的节点被排除; 轮询权重取CPU核数, 未上报时为1
+        :return: [(节点, 调度视图, 是否匹配标签)], 按节点ID排序
+        """
+        statement, _, _ = NodeSelectionService._candidate_statement(
+            required_tags, max_offline_minutes
+        )
+        statement = (
+            statement.add_columns(NodeMetrics)
+            .outerjoin(NodeMetrics, NodeMetrics.node_id == Node.id)
+            .group_by(NodeMetrics.node_id)
+            .order_by(Node.id)
+        )
+        rows = session.exec(statement).all()
+
+        candidates = []
+        for node, load, matched, metrics in rows:
+            if not NodeSelectionService.meets_requirements(metrics, requirements):
+                continue
+            tags = frozenset(tag.strip() for tag in (node.tags or "").split(",") if tag.strip())
+            candidate = NodeCandidate(
+                node_id=node.id,
+                workload=load,
+                capacity=max_per_node,
+                tags=tags,
+                weight=float(metrics.cpu_count) if metrics and metrics.cpu_count else 1.0,
+                score=NodeSelectionService.score_node(metrics, load, weights),
+            )
+            candidates.append((node, candidate, bool(matched)))
+        return candidates
+
+    @staticmethod
+    def rank_nodes_by_score(
+        session: Session,
+        required_tags: Optional[list[str]] = None,
+        requirements: Optional[ResourceRequirements] = None,
+        weights: Optional[ScoringWeights] = None,
+        max_offline_minutes: int = 5
+    ) -> list[tuple[Node, float]]:
+        """
+        weighted 策略: 在内存中按资源得分排序
+        标签匹配的节点优先, 其次按得分降序
+        :return: [(节点, 得分)]
+        """
+        candidates = NodeSelectionService.load_candidates(
+            session,
+            required_tags=required_tags,
+            requirements=requirements,
+            weights=weights,
+            max_offline_minutes=max_offline_minutes,
+        )
+        candidates.sort(key=lambda item: (not item[2], -item[1].score))
+        return [(node, candidate.score) for node, candidate, _ in candidates]
+
+    @staticmethod
+    def get_strategy(name: str) -> SchedulingStrategy:
+        """获取本进程共享的策略实例"""
+        if name not in _strategy_instances:
+            _strategy_instances[name] = get_strategy(name)
+        return _strategy_instances[name]
+
     @staticmethod
     def select_best_node(
         session: Session,
-        required_tags: Optional[list[str]] = None
+        required_tags: Optional[list[str]] = None,
+        strategy: SelectionStrategy = "least_loaded",
+        requirements: Optional[ResourceRequirements] = None,
+        max_per_node: int = 5
     ) -> Optional[Node]:
         """
         选择最优节点
         策略：
         1. 优先选择在线且健康的节点
-        2. 考虑标签匹配（如果指定）
-        3. 选择负载最低的节点
+        2. 考虑标签匹配（如果指定, 有匹配节点时只在匹配节点中选择）
+        3. least_loaded 选择负载最低的节点; weighted 排除资源不足的节点后选择得分最高的节点;
+           其它策略在内存中由 scheduling_strategies 选择, 负载达到 max_per_node 的节点不参与
+        健康检查、标签匹配和负载统计都在一次聚合查询中完成
         """
-        available_nodes = NodeSelectionService.get_available_nodes(session)
-        
-        if not available_nodes:
+        if strategy == "weighted":
+            ranked = NodeSelectionService.rank_nodes_by_score(
+                session, required_tags=required_tags, requirements=requirements
+            )
+            return ranked[0][0] if ranked else None
+
+        if strategy != "least_loaded":
+            candidates = NodeSelectionService.load_candidates(
+                session,
+                required_tags=required_tags,
+                requirements=requirements,
+                max_per_node=max_per_node,
+            )
+            nodes = {candidate.node_id: node for node, candidate, _ in candidates}
+            chosen = NodeSelectionService.get_strategy(strategy).choose(
+                [candidate for _, candidate, _ in candidates], required_tags
+            )
+            return nodes[chosen.node_id] if chosen else None
+
+        candidates = NodeSelectionService.get_node_candidates(
+            session, required_tags=required_tags, limit=1
+        )
+        if not candidates:
             return None
-        
-        # 过滤健康的节点
-        healthy_nodes = [
-            node for node in available_nodes 
-            if NodeSelectionService.is_node_healthy(node)
+        best_node, _, _ = candidates[0]
+        return best_node
+
+    @staticmethod
+    def plan_issue_assignments(
+        node_loads: list[tuple[uuid.UUID, int]],
+        issue_ids: list[uuid.UUID],
+        max_per_node: int = 5
+    ) -> tuple[list[tuple[uuid.UUID, uuid.UUID]], int]:
+        """
+        在内存中为按优先级排好序的issues规划节点分配
+        用堆按剩余容量维护节点, 每次取剩余容量最大的节点, 容量耗尽的节点不再入堆
+        :param node_loads: [(节点ID, 当前负载)], 顺序决定同容量时的先后
+        :param issue_ids: 已按优先级排序的issue ID列表
+        :param max_per_node: 每个节点最大同时处理数
+        :return: ([(issue ID, 节点ID)], 因容量不足未分配的issue数量)
+        """
+        # 堆元素: (-剩余容量, 原始顺序, 节点ID)
+        heap = [
+            (load - max_per_node, order, node_id)
+            for order, (node_id, load) in enumerate(node_loads)
+            if load < max_per_node
         ]
-        
-        if not healthy_nodes:
-            return None
-        
-        # 如果指定了标签,优先选择匹配的节点
-        if required_tags:
-            tagged_nodes = []
-            for node in healthy_nodes:
-                if node.tags:
-                    node_tags = [tag.strip() for tag in node.tags.split(',')]
-                    if any(tag in node_tags for tag in required_tags):
-                        tagged_nodes.append(node)
-            
-            if tagged_nodes:
-                healthy_nodes = tagged_nodes
-        
-        # 选择负载最低的节点
-        node_loads = {}
-        for node in healthy_nodes:
-            workload = NodeSelectionService.get_node_workload(session, node.id)
-            node_loads[node.id] = workload
-        
-        # 返回负载最小的节点
-        best_node_id = min(node_loads, key=node_loads.get)
-        return session.get(Node, best_node_id)
-    
+        heapq.heapify(heap)
+
+        assignments: list[tuple[uuid.UUID, uuid.UUID]] = []
+        for index, issue_id in enumerate(issue_ids):
+            if not heap:
+                return assignments, len(issue_ids) - index
+            neg_remaining, order, node_id = heapq.heappop(heap)
+            assignments.append((issue_id, node_id))
+            if neg_remaining + 1 < 0:
+                heapq.heappush(heap, (neg_remaining + 1, order, node_id))
+        return assignments, 0
+
+    @staticmethod
+    def bulk_assign_issues(
+        session: Session,
+        assignments: list[tuple[uuid.UUID, uuid.UUID]]
+    ) -> None:
+        """
+        用 UPDATE ... FROM (VALUES ...) 批量写回issue的节点分配
+        超大批次按 BULK_UPDATE_CHUNK_SIZE 拆分, 避免超出驱动的参数数量上限
+        """
+        now = datetime.utcnow()
+        for offset in range(0, len(assignments), BULK_UPDATE_CHUNK_SIZE):
+            chunk = assignments[offset:offset + BULK_UPDATE_CHUNK_SIZE]
+            rows = values(
+                column("issue_id", Uuid),
+                column("node_id", Uuid),
+                name="assignment",
+            ).data(chunk)
+            statement = (
+                update(Issue)
+                .where(Issue.id == rows.c.issue_id)
+                .values(assigned_node_id=rows.c.node_id, updated_at=now)
+                .execution_options(synchronize_session=False)
+            )
+            session.exec(statement)
+
+    @staticmethod
+    def plan_with_strategy(
+        strategy: SchedulingStrategy,
+        candidates: list[NodeCandidate],
+        issue_ids: list[uuid.UUID]
+    ) -> tuple[list[tuple[uuid.UUID, uuid.UUID]], int]:
+        """
+        用指定策略逐个规划节点分配, 每分配一个issue更新内存中的负载
+        :return: ([(issue ID, 节点ID)], 因容量不足未分配的issue数量)
+        """
+        assignments: list[tuple[uuid.UUID, uuid.UUID]] = []
+        for index, issue_id in enumerate(issue_ids):
+            chosen = strategy.choose(candidates)
+            if chosen is None:
+                return assignments, len(issue_ids) - index
+            chosen.workload += 1
+            assignments.append((issue_id, chosen.node_id))
+        return assignments, 0
+
     @staticmethod
     def distribute_issues_to_nodes(
         session: Session,
-        max_per_node: int = 5
+        max_per_node: int = 5,
+        strategy: SelectionStrategy = "least_loaded"
     ) -> dict:
         """
         将待处理的issues分配到可用节点
+        一次读取节点负载快照, 在内存中完成整批分配, 再一次性批量写回
         :param session: 数据库会话
         :param max_per_node: 每个节点最大同时处理数
+        :param strategy: least_loaded 使用按剩余容量的堆, 其它策略逐个调用策略选择
         :return: 分配统计
         """
         stats = {
@@ -105,31 +405,41 @@ class NodeSelectionService:
             'no_available_nodes': 0
         }
         
-        # 获取待处理的issues（按优先级排序）
-        statement = select(Issue).where(
-            Issue.status == "pending"
+        # 获取就绪的issues（依赖都已 merged, 按优先级排序）
+        statement = select(Issue.id).where(
+            ready_condition()
         ).order_by(Issue.priority.desc(), Issue.created_at.asc())
         
-        pending_issues = session.exec(statement).all()
+        pending_issue_ids = list(session.exec(statement).all())
+        if not pending_issue_ids:
+            return stats
         
-        for issue in pending_issues:
-            # 选择最优节点
-            best_node = NodeSelectionService.select_best_node(session)
+        if strategy == "least_loaded":
+            candidates = NodeSelectionService.get_node_candidates(session)
+            if not candidates:
+                stats['no_available_nodes'] = len(pending_issue_ids)
+                return stats
             
-            if not best_node:
-                stats['no_available_nodes'] += 1
-                continue
-            
-            # 检查节点负载
-            current_load = NodeSelectionService.get_node_workload(session, best_node.id)
-            if current_load >= max_per_node:
-                stats['skipped'] += 1
-                continue
+            assignments, skipped = NodeSelectionService.plan_issue_assignments(
+                [(node.id, load) for node, load, _ in candidates],
+                pending_issue_ids,
+                max_per_node=max_per_node,
+            )
+        else:
+            loaded = NodeSelectionService.load_candidates(session, max_per_node=max_per_node)
+            if not loaded:
+                stats['no_available_nodes'] = len(pending_issue_ids)
+                return stats
             
-            # 分配issue到节点
-            issue.assigned_node_id = best_node.id
-            session.add(issue)
-            stats['assigned'] += 1
+            assignments, skipped = NodeSelectionService.plan_with_strategy(
+                NodeSelectionService.get_strategy(strategy),
+                [candidate for _, candidate, _ in loaded],
+                pending_issue_ids,
+            )
+        stats['skipped'] = skipped
         
-        session.commit()
+        if assignments:
+            NodeSelectionService.bulk_assign_issues(session, assignments)
+            session.commit()
+            stats['assigned'] = len(assignments)
         return stats
@@ -1,9 +1,13 @@
 """
 定时任务调度服务
 自动化批量处理issues
+每个进程都可以启动调度器, 各周期任务通过 advisory lock 选主, 同一时刻只有一个进程执行
 """
 import asyncio
 import logging
+import time
+import uuid
+from collections import defaultdict
 from datetime import datetime, timedelta
 from typing import Optional
 from sqlmodel import Session, create_engine, select
@@ -13,7 +17,9 @@ from app.core.db import engine
 from app.models.issue import Issue
 from app.services.workflow import WorkflowService
 from app.services.node_selection import NodeSelectionService
+from app.services.issue_claim import IssueClaimService
 from app.services.github_sync import GitHubSyncService
+from app.services.leader import leader_elections
 
 logger = logging.getLogger(__name__)
 
@@ -21,10 +27,21 @@ logger = logging.getLogger(__name__)
 class SchedulerService:
     """调度服务"""
     
+    # 调度器管理的周期任务, 对应 leader_elections 中的锁
+    JOBS = ("github-sync", "auto-process", "workspace-cleanup")
+    
     def __init__(self):
         self.running = False
         self.tasks = []
     
+    async def _is_leader(self, job: str) -> bool:
+        """本进程是否为该任务的 leader, 不是时调用方等待 LEADER_ELECTION_RETRY_SECONDS 后重试"""
+        try:
+            return await asyncio.to_thread(leader_elections[job].try_acquire)
+        except Exception as e:
+            logger.error(f"Leader election for {job} failed: {str(e)}")
+            return False
+    
     async def sync_github_repos_task(
         self,
         repos: list[dict],
@@ -33,6 +50,9 @@ class SchedulerService:
     ):
         """定时同步GitHub仓库的issues"""
         while self.running:
+            if not await self._is_leader("github-sync"):
+                await asyncio.sleep(settings.LEADER_ELECTION_RETRY_SECONDS)
+                continue
             try:
                 with Session(engine) as session:
                     github_service = GitHubSyncService()
@@ -55,33 +75,34 @@ class SchedulerService:
     ):
         """定时自动处理待处理的issues"""
         while self.running:
+            if not await self._is_leader("auto-process"):
+                await asyncio.sleep(settings.LEADER_ELECTION_RETRY_SECONDS)
+                continue
             try:
                 with Session(engine) as session:
                     # 1. 分配issues到节点
                     distribute_stats = NodeSelectionService.distribute_issues_to_nodes(
-                        session, max_per_node=5
+                        session,
+                        max_per_node=5,
+                        strategy=settings.SCHEDULER_SELECTION_STRATEGY
                     )
                     logger.info(f"Issue distribution: {distribute_stats}")
                     
-                    # 2. 获取已分配但未开始的issues
-                    statement = select(Issue).where(
-                        Issue.status == "pending",
-                        Issue.assigned_node_id.isnot(None)
-                    ).limit(max_per_batch)
-                    
-                    issues_to_process = session.exec(statement).all()
+                    # 2. 认领已分配但未开始的issues (SKIP LOCKED, 多副本不会重复认领)
+                    issues_to_process = IssueClaimService.claim_pending_issues(
+                        session,
+                        limit=max_per_batch,
+                        assigned_only=True
+                    )
                     
-                    # 3. 批量处理issues
-                    for issue in issues_to_process:
-                        try:
-                            await WorkflowService.auto_process_workflow(
-                                session,
-                                issue.id,
-                                issue.assigned_node_id
-                            )
-                            logger.info(f"Issue {issue.id} processed successfully")
-                        except Exception as e:
-                            logger.error(f"Failed to process issue {issue.id}: {str(e)}")
+                    # 3. 按节点并发处理issues
+                    runs = [
+                        (issue.id, issue.assigned_node_id)
+                        for issue in issues_to_process
+                    ]
+                
+                report = await self.process_issues_concurrently(runs)
+                logger.info(f"Auto process report: {report}")
                 
             except Exception as e:
                 logger.error(f"Auto process task failed: {str(e)}")
@@ -89,6 +110,84 @@ class SchedulerService:
             # 等待指定间隔
             await asyncio.sleep(interval_minutes * 60)
     
+    async def process_issues_concurrently(
+        self,
+        runs: list[tuple[uuid.UUID, uuid.UUID]],
+        max_concurrent: Optional[int] = None,
+        max_per_node: Optional[int] = None,
+        run_timeout: Optional[float] = None
+    ) -> dict:
+        """
+        并发执行多个issue的工作流
+        总并发和单节点并发分别由信号量限制, 每个工作流使用独立的数据库会话和超时
+        :param runs: [(issue ID, 节点ID)]
+        :return: 汇总报告
+        """
+        max_concurrent = max_concurrent or settings.SCHEDULER_MAX_CONCURRENT_RUNS
+        max_per_node = max_per_node or settings.SCHEDULER_MAX_RUNS_PER_NODE
+        run_timeout = run_timeout or settings.SCHEDULER_RUN_TIMEOUT_SECONDS
+        
+        global_slots = asyncio.Semaphore(max_concurrent)
+        node_slots: dict[uuid.UUID, asyncio.Semaphore] = defaultdict(
+            lambda: asyncio.Semaphore(max_per_node)
+        )
+        started = time.perf_counter()
+        
+        async def _run(issue_id: uuid.UUID, node_id: uuid.UUID) -> tuple[uuid.UUID, str, float]:
+            async with node_slots[node_id], global_slots:
+                run_started = time.perf_counter()
+                outcome = await self._run_issue_workflow(issue_id, node_id, run_timeout)
+                return node_id, outcome, time.perf_counter() - run_started
+        
+        results = await asyncio.gather(*(_run(issue_id, node_id) for issue_id, node_id in runs))
+        
+        report = {
+            'total': len(runs),
+            'succeeded': 0,
+            'failed': 0,
+            'timed_out': 0,
+            'elapsed_seconds': round(time.perf_counter() - started, 3),
+            'max_run_seconds': round(max((seconds for _, _, seconds in results), default=0.0), 3),
+            'nodes': {}
+        }
+        for node_id, outcome, _ in results:
+            report[outcome] += 1
+            node_report = report['nodes'].setdefault(
+                str(node_id), {'succeeded': 0, 'failed': 0, 'timed_out': 0}
+            )
+            node_report[outcome] += 1
+        return report
+    
+    async def _run_issue_workflow(
+        self,
+        issue_id: uuid.UUID,
+        node_id: uuid.UUID,
+        run_timeout: float
+    ) -> str:
+        """在独立会话中运行单个工作流, 返回 succeeded/failed/timed_out"""
+        with Session(engine) as session:
+            try:
+                await asyncio.wait_for(
+                    WorkflowService.auto_process_workflow(session, issue_id, node_id),
+                    timeout=run_timeout
+                )
+            except asyncio.TimeoutError:
+                logger.error(f"Issue {issue_id} timed out after {run_timeout}s")
+                session.rollback()
+                WorkflowService.mark_issue_failed(
+                    session, issue_id, f"Workflow timed out after {run_timeout}s", node_id=node_id
+                )
+                return 'timed_out'
+            except Exception as e:
+                logger.error(f"Failed to process issue {issue_id}: {str(e)}")
+                return 'failed'
+            
+            issue = session.get(Issue, issue_id)
+            if issue and issue.status == "failed":
+                return 'failed'
+            logger.info(f"Issue {issue_id} processed successfully")
+            return 'succeeded'
+    
     async def cleanup_old_workspaces_task(
         self,
         interval_hours: int = 24,
@@ -96,6 +195,9 @@ class SchedulerService:
     ):
         """定时清理旧的工作空间"""
         while self.running:
+            if not await self._is_leader("workspace-cleanup"):
+                await asyncio.sleep(settings.LEADER_ELECTION_RETRY_SECONDS)
+                continue
             try:
                 with Session(engine) as session:
                     # 获取已完成且超过指定天数的issues
@@ -156,6 +258,9 @@ class SchedulerService:
         for task in self.tasks:
             task.cancel()
         self.tasks.clear()
+        # 释放锁, 其它进程无需等待连接断开即可接管
+        for job in self.JOBS:
+            leader_elections[job].release()
         logger.info("Scheduler stopped")
 
 
@@ -0,0 +1,244 @@
+"""
+调度策略离线模拟器
+离散事件模拟: 按到达时间回放issue (合成或从历史任务导出的轨迹), 用指定策略分配到模拟节点,
+节点处理完成后释放容量并继续分配排队中的issue. 相同的轨迹、节点和随机种子总是得到相同的结果,
+用于在上线前比较不同策略的吞吐量、排队等待时间分布和节点利用率.
+"""
+import heapq
+import math
+import random
+from collections import deque
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+from sqlmodel import Session, select
+
+from app.models.node import NodeMetricsBase
+from app.models.task import Task
+from app.services.node_selection import NodeSelectionService
+from app.services.scheduling_strategies import NodeCandidate, SchedulingStrategy
+
+# 事件类型, 同一时刻先处理完成事件再处理到达事件, 释放的容量可立即被使用
+_COMPLETE = 0
+_ARRIVAL = 1
+
+
+@dataclass
+class TraceItem:
+    """轨迹中的一个issue"""
+    arrival: float  # 到达时间 (秒, 相对轨迹开始)
+    duration: float  # 在速度为1的节点上的处理时长 (秒)
+    tags: tuple[str, ...] = ()
+
+
+@dataclass
+class SimulatedNode:
+    """模拟节点"""
+    node_id: str
+    capacity: int = 2  # 同时处理的issue数
+    cpu_count: int = 4
+    speed: float = 1.0  # 处理速度倍数, 实际耗时 = duration / speed
+    mem_free_mb: int = 8192
+    disk_free_mb: int = 51200
+    tags: frozenset[str] = field(default_factory=frozenset)
+
+
+class NodeUtilization(BaseModel):
+    node_id: str
+    completed: int
+    utilization: float  # 忙碌的槽位时间 / (容量 * 模拟时长)
+
+
+class SimulationReport(BaseModel):
+    """单个策略的模拟结果"""
+    strategy: str
+    completed: int
+    makespan_seconds: float  # 从第一个issue到达到最后一个完成
+    throughput_per_hour: float
+    wait_p50_seconds: float  # 从到达到开始处理的排队时间
+    wait_p99_seconds: float
+    wait_max_seconds: float
+    mean_utilization: float  # 全部槽位的忙碌时间占比
+    nodes: list[NodeUtilization]
+
+
+def percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    """最近秩百分位, sorted_values 须已升序"""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(fraction * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def simulate(
+    trace: Sequence[TraceItem],
+    nodes: Sequence[SimulatedNode],
+    strategy: SchedulingStrategy
+) -> SimulationReport:
+    """
+    用一个策略回放整条轨迹
+    排队中的issue按到达顺序分配, 策略返回None (所有节点满载) 时等待下一次完成事件
+    """
+    candidates = [
+        NodeCandidate(
+            node_id=node.node_id,
+            capacity=node.capacity,
+            tags=node.tags,
+            weight=node.cpu_count,
+        )
+        for node in nodes
+    ]
+    by_id = {node.node_id: node for node in nodes}
+    busy_seconds = {node.node_id: 0.0 for node in nodes}
+    completed_on = {node.node_id: 0 for node in nodes}
+
+    ordered_trace = sorted(trace, key=lambda item: item.arrival)
+    # 事件: (时间, 类型, 序号, 轨迹下标, 完成事件的节点), 序号保证同时刻事件的顺序确定
+    events: list[tuple[float, int, int, int, Optional[NodeCandidate]]] = [
+        (item.arrival, _ARRIVAL, index, index, None) for index, item in enumerate(ordered_trace)
+    ]
+    heapq.heapify(events)
+    sequence = len(events)
+
+    queue: deque[int] = deque()
+    waits: list[float] = []
+    first_arrival = ordered_trace[0].arrival if ordered_trace else 0.0
+    last_completion = first_arrival
+
+    def _update_score(candidate: NodeCandidate) -> None:
+        # 模拟节点的负载与运行中的issue数成正比, 得分只随该节点自身的负载变化
+        node = by_id[candidate.node_id]
+        metrics = NodeMetricsBase(
+            cpu_count=node.cpu_count,
+            load_avg=candidate.workload * node.cpu_count / max(node.capacity, 1),
+            mem_free_mb=node.mem_free_mb,
+            disk_free_mb=node.disk_free_mb,
+        )
+        candidate.score = NodeSelectionService.score_node(metrics, candidate.workload)
+
+    for candidate in candidates:
+        _update_score(candidate)
+
+    while events:
+        now, kind, _, index, candidate = heapq.heappop(events)
+        if kind == _COMPLETE:
+            candidate.workload -= 1
+            _update_score(candidate)
+            completed_on[candidate.node_id] += 1
+            last_completion = now
+        else:
+            queue.append(index)
+
+        while queue:
+            item = ordered_trace[queue[0]]
+            chosen = strategy.choose(candidates, item.tags)
+            if chosen is None:
+                break
+            queue.popleft()
+            chosen.workload += 1
+            _update_score(chosen)
+            waits.append(now - item.arrival)
+            run_seconds = item.duration / by_id[chosen.node_id].speed
+            busy_seconds[chosen.node_id] += run_seconds
+            heapq.heappush(events, (now + run_seconds, _COMPLETE, sequence, -1, chosen))
+            sequence += 1
+
+    makespan = max(last_completion - first_arrival, 0.0)
+    waits.sort()
+    node_reports = [
+        NodeUtilization(
+            node_id=node.node_id,
+            completed=completed_on[node.node_id],
+            utilization=round(
+                busy_seconds[node.node_id] / (node.capacity * makespan) if makespan else 0.0, 4
+            ),
+        )
+        for node in nodes
+    ]
+    completed = sum(completed_on.values())
+    total_slots = sum(node.capacity for node in nodes)
+    return SimulationReport(
+        strategy=strategy.name,
+        completed=completed,
+        makespan_seconds=round(makespan, 3),
+        throughput_per_hour=round(completed * 3600 / makespan, 3) if makespan else 0.0,
+        wait_p50_seconds=round(percentile(waits, 0.5), 3),
+        wait_p99_seconds=round(percentile(waits, 0.99), 3),
+        wait_max_seconds=round(waits[-1], 3) if waits else 0.0,
+        mean_utilization=round(
+            sum(busy_seconds.values()) / (total_slots * makespan), 4
+        ) if total_slots and makespan else 0.0,
+        nodes=node_reports,
+    )
+
+
+def synthetic_trace(
+    count: int,
+    mean_interarrival: float = 30.0,
+    mean_duration: float = 600.0,
+    tag_choices: Sequence[str] = (),
+    seed: int = 0
+) -> list[TraceItem]:
+    """
+    合成轨迹: 泊松到达 (指数间隔), 处理时长为对数正态分布 (少量耗时很长的issue)
+    有 tag_choices 时一半的issue随机要求其中一个标签
+    """
+    rng = random.Random(seed)
+    # 对数正态的均值 = exp(mu + sigma^2 / 2)
+    sigma = 1.0
+    mu = math.log(mean_duration) - sigma ** 2 / 2
+    trace = []
+    now = 0.0
+    for _ in range(count):
+        now += rng.expovariate(1 / mean_interarrival)
+        tags = (rng.choice(tag_choices),) if tag_choices and rng.random() < 0.5 else ()
+        trace.append(TraceItem(arrival=now, duration=rng.lognormvariate(mu, sigma), tags=tags))
+    return trace
+
+
+def synthetic_nodes(count: int, tag_choices: Sequence[str] = (), seed: int = 0) -> list[SimulatedNode]:
+    """合成异构节点: CPU核数 2~32 不等, 处理速度和容量随核数增长, 部分节点带标签"""
+    rng = random.Random(seed)
+    nodes = []
+    for index in range(count):
+        cpu_count = rng.choice((2, 4, 8, 16, 32))
+        tags = frozenset({rng.choice(tag_choices)}) if tag_choices and rng.random() < 0.4 else frozenset()
+        nodes.append(
+            SimulatedNode(
+                node_id=f"node-{index:03d}",
+                capacity=max(1, cpu_count // 4),
+                cpu_count=cpu_count,
+                speed=math.sqrt(cpu_count / 8),
+                mem_free_mb=cpu_count * 2048,
+                disk_free_mb=rng.choice((20, 50, 200)) * 1024,
+                tags=tags,
+            )
+        )
+    return nodes
+
+
+def trace_from_tasks(session: Session, since: Optional[datetime] = None) -> list[TraceItem]:
+    """
+    从历史任务导出轨迹: 到达时间取任务创建时间, 处理时长取开始到完成的时间
+    未完成的任务不计入
+    """
+    statement = select(Task.created_at, Task.started_at, Task.completed_at).where(
+        Task.started_at.is_not(None),
+        Task.completed_at.is_not(None),
+    )
+    if since is not None:
+        statement = statement.where(Task.created_at >= since)
+    rows = session.exec(statement.order_by(Task.created_at)).all()
+    if not rows:
+        return []
+    origin = rows[0][0]
+    return [
+        TraceItem(
+            arrival=(created_at - origin).total_seconds(),
+            duration=max((completed_at - started_at).total_seconds(), 0.0),
+        )
+        for created_at, started_at, completed_at in rows
+    ]
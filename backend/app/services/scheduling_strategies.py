@@ -0,0 +1,176 @@
+"""
+节点选择策略
+策略只依赖内存中的候选节点快照 (NodeCandidate), 线上调度和离线模拟器 (scheduling_simulator) 共用同一套实现:
+- least_loaded: 负载率最低的节点
+- weighted: 资源指标加权得分最高的节点 (得分见 NodeSelectionService.score_node)
+- weighted_round_robin: 按权重 (CPU核数) 平滑加权轮询
+- power_of_two: 随机取两个节点, 选负载率较低的一个
+- tag_affinity: 优先标签匹配的节点, 匹配节点的负载率超过阈值后溢出到其它节点
+除 tag_affinity 外, 有标签匹配的节点时只在匹配节点中选择, 没有匹配节点时退回全部节点
+"""
+import random
+from abc import ABC, abstractmethod
+from collections.abc import Hashable, Sequence
+from dataclasses import dataclass, field
+from typing import Optional
+
+
+@dataclass
+class NodeCandidate:
+    """一个候选节点的调度视图"""
+    node_id: Hashable
+    workload: int = 0  # 正在处理的任务数
+    capacity: int = 5  # 同时处理任务的上限
+    tags: frozenset[str] = field(default_factory=frozenset)
+    weight: float = 1.0  # 轮询权重, 一般取CPU核数
+    score: float = 0.0  # weighted 策略使用的资源得分
+
+    @property
+    def utilization(self) -> float:
+        return self.workload / self.capacity if self.capacity > 0 else 1.0
+
+    @property
+    def has_capacity(self) -> bool:
+        return self.workload < self.capacity
+
+    def matches(self, required_tags: Optional[Sequence[str]]) -> bool:
+        return bool(required_tags) and not self.tags.isdisjoint(required_tags)
+
+
+class SchedulingStrategy(ABC):
+    """节点选择策略, 实例可以保存跨调用的状态 (轮询位置、随机数种子)"""
+
+    name: str
+
+    def eligible(
+        self,
+        candidates: Sequence[NodeCandidate],
+        required_tags: Optional[Sequence[str]] = None
+    ) -> list[NodeCandidate]:
+        """还有空闲容量的节点, 有标签匹配的节点时只保留匹配节点"""
+        available = [candidate for candidate in candidates if candidate.has_capacity]
+        if required_tags:
+            matched = [candidate for candidate in available if candidate.matches(required_tags)]
+            if matched:
+                return matched
+        return available
+
+    @abstractmethod
+    def choose(
+        self,
+        candidates: Sequence[NodeCandidate],
+        required_tags: Optional[Sequence[str]] = None
+    ) -> Optional[NodeCandidate]:
+        """选择一个节点, 没有可用节点时返回None"""
+
+
+class LeastLoadedStrategy(SchedulingStrategy):
+    name = "least_loaded"
+
+    def choose(self, candidates, required_tags=None):
+        eligible = self.eligible(candidates, required_tags)
+        if not eligible:
+            return None
+        # min 在相等时保留先出现的节点, 与候选顺序一致
+        return min(eligible, key=lambda candidate: (candidate.utilization, candidate.workload))
+
+
+class WeightedScoreStrategy(SchedulingStrategy):
+    name = "weighted"
+
+    def choose(self, candidates, required_tags=None):
+        eligible = self.eligible(candidates, required_tags)
+        if not eligible:
+            return None
+        return max(eligible, key=lambda candidate: candidate.score)
+
+
+class WeightedRoundRobinStrategy(SchedulingStrategy):
+    """平滑加权轮询 (nginx 算法): 每轮所有节点加上自身权重, 选当前值最大的节点并减去总权重"""
+
+    name = "weighted_round_robin"
+
+    def __init__(self) -> None:
+        self._current: dict[Hashable, float] = {}
+
+    def choose(self, candidates, required_tags=None):
+        eligible = self.eligible(candidates, required_tags)
+        if not eligible:
+            return None
+        total = 0.0
+        best = None
+        for candidate in eligible:
+            weight = max(candidate.weight, 0.0)
+            total += weight
+            current = self._current.get(candidate.node_id, 0.0) + weight
+            self._current[candidate.node_id] = current
+            if best is None or current > self._current[best.node_id]:
+                best = candidate
+        self._current[best.node_id] -= total
+        return best
+
+
+class PowerOfTwoStrategy(SchedulingStrategy):
+    """随机取两个节点比较负载, 节点多时接近 least_loaded 的效果且不会让所有调度器扎堆同一节点"""
+
+    name = "power_of_two"
+
+    def __init__(self, seed: Optional[int] = None) -> None:
+        self._random = random.Random(seed)
+
+    def choose(self, candidates, required_tags=None):
+        eligible = self.eligible(candidates, required_tags)
+        if len(eligible) <= 1:
+            return eligible[0] if eligible else None
+        first, second = self._random.sample(eligible, 2)
+        if (second.utilization, second.workload) < (first.utilization, first.workload):
+            return second
+        return first
+
+
+class TagAffinityStrategy(SchedulingStrategy):
+    """
+    标签亲和 + 溢出: 匹配节点中负载率最低的节点未超过 spillover_threshold 时使用匹配节点,
+    否则选择全部节点中负载率最低的节点, 避免匹配节点排长队而其它节点空闲
+    """
+
+    name = "tag_affinity"
+
+    def __init__(self, spillover_threshold: float = 0.8) -> None:
+        self.spillover_threshold = spillover_threshold
+
+    def choose(self, candidates, required_tags=None):
+        available = [candidate for candidate in candidates if candidate.has_capacity]
+        if not available:
+            return None
+
+        def _least_loaded(nodes: list[NodeCandidate]) -> NodeCandidate:
+            return min(nodes, key=lambda candidate: (candidate.utilization, candidate.workload))
+
+        matched = [candidate for candidate in available if candidate.matches(required_tags)]
+        if matched:
+            best = _least_loaded(matched)
+            if best.utilization < self.spillover_threshold:
+                return best
+        return _least_loaded(available)
+
+
+STRATEGIES: dict[str, type[SchedulingStrategy]] = {
+    strategy.name: strategy
+    for strategy in (
+        LeastLoadedStrategy,
+        WeightedScoreStrategy,
+        WeightedRoundRobinStrategy,
+        PowerOfTwoStrategy,
+        TagAffinityStrategy,
+    )
+}
+
+
+def get_strategy(name: str, **options) -> SchedulingStrategy:
+    """按名称创建策略实例"""
+    try:
+        strategy_class = STRATEGIES[name]
+    except KeyError:
+        raise ValueError(f"Unknown scheduling strategy: {name}")
+    return strategy_class(**options)
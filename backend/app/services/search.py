@@ -0,0 +1,35 @@
+"""
+列表搜索
+全文检索 (tsvector + GIN) 匹配完整的词, trigram GIN 索引让 ILIKE '%term%' 子串匹配也能走索引,
+两者用 OR 合并, 结果按相关度排序
+"""
+from typing import Any
+
+from sqlalchemy import ColumnElement, func, or_
+
+# 与 search_vector 生成列使用的分词配置一致, simple 不做词干化, 适合代码标识符和中英文混排
+SEARCH_CONFIG = "simple"
+
+
+def build_text_search(
+    search_vector: ColumnElement[Any],
+    columns: list[ColumnElement[Any]],
+    term: str
+) -> tuple[ColumnElement[bool], ColumnElement[float]]:
+    """
+    构造搜索条件和相关度
+    :param search_vector: 表上的 tsvector 生成列
+    :param columns: 做子串匹配的文本列, 第一列 (标题/名称) 额外参与相似度打分
+    :param term: 用户输入的搜索词, 支持 websearch 语法 (引号短语, -排除, or)
+    :return: (过滤条件, 相关度表达式), 相关度越大越相关
+    """
+    query = func.websearch_to_tsquery(SEARCH_CONFIG, term)
+    pattern = f"%{term}%"
+    condition = or_(
+        search_vector.op("@@")(query),
+        *(column.ilike(pattern) for column in columns),
+    )
+    rank = func.ts_rank_cd(search_vector, query) + func.coalesce(
+        func.similarity(columns[0], term), 0
+    )
+    return condition, rank
@@ -0,0 +1,171 @@
+"""
+任务日志存储
+步骤的完整 stdout/stderr 按 TASK_LOG_CHUNK_BYTES 切分为固定大小的段, 每段单独压缩后写入 workflow_log_chunk,
+键为 (WorkflowLog, 输出流, 序号). 读取时按字节范围只取出并解压覆盖该范围的段, 不需要加载整个日志.
+压缩默认使用 gzip; 安装了可选的 zstandard 包且 TASK_LOG_CODEC=zstd 时使用 zstd, 读取时按每段记录的 codec 解压.
+"""
+import gzip
+import importlib.util
+import uuid
+from typing import Optional
+
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.models.workflow_log import WorkflowLogChunk, WorkflowLogOutputPage
+
+LOG_STREAMS = ("stdout", "stderr")
+
+_zstd = None
+if importlib.util.find_spec("zstandard") is not None:
+    import zstandard as _zstd
+
+
+def _compress(data: bytes) -> tuple[str, bytes]:
+    """按配置压缩一段输出, 返回 (codec, 压缩后的数据)"""
+    if settings.TASK_LOG_CODEC == "zstd" and _zstd is not None:
+        return "zstd", _zstd.ZstdCompressor().compress(data)
+    return "gzip", gzip.compress(data, compresslevel=6)
+
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    if codec == "zstd":
+        if _zstd is None:
+            raise RuntimeError("zstandard is required to read zstd-compressed task logs")
+        return _zstd.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+def _complete_utf8_length(data: bytes) -> int:
+    """去掉末尾不完整的 UTF-8 字符后的长度, 分页时不会把一个字符拆到两页"""
+    for back in range(1, min(4, len(data)) + 1):
+        byte = data[-back]
+        if byte & 0xC0 == 0x80:  # 续字节, 继续向前找首字节
+            continue
+        if byte < 0x80:
+            length = 1
+        elif byte >> 5 == 0b110:
+            length = 2
+        elif byte >> 4 == 0b1110:
+            length = 3
+        else:
+            length = 4
+        return len(data) - back if length > back else len(data)
+    return len(data)
+
+
+class TaskLogStore:
+    """任务日志存储"""
+
+    @staticmethod
+    def append(session: Session, log_id: uuid.UUID, stream: str, text: str) -> int:
+        """
+        追加一段输出, 不提交事务
+        最后一段未写满时先补满该段, 再按固定大小写入新的段
+        :return: 追加后该输出流的总字节数
+        """
+        if stream not in LOG_STREAMS:
+            raise ValueError(f"Unknown log stream: {stream}")
+        data = text.encode("utf-8")
+        chunk_bytes = settings.TASK_LOG_CHUNK_BYTES
+
+        last = session.exec(
+            select(WorkflowLogChunk)
+            .where(WorkflowLogChunk.log_id == log_id, WorkflowLogChunk.stream == stream)
+            .order_by(WorkflowLogChunk.seq.desc())
+            .limit(1)
+        ).first()
+        seq, offset = 0, 0
+        if last is not None:
+            seq, offset = last.seq, last.offset
+            if last.raw_size < chunk_bytes:
+                # 把未写满的最后一段与新数据一起重新切分
+                data = _decompress(last.codec, last.data) + data
+                session.delete(last)
+                session.flush()
+            else:
+                seq, offset = last.seq + 1, last.offset + last.raw_size
+
+        if not data:
+            return offset
+        chunks = []
+        for start in range(0, len(data), chunk_bytes):
+            piece = data[start:start + chunk_bytes]
+            codec, compressed = _compress(piece)
+            chunks.append(
+                WorkflowLogChunk(
+                    log_id=log_id,
+                    stream=stream,
+                    seq=seq,
+                    offset=offset,
+                    raw_size=len(piece),
+                    codec=codec,
+                    data=compressed,
+                )
+            )
+            seq += 1
+            offset += len(piece)
+        session.add_all(chunks)
+        return offset
+
+    @staticmethod
+    def sizes(session: Session, log_ids: list[uuid.UUID]) -> dict[tuple[uuid.UUID, str], int]:
+        """一次查询取出多个日志各输出流的总字节数"""
+        if not log_ids:
+            return {}
+        rows = session.exec(
+            select(
+                WorkflowLogChunk.log_id,
+                WorkflowLogChunk.stream,
+                func.sum(WorkflowLogChunk.raw_size),
+            )
+            .where(WorkflowLogChunk.log_id.in_(log_ids))
+            .group_by(WorkflowLogChunk.log_id, WorkflowLogChunk.stream)
+        ).all()
+        return {(log_id, stream): int(total) for log_id, stream, total in rows}
+
+    @staticmethod
+    def read(
+        session: Session,
+        log_id: uuid.UUID,
+        stream: str = "stdout",
+        offset: int = 0,
+        limit: Optional[int] = None
+    ) -> WorkflowLogOutputPage:
+        """
+        读取 [offset, offset + limit) 字节范围内的输出
+        只查询和解压与该范围重叠的段; 末尾落在多字节字符中间时截到字符边界
+        """
+        limit = limit or settings.TASK_LOG_CHUNK_BYTES
+        offset = max(offset, 0)
+        end = offset + limit
+        total = session.exec(
+            select(func.coalesce(func.sum(WorkflowLogChunk.raw_size), 0)).where(
+                WorkflowLogChunk.log_id == log_id, WorkflowLogChunk.stream == stream
+            )
+        ).one()
+        chunks = session.exec(
+            select(WorkflowLogChunk)
+            .where(
+                WorkflowLogChunk.log_id == log_id,
+                WorkflowLogChunk.stream == stream,
+                WorkflowLogChunk.offset < end,
+                WorkflowLogChunk.offset + WorkflowLogChunk.raw_size > offset,
+            )
+            .order_by(WorkflowLogChunk.seq)
+        ).all()
+
+        data = b"".join(_decompress(chunk.codec, chunk.data) for chunk in chunks)
+        start = offset - chunks[0].offset if chunks else 0
+        window = data[start:start + limit]
+        if offset + len(window) < total:
+            window = window[:_complete_utf8_length(window)] or window
+        return WorkflowLogOutputPage(
+            log_id=log_id,
+            stream=stream,
+            offset=offset,
+            next_offset=offset + len(window),
+            total=total,
+            data=window.decode("utf-8", errors="replace"),
+        )
@@ -0,0 +1,138 @@
+"""依赖图查询基准测试
+
+在一个事务中写入合成的分层依赖图 (默认 50000 个issue, 每层 500 个, 每个issue依赖上一层的两个issue),
+对若干个种子issue比较两种取传递依赖的方式:
+- per-issue: 逐个issue查询直接依赖再继续展开 (相当于前端反复调用 GET /issues/{id})
+- recursive CTE: IssueDependencyService.get_graph 一条语句取出闭包, 并计算拓扑顺序和关键路径
+输出两种方式的查询次数和耗时. 结束后整个事务回滚, 不会改动数据库.
+
+用法: python scripts/benchmark_dependency_graph.py [--issues 50000] [--width 500] [--seeds 3]
+"""
+import argparse
+import logging
+import time
+from collections import deque
+
+from sqlalchemy import text
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.core.db import engine
+from app.models import User
+from app.models.issue import IssueDependencyLink
+from app.services.issue_dependency import IssueDependencyService
+
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+logger = logging.getLogger(__name__)
+
+SEED_SQL = [
+    """
+    CREATE TEMP TABLE bench_dep (n integer PRIMARY KEY, id uuid NOT NULL) ON COMMIT DROP
+    """,
+    """
+    INSERT INTO bench_dep SELECT g, gen_random_uuid() FROM generate_series(1, :issues) AS g
+    """,
+    """
+    INSERT INTO issue (id, title, status, priority, owner_id, created_at, updated_at)
+    SELECT id, 'bench-dep-' || n,
+           CASE WHEN n <= :issues / 5 THEN 'merged' ELSE 'pending' END,
+           n % 10, :owner_id, now() - (:issues - n) * interval '1 second', now()
+    FROM bench_dep
+    """,
+    # 第 n 个issue依赖上一层同一位置的issue和上一层中伪随机的另一个issue
+    """
+    INSERT INTO issue_dependency_link (issue_id, depends_on_issue_id)
+    SELECT DISTINCT child.id, parent.id
+    FROM bench_dep AS child
+    CROSS JOIN LATERAL (
+        VALUES (child.n - :width),
+               (((child.n - 1) / :width - 1) * :width + (child.n * 7919) % :width + 1)
+    ) AS dep(n)
+    JOIN bench_dep AS parent ON parent.n = dep.n
+    WHERE child.n > :width
+    """,
+    "ANALYZE issue",
+    "ANALYZE issue_dependency_link",
+]
+
+
+def walk_per_issue(session: Session, seed) -> tuple[int, int]:
+    """逐个issue查询直接的依赖和被依赖关系展开闭包, 返回 (查询次数, 闭包大小)"""
+    queries = 0
+    seen = {seed}
+    pending = deque([seed])
+    while pending:
+        issue_id = pending.popleft()
+        for column, other in (
+            (IssueDependencyLink.issue_id, "depends_on_issue_id"),
+            (IssueDependencyLink.depends_on_issue_id, "issue_id"),
+        ):
+            links = session.exec(select(IssueDependencyLink).where(column == issue_id)).all()
+            queries += 1
+            for link in links:
+                neighbour = getattr(link, other)
+                if neighbour not in seen:
+                    seen.add(neighbour)
+                    pending.append(neighbour)
+    return queries, len(seen)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--issues", type=int, default=50000)
+    parser.add_argument("--width", type=int, default=500, help="每层的issue数")
+    parser.add_argument("--seeds", type=int, default=3, help="查询的种子issue数, 均匀取自各层")
+    parser.add_argument("--skip-per-issue", action="store_true", help="不运行逐个查询的方式")
+    args = parser.parse_args()
+
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            owner_id = connection.execute(
+                select(User.id).where(User.email == settings.FIRST_SUPERUSER)
+            ).scalar()
+            if not owner_id:
+                raise RuntimeError("First superuser not found, run the prestart script first")
+            began = time.perf_counter()
+            params = {"owner_id": owner_id, "issues": args.issues, "width": args.width}
+            for statement in SEED_SQL:
+                connection.execute(text(statement), params)
+            edges = connection.execute(text("SELECT count(*) FROM issue_dependency_link")).scalar()
+            logger.info(
+                "seeded %d issues, %d layers, %d links in %.1fs",
+                args.issues, args.issues // args.width, edges, time.perf_counter() - began,
+            )
+
+            step = max(args.issues // (args.seeds + 1), 1)
+            seeds = [
+                connection.execute(text("SELECT id FROM bench_dep WHERE n = :n"), {"n": step * index}).scalar()
+                for index in range(1, args.seeds + 1)
+            ]
+
+            with Session(bind=connection, join_transaction_mode="create_savepoint") as session:
+                logger.info(
+                    "%-6s %10s %12s %10s %12s %10s %8s",
+                    "seed", "closure", "per-issue q", "seconds", "cte q", "seconds", "path",
+                )
+                for index, seed in enumerate(seeds, start=1):
+                    if args.skip_per_issue:
+                        walk_queries, walk_seconds = 0, 0.0
+                    else:
+                        started = time.perf_counter()
+                        walk_queries, _ = walk_per_issue(session, seed)
+                        walk_seconds = time.perf_counter() - started
+
+                    started = time.perf_counter()
+                    graph = IssueDependencyService.get_graph(session, [seed])
+                    graph_seconds = time.perf_counter() - started
+                    logger.info(
+                        "%-6d %10d %12d %10.2f %12d %10.2f %8d",
+                        index, len(graph.nodes), walk_queries, walk_seconds, 1, graph_seconds,
+                        graph.critical_path_length,
+                    )
+        finally:
+            transaction.rollback()
+
+
+if __name__ == "__main__":
+    main()
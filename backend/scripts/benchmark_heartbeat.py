@@ -0,0 +1,127 @@
+"""心跳写入压测
+
+模拟 N 个节点每隔固定间隔上报心跳, 对比两种写入方式:
+- write-through: 每次心跳一条 UPDATE (改造前心跳接口的写法)
+- write-behind: 心跳记录在 HeartbeatRegistry 中, 每个写回周期一条批量 UPDATE
+统计两种方式发往数据库的写语句数、写入行数和耗时. 时间是模拟的, 不需要真的等待.
+结束后整个事务回滚, 不会改动数据库.
+
+用法: python scripts/benchmark_heartbeat.py [节点数] [模拟秒数] [心跳间隔秒]
+"""
+import logging
+import sys
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import Connection, event, text
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.core.db import engine
+from app.models import Node, User
+from app.services.heartbeat import HeartbeatRegistry
+
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+logger = logging.getLogger(__name__)
+
+SEED_SQL = """
+INSERT INTO node (id, name, ip, status, is_public, is_disabled, owner_id, last_heartbeat, created_at, updated_at)
+SELECT gen_random_uuid(), 'bench-hb-node-' || g, '10.9.0.1', 'online', true, false, :owner_id,
+       now(), now(), now()
+FROM generate_series(1, :nodes) AS g
+"""
+
+
+class WriteCounter:
+    """统计连接上执行的 UPDATE 语句数和影响的行数"""
+
+    def __init__(self, connection: Connection) -> None:
+        self.statements = 0
+        self.rows = 0
+        event.listen(connection, "after_cursor_execute", self._after_execute)
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        if statement.lstrip().upper().startswith("UPDATE"):
+            self.statements += 1
+            self.rows += max(cursor.rowcount, 0)
+
+    def reset(self) -> None:
+        self.statements = 0
+        self.rows = 0
+
+
+def write_through(session: Session, node_ids: list, beats: list[datetime]) -> None:
+    for beat_at in beats:
+        for node_id in node_ids:
+            node = session.get(Node, node_id)
+            node.last_heartbeat = beat_at
+            node.status = "online"
+            session.add(node)
+            session.commit()
+
+
+def write_behind(session: Session, node_ids: list, beats: list[datetime], flush_every: int) -> None:
+    registry = HeartbeatRegistry()
+    for tick, beat_at in enumerate(beats, start=1):
+        for node_id in node_ids:
+            registry.record(node_id, beat_at)
+        if tick % flush_every == 0:
+            registry.flush(session)
+    registry.flush(session)
+
+
+def main() -> None:
+    nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    duration = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+    interval = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    flush_interval = settings.HEARTBEAT_FLUSH_INTERVAL_SECONDS
+    flush_every = max(1, round(flush_interval / interval))
+
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            owner_id = connection.execute(
+                select(User.id).where(User.email == settings.FIRST_SUPERUSER)
+            ).scalar()
+            if not owner_id:
+                raise RuntimeError("First superuser not found, run the prestart script first")
+            connection.execute(text(SEED_SQL), {"owner_id": owner_id, "nodes": nodes})
+            node_ids = list(
+                connection.execute(select(Node.id).where(Node.name.like("bench-hb-node-%"))).scalars()
+            )
+            start = datetime.utcnow()
+            beats = [start + timedelta(seconds=offset) for offset in range(interval, duration + 1, interval)]
+            logger.info(
+                "%d nodes, %d heartbeats each (every %ds), flush every %.1fs",
+                nodes, len(beats), interval, flush_interval,
+            )
+
+            counter = WriteCounter(connection)
+            results = {}
+            for name, runner in (
+                ("write-through", lambda s: write_through(s, node_ids, beats)),
+                ("write-behind", lambda s: write_behind(s, node_ids, beats, flush_every)),
+            ):
+                counter.reset()
+                # 每种方式在各自的保存点中执行, session.commit() 只释放保存点
+                with Session(bind=connection, join_transaction_mode="create_savepoint") as session:
+                    began = time.perf_counter()
+                    runner(session)
+                    elapsed = time.perf_counter() - began
+                results[name] = (counter.statements, counter.rows, elapsed)
+
+            logger.info("==== summary ====")
+            logger.info("%-15s %12s %12s %10s", "mode", "statements", "rows", "seconds")
+            for name, (statements, rows, elapsed) in results.items():
+                logger.info("%-15s %12d %12d %10.2f", name, statements, rows, elapsed)
+            before, after = results["write-through"], results["write-behind"]
+            logger.info(
+                "write statements reduced %.0fx, wall time reduced %.1fx",
+                before[0] / max(after[0], 1), before[2] / max(after[2], 0.001),
+            )
+        finally:
+            transaction.rollback()
+
+
+if __name__ == "__main__":
+    main()
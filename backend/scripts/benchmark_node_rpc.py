@@ -0,0 +1,124 @@
+"""节点RPC下发延迟基准测试
+
+在本地启动一个最小的假节点 agent (HTTP/1.1 keep-alive, 响应 /execute),
+对比每次调用新建 httpx.AsyncClient 与共享连接池 NodeRPCClient 的下发延迟.
+
+用法: python scripts/benchmark_node_rpc.py [请求数] [并发数]
+"""
+import asyncio
+import json
+import logging
+import statistics
+import sys
+import time
+from collections.abc import Awaitable, Callable
+
+import httpx
+
+from app.core.config import settings
+from app.models.command import CommandRequest, CommandResponse
+from app.models.node import Node
+from app.services.node_rpc import NodeRPCClient, node_base_url
+
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+logger = logging.getLogger(__name__)
+# 屏蔽 httpx 每个请求一行的 INFO 日志
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+async def _handle_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """假节点: 解析请求并回显一个成功的 CommandResponse, 连接保持复用"""
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            headers = {}
+            for line in head.decode("latin-1").split("\r\n")[1:]:
+                if ":" in line:
+                    name, value = line.split(":", 1)
+                    headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length", "0")))
+            request = json.loads(body or b"{}")
+            payload = json.dumps(
+                {
+                    "command": request.get("command", ""),
+                    "args": request.get("args", []),
+                    "exit_code": 0,
+                    "stdout": "",
+                    "stderr": "",
+                }
+            ).encode()
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: application/json\r\n"
+                + f"Content-Length: {len(payload)}\r\n\r\n".encode()
+                + payload
+            )
+            await writer.drain()
+            if headers.get("connection", "").lower() == "close":
+                break
+    except (asyncio.IncompleteReadError, ConnectionResetError):
+        pass
+    finally:
+        writer.close()
+
+
+async def _run(
+    name: str,
+    call: Callable[[], Awaitable[CommandResponse]],
+    requests: int,
+    concurrency: int,
+) -> None:
+    latencies: list[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _one() -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            await call()
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(_one() for _ in range(requests)))
+    total = time.perf_counter() - started
+    latencies.sort()
+    logger.info(
+        "%-18s p50=%7.2fms p99=%7.2fms mean=%7.2fms throughput=%8.1f req/s",
+        name,
+        latencies[len(latencies) // 2],
+        latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        statistics.fmean(latencies),
+        requests / total,
+    )
+
+
+async def main() -> None:
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    server = await asyncio.start_server(_handle_connection, "127.0.0.1", 0)
+    settings.NODE_AGENT_PORT = server.sockets[0].getsockname()[1]
+    node = Node(name="bench-node", ip="127.0.0.1")
+    cmd_request = CommandRequest(command="echo", args=["hello"])
+
+    async def per_call_client() -> CommandResponse:
+        async with httpx.AsyncClient(timeout=settings.NODE_RPC_TIMEOUT_SECONDS) as client:
+            response = await client.post(
+                f"{node_base_url(node)}/execute", json=cmd_request.model_dump()
+            )
+            response.raise_for_status()
+            return CommandResponse(**response.json())
+
+    pooled = NodeRPCClient()
+
+    async def pooled_client() -> CommandResponse:
+        return await pooled.execute(node, cmd_request)
+
+    logger.info("requests=%d concurrency=%d", requests, concurrency)
+    async with server:
+        await _run("per-call client", per_call_client, requests, concurrency)
+        await _run("pooled client", pooled_client, requests, concurrency)
+        await pooled.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
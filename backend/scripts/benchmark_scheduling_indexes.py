@@ -0,0 +1,193 @@
+"""调度热点查询索引基准测试
+
+在一个事务中批量写入合成数据 (默认 200000 个issue / 500 个节点 / 20000 个任务),
+先删除调度索引执行一遍热点查询, 再重建索引执行一遍, 输出两次的 EXPLAIN 计划和耗时.
+结束后整个事务回滚, 不会改动数据库 (包括索引).
+
+用法: python scripts/benchmark_scheduling_indexes.py [issue数] [节点数]
+"""
+import logging
+import sys
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy import Connection, and_, func, select, text
+
+from app.core.config import settings
+from app.core.db import engine
+from app.models import Issue, Node, User
+from app.models.task import Task
+
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+logger = logging.getLogger(__name__)
+
+# 本次基准测试对比的索引 (定义在模型中)
+SCHEDULING_INDEXES = {
+    "ix_issue_pending_queue",
+    "ix_issue_processing_node",
+    "ix_issue_list_order",
+    "ix_issue_owner_list_order",
+    "ix_issue_finished_completed_at",
+    "ix_node_online_heartbeat",
+    "ix_task_running_started_at",
+    "ix_task_issue_id",
+}
+
+SEED_SQL = [
+    """
+    INSERT INTO node (id, name, ip, status, is_public, is_disabled, owner_id, last_heartbeat, created_at, updated_at)
+    SELECT gen_random_uuid(), 'bench-node-' || g, '10.9.0.1',
+           CASE WHEN g % 5 = 0 THEN 'offline' ELSE 'online' END, true, false, :owner_id,
+           now() - (g % 600) * interval '1 second', now(), now()
+    FROM generate_series(1, :nodes) AS g
+    """,
+    """
+    WITH bench_nodes AS (
+        SELECT array_agg(id) AS ids FROM node WHERE name LIKE 'bench-node-%'
+    )
+    INSERT INTO issue (id, title, status, priority, owner_id, assigned_node_id, completed_at, created_at, updated_at)
+    SELECT gen_random_uuid(), 'bench-issue-' || g,
+           (ARRAY['pending', 'processing', 'completed', 'failed', 'merged', 'completed', 'completed', 'merged'])[1 + g % 8],
+           g % 100, :owner_id,
+           CASE WHEN g % 8 = 0 THEN NULL ELSE ids[1 + g % array_length(ids, 1)] END,
+           CASE WHEN g % 8 IN (2, 3, 5, 6) THEN now() - (g % 90) * interval '1 day' END,
+           now() - g * interval '1 second', now()
+    FROM generate_series(1, :issues) AS g, bench_nodes
+    """,
+    """
+    INSERT INTO task (id, issue_id, node_id, status, branch_prefix, owner_id, started_at, created_at, updated_at)
+    SELECT gen_random_uuid(), issue.id, issue.assigned_node_id,
+           CASE WHEN issue.status = 'processing' THEN 'running' ELSE 'success' END,
+           'aise', issue.owner_id, issue.created_at, issue.created_at, now()
+    FROM issue
+    WHERE issue.title LIKE 'bench-issue-%' AND issue.assigned_node_id IS NOT NULL
+    LIMIT :tasks
+    """,
+]
+
+
+def hot_queries(owner_id: Any) -> dict[str, Any]:
+    """各调度热点路径上的查询, 与服务代码中的写法一致"""
+    now = datetime.utcnow()
+    heartbeat_threshold = now - timedelta(minutes=5)
+    processing = and_(Issue.assigned_node_id == Node.id, Issue.status == "processing")
+    return {
+        "claim pending (LIMIT 10 SKIP LOCKED)": select(Issue.id)
+        .where(Issue.status == "pending")
+        .order_by(Issue.priority.desc(), Issue.created_at.asc())
+        .limit(10)
+        .with_for_update(skip_locked=True),
+        "node candidates with workload": select(Node.id, func.count(Issue.id))
+        .outerjoin(Issue, processing)
+        .where(Node.status == "online", Node.last_heartbeat >= heartbeat_threshold)
+        .group_by(Node.id)
+        .order_by(func.count(Issue.id), Node.id)
+        .limit(1),
+        "single node workload": select(func.count())
+        .select_from(Issue)
+        .where(
+            Issue.assigned_node_id == select(Node.id).limit(1).scalar_subquery(),
+            Issue.status == "processing",
+        ),
+        "offline detection": select(Node.id).where(
+            Node.status == "online",
+            (Node.last_heartbeat.is_(None)) | (Node.last_heartbeat < now - timedelta(seconds=30)),
+        ),
+        "issue list page (owner)": select(Issue.id)
+        .where(Issue.owner_id == owner_id)
+        .order_by(Issue.priority.desc(), Issue.created_at.desc(), Issue.id.desc())
+        .limit(100),
+        "running tasks (dashboard)": select(Task.id)
+        .where(Task.status == "running")
+        .order_by(Task.started_at.desc())
+        .limit(10),
+        "workspace cleanup": select(Issue.id).where(
+            Issue.status.in_(["completed", "failed"]), Issue.completed_at < now - timedelta(days=30)
+        ),
+    }
+
+
+def explain(connection: Connection, statement: Any) -> tuple[float, str]:
+    compiled = statement.compile(
+        dialect=connection.dialect, compile_kwargs={"render_postcompile": True}
+    )
+    rows = connection.exec_driver_sql(
+        f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {compiled}", compiled.params
+    ).scalar()
+    plan = rows[0]
+    return plan["Execution Time"], _summarize(plan["Plan"])
+
+
+def _summarize(node: dict, depth: int = 0) -> str:
+    """把 JSON 计划压缩成缩进的节点列表, 只保留节点类型和使用的索引"""
+    label = node["Node Type"]
+    if "Index Name" in node:
+        label += f" using {node['Index Name']}"
+    elif "Relation Name" in node:
+        label += f" on {node['Relation Name']}"
+    lines = ["  " * depth + f"-> {label} (rows={node.get('Actual Rows')})"]
+    for child in node.get("Plans", []):
+        lines.append(_summarize(child, depth + 1))
+    return "\n".join(lines)
+
+
+def run(connection: Connection, queries: dict[str, Any], title: str) -> dict[str, float]:
+    connection.execute(text("ANALYZE issue, node, task"))
+    logger.info("==== %s ====", title)
+    timings = {}
+    for name, statement in queries.items():
+        # 先执行一次预热缓存
+        explain(connection, statement)
+        elapsed, plan = explain(connection, statement)
+        timings[name] = elapsed
+        logger.info("%s: %.2f ms\n%s", name, elapsed, plan)
+    return timings
+
+
+def main() -> None:
+    issues = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    nodes = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            owner_id = connection.execute(
+                select(User.id).where(User.email == settings.FIRST_SUPERUSER)
+            ).scalar()
+            if not owner_id:
+                raise RuntimeError("First superuser not found, run the prestart script first")
+
+            params = {"owner_id": owner_id, "nodes": nodes, "issues": issues, "tasks": issues // 10}
+            for statement in SEED_SQL:
+                connection.execute(text(statement), params)
+            logger.info("seeded %d issues, %d nodes", issues, nodes)
+
+            indexes = [
+                index
+                for table in (Issue.__table__, Node.__table__, Task.__table__)
+                for index in table.indexes
+                if index.name in SCHEDULING_INDEXES
+            ]
+            queries = hot_queries(owner_id)
+
+            for index in indexes:
+                index.drop(connection, checkfirst=True)
+            before = run(connection, queries, "without scheduling indexes")
+
+            for index in indexes:
+                index.create(connection)
+            after = run(connection, queries, "with scheduling indexes")
+
+            logger.info("==== summary ====")
+            logger.info("%-40s %12s %12s %8s", "query", "before ms", "after ms", "speedup")
+            for name in queries:
+                logger.info(
+                    "%-40s %12.2f %12.2f %7.1fx",
+                    name, before[name], after[name], before[name] / max(after[name], 0.001),
+                )
+        finally:
+            transaction.rollback()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app import crud
+from app.services.dashboard import collect_dashboard_stats
+from app.core.config import settings
+from app.core.db import engine
+from tests.utils.node import create_issue_for_node, create_online_node
+from tests.utils.query_counter import count_queries
+
+
+def test_read_dashboard_stats(client: TestClient, superuser_token_headers: dict[str, str]) -> None:
+    response = client.get(
+        f"{settings.API_V1_STR}/dashboard/stats", headers=superuser_token_headers
+    )
+    assert response.status_code == 200
+    content = response.json()
+    assert set(content["issues"]) == {"pending", "processing", "total"}
+    assert set(content["nodes"]) == {"idle", "running", "offline", "total"}
+    for key in ("projects_count", "prompts_count", "credentials_count", "repositories_count"):
+        assert key in content
+    assert isinstance(content["running_tasks"], list)
+
+
+def test_dashboard_stats_counts(db: Session) -> None:
+    owner = crud.get_user_by_email(session=db, email=settings.FIRST_SUPERUSER)
+    assert owner is not None
+    before = collect_dashboard_stats(db, owner.id)
+
+    busy = create_online_node(db)
+    create_online_node(db)
+    create_issue_for_node(db, busy)
+    create_issue_for_node(db, None, status="pending")
+
+    after = collect_dashboard_stats(db, owner.id)
+    assert after.issues.pending == before.issues.pending + 1
+    assert after.issues.processing == before.issues.processing + 1
+    assert after.issues.total == before.issues.total + 2
+    assert after.nodes.total == before.nodes.total + 2
+    assert after.nodes.running == before.nodes.running + 1
+
+
+def test_dashboard_stats_query_count(db: Session) -> None:
+    owner = crud.get_user_by_email(session=db, email=settings.FIRST_SUPERUSER)
+    assert owner is not None
+
+    for owner_filter in (None, owner.id):
+        with count_queries(engine) as counter:
+            collect_dashboard_stats(db, owner_filter)
+        assert counter.count == 2
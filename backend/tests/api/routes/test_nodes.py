@@ -194,3 +194,51 @@ def test_list_nodes_pagination(
     assert len(content["data"]) <= 2
     assert content["count"] >= 3
 
+
+
+def test_read_nodes_cursor_pagination(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    created = {str(create_random_node(db).id) for _ in range(5)}
+
+    seen: list[str] = []
+    cursor = ""
+    while cursor is not None:
+        response = client.get(
+            f"{settings.API_V1_STR}/nodes/",
+            headers=superuser_token_headers,
+            params={"cursor": cursor, "limit": 2, "count": "none"},
+        )
+        assert response.status_code == 200
+        content = response.json()
+        assert content["count"] is None
+        assert len(content["data"]) <= 2
+        seen.extend(node["id"] for node in content["data"])
+        cursor = content["next_cursor"]
+
+    assert len(seen) == len(set(seen))
+    assert created <= set(seen)
+
+
+def test_read_nodes_estimated_count(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    response = client.get(
+        f"{settings.API_V1_STR}/nodes/",
+        headers=superuser_token_headers,
+        params={"count": "estimate"},
+    )
+    assert response.status_code == 200
+    assert isinstance(response.json()["count"], int)
+
+
+def test_read_nodes_invalid_cursor(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    response = client.get(
+        f"{settings.API_V1_STR}/nodes/",
+        headers=superuser_token_headers,
+        params={"cursor": "not-a-cursor"},
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
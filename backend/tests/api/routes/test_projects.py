@@ -104,4 +104,30 @@ def test_normal_user_can_delete_own_project(
         f"{settings.API_V1_STR}/projects/{project_id}",
         headers=superuser_token_headers,
     )
-    assert get_resp.status_code == 404
\ No newline at end of file
+    assert get_resp.status_code == 404
+
+def test_search_projects_ranks_name_matches_first(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    word = f"kw{uuid.uuid4().hex[:8]}"
+    for data in (
+        {"name": "unrelated", "description": f"mentions {word} in passing"},
+        {"name": f"{word} service", "description": "main project"},
+        {"name": "other", "description": "no match"},
+    ):
+        response = client.post(
+            f"{settings.API_V1_STR}/projects/", headers=superuser_token_headers, json=data
+        )
+        assert response.status_code == 200
+
+    # 完整单词走全文检索, 词的一部分走 trigram 子串匹配
+    for term in (word, word[:6]):
+        response = client.get(
+            f"{settings.API_V1_STR}/projects/",
+            headers=superuser_token_headers,
+            params={"search": term},
+        )
+        assert response.status_code == 200
+        content = response.json()
+        assert content["count"] == 2
+        assert content["data"][0]["name"] == f"{word} service"
@@ -0,0 +1,85 @@
+"""Tests for command output streams"""
+import asyncio
+from collections.abc import AsyncIterator
+
+from app.models.command import CommandOutputChunk
+from app.services.command_stream import CommandStream, CommandStreamRegistry
+
+
+async def _collect(stream: CommandStream, from_seq: int = 0) -> list[CommandOutputChunk]:
+    return [chunk async for chunk in stream.subscribe(from_seq)]
+
+
+def test_late_subscriber_replays_buffer() -> None:
+    async def scenario() -> tuple[list, list]:
+        stream = CommandStream("late", max_chunks=10)
+        await stream.publish(CommandOutputChunk(data="a"))
+        early = asyncio.create_task(_collect(stream))
+        await stream.publish(CommandOutputChunk(data="b"))
+        await stream.publish(CommandOutputChunk(stream="exit", exit_code=0))
+        await stream.close()
+        return await early, await _collect(stream, from_seq=1)
+
+    early, late = asyncio.run(scenario())
+
+    assert [chunk.data for chunk in early] == ["a", "b", ""]
+    assert [chunk.seq for chunk in early] == [0, 1, 2]
+    assert [chunk.seq for chunk in late] == [1, 2]
+    assert late[-1].exit_code == 0
+
+
+def test_buffer_is_bounded_and_reports_gap() -> None:
+    async def scenario() -> tuple[CommandStream, list]:
+        stream = CommandStream("bounded", max_chunks=3, max_bytes=1_000)
+        for index in range(10):
+            await stream.publish(CommandOutputChunk(data=str(index)))
+        await stream.close()
+        return stream, await _collect(stream)
+
+    stream, chunks = asyncio.run(scenario())
+
+    assert len(stream._chunks) == 3
+    assert chunks[0].stream == "gap"
+    assert chunks[0].data == "7 chunks dropped"
+    assert [chunk.data for chunk in chunks[1:]] == ["7", "8", "9"]
+
+
+def test_producer_waits_for_slow_subscriber() -> None:
+    async def scenario() -> list[str]:
+        stream = CommandStream("slow", max_chunks=2, stall_seconds=5)
+        subscription = stream.subscribe()
+        received: list[str] = []
+
+        async def produce() -> None:
+            for index in range(6):
+                await stream.publish(CommandOutputChunk(data=str(index)))
+            await stream.close()
+
+        producer = asyncio.create_task(produce())
+        async for chunk in subscription:
+            received.append(chunk.data)
+            await asyncio.sleep(0.01)
+        await producer
+        return received
+
+    # 订阅者慢于生产者, 但缓冲区只有2段时也不丢输出
+    assert asyncio.run(scenario()) == ["0", "1", "2", "3", "4", "5"]
+
+
+def test_registry_reports_source_errors() -> None:
+    async def failing_source() -> AsyncIterator[CommandOutputChunk]:
+        yield CommandOutputChunk(data="cloning")
+        raise ConnectionError("node went away")
+
+    async def scenario() -> list[CommandOutputChunk]:
+        registry = CommandStreamRegistry()
+        stream = registry.start(failing_source(), stream_id="task-1")
+        chunks = await _collect(stream)
+        assert registry.get("task-1") is stream
+        await registry.aclose()
+        return chunks
+
+    chunks = asyncio.run(scenario())
+
+    assert [chunk.stream for chunk in chunks] == ["stdout", "error"]
+    assert chunks[-1].data == "node went away"
@@ -0,0 +1,92 @@
+"""Tests for DashboardSnapshotService"""
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+from unittest import mock
+
+from app.services.dashboard import (
+    DashboardSnapshotService,
+    DashboardStats,
+    IssueStats,
+    NodeStats,
+    RunningTask,
+    merge_patch,
+)
+
+
+def _stats(pending: int) -> DashboardStats:
+    return DashboardStats(
+        issues=IssueStats(pending=pending, processing=0, total=pending),
+        nodes=NodeStats(idle=1, running=0, offline=0, total=1),
+        projects_count=0,
+        prompts_count=0,
+        credentials_count=0,
+        repositories_count=0,
+        running_tasks=[],
+    )
+
+
+def test_merge_patch_only_contains_changes() -> None:
+    old = _stats(1).model_dump(mode="json")
+    new = _stats(2).model_dump(mode="json")
+
+    assert merge_patch(old, old) == {}
+    assert merge_patch(old, new) == {"issues": {"pending": 2, "total": 2}}
+
+
+def test_snapshot_is_shared_and_invalidated_by_changes() -> None:
+    owner_id = uuid.uuid4()
+    computed: list[uuid.UUID | None] = []
+    pending = {"value": 1}
+
+    def fake_compute(_self: DashboardSnapshotService, scope: uuid.UUID | None) -> DashboardStats:
+        computed.append(scope)
+        return _stats(pending["value"])
+
+    async def run() -> None:
+        service = DashboardSnapshotService(interval=60, min_interval=0)
+        results = await asyncio.gather(*(service.get_snapshot(owner_id) for _ in range(50)))
+        assert len(computed) == 1
+        assert len({version for version, _ in results}) == 1
+        version = results[0][0]
+
+        # 没有变更时直接命中缓存
+        assert (await service.get_snapshot(owner_id))[0] == version
+        assert len(computed) == 1
+
+        # 其他用户的变更不影响该用户的快照
+        service.invalidate({uuid.uuid4()})
+        await service.get_snapshot(owner_id)
+        assert len(computed) == 1
+
+        # 内容不变时版本号不变
+        service.invalidate({owner_id})
+        assert (await service.get_snapshot(owner_id))[0] == version
+        assert len(computed) == 2
+
+        pending["value"] = 2
+        service.invalidate({"*"})
+        new_version, stats = await service.get_snapshot(owner_id)
+        assert new_version > version
+        assert stats.issues.pending == 2
+
+    with mock.patch.object(DashboardSnapshotService, "_compute", fake_compute):
+        asyncio.run(run())
+
+
+def test_running_time_is_computed_when_serialized() -> None:
+    task = RunningTask(
+        task_id=uuid.uuid4(),
+        issue_id=uuid.uuid4(),
+        issue_title="fix",
+        node_name="node",
+        started_at=datetime.utcnow() - timedelta(seconds=30),
+    )
+    assert task.running_time.endswith("s")
+
+    # 快照缓存的是同一个对象, 之后序列化得到的运行时间随之增长
+    with mock.patch(
+        "app.services.dashboard.datetime",
+        mock.Mock(utcnow=lambda: task.started_at + timedelta(minutes=2, seconds=5)),
+    ):
+        assert task.model_dump(mode="json")["running_time"] == "2m 5s"
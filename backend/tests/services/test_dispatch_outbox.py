@@ -0,0 +1,142 @@
+"""Tests for DispatchOutboxService"""
+import asyncio
+import random
+from datetime import datetime, timedelta
+from unittest import mock
+
+import httpx
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.models.credential import Credential
+from app.models.dispatch_outbox import DispatchOutbox
+from app.models.task import Task
+from app.services.dispatch_outbox import (
+    STALE_TASK_ERROR,
+    DeliveryResult,
+    DispatchOutboxService,
+    retry_delay,
+)
+from app.services.issue_claim import IssueClaimService
+from app.services.node_rpc import node_rpc
+from tests.utils.node import create_issue_for_node, create_online_node
+
+
+def _enqueue(db: Session, credential: Credential | None = None) -> tuple[Task, DispatchOutbox]:
+    node = create_online_node(db)
+    issue = create_issue_for_node(db, node, status="processing")
+    task = Task(
+        owner_id=issue.owner_id,
+        issue_id=issue.id,
+        node_id=node.id,
+        status="running",
+        started_at=datetime.utcnow(),
+    )
+    db.add(task)
+    entry = DispatchOutboxService.enqueue(
+        db, task, {"task_id": str(task.id)}, credential_id=credential.id if credential else None
+    )
+    db.commit()
+    db.refresh(task)
+    db.refresh(entry)
+    return task, entry
+
+
+def test_retry_delay_backs_off_exponentially() -> None:
+    rng = random.Random(0)
+    delays = [retry_delay(attempts, rng) for attempts in range(1, 12)]
+    base = settings.OUTBOX_RETRY_BASE_SECONDS
+    assert base <= delays[0] <= base * 1.1
+    assert base * 4 <= delays[2] <= base * 4 * 1.1
+    assert max(delays) <= settings.OUTBOX_RETRY_MAX_SECONDS * 1.1
+
+
+def test_claimed_entries_are_leased(db: Session) -> None:
+    _, entry = _enqueue(db)
+
+    claimed = DispatchOutboxService.claim_due(db, limit=1_000, lease_seconds=60)
+    assert entry.id in {item.id for item in claimed}
+    assert next(item for item in claimed if item.id == entry.id).attempts == 1
+
+    again = DispatchOutboxService.claim_due(db, limit=1_000, lease_seconds=60)
+    assert entry.id not in {item.id for item in again}
+
+
+def test_deliver_sends_idempotency_key(db: Session) -> None:
+    task, entry = _enqueue(db)
+    nodes, secrets = DispatchOutboxService.load_targets(db, [entry])
+    post = mock.AsyncMock(return_value=httpx.Response(200))
+
+    with mock.patch.object(node_rpc, "post", post):
+        results = asyncio.run(DispatchOutboxService.deliver([entry], nodes, secrets))
+
+    assert results == [DeliveryResult(entry.id)]
+    assert post.await_args.kwargs["headers"] == {"Idempotency-Key": str(task.id)}
+
+
+def test_record_results_retries_then_fails_task(db: Session) -> None:
+    task, entry = _enqueue(db)
+    entry.attempts = 1
+
+    stats = DispatchOutboxService.record_results(db, [entry], [DeliveryResult(entry.id, "timeout")])
+    assert stats == {"delivered": 0, "retried": 1, "failed": 0}
+    db.refresh(entry)
+    assert entry.status == "pending"
+    assert entry.next_attempt_at > datetime.utcnow() + timedelta(seconds=1)
+
+    entry.attempts = settings.OUTBOX_MAX_ATTEMPTS
+    stats = DispatchOutboxService.record_results(db, [entry], [DeliveryResult(entry.id, "timeout")])
+    assert stats["failed"] == 1
+    db.refresh(entry)
+    db.refresh(task)
+    assert entry.status == "failed"
+    assert task.status == "failed"
+    assert task.issue.status == "terminated"
+
+
+def test_requeued_task_is_not_delivered(db: Session) -> None:
+    task, entry = _enqueue(db)
+
+    IssueClaimService.requeue_node_issues(db, [task.node_id])
+    db.commit()
+    db.refresh(entry)
+    assert entry.status == "failed"
+    assert entry.last_error == STALE_TASK_ERROR
+
+    claimed = DispatchOutboxService.claim_due(db, limit=1_000, lease_seconds=60)
+    assert entry.id not in {item.id for item in claimed}
+
+
+def test_claim_skips_entries_whose_task_moved(db: Session) -> None:
+    task, entry = _enqueue(db)
+    other = create_online_node(db)
+    # issue已被回收并分配给其它节点, 旧的记录不应再投递给原节点
+    task.node_id = other.id
+    db.add(task)
+    db.commit()
+
+    claimed = DispatchOutboxService.claim_due(db, limit=1_000, lease_seconds=60)
+    assert entry.id not in {item.id for item in claimed}
+    db.refresh(entry)
+    assert entry.status == "failed"
+    assert entry.attempts == 0
+
+
+def test_deleted_credential_fails_delivery(db: Session) -> None:
+    owner_id = create_online_node(db).owner_id
+    credential = Credential(title="copilot", secret="s3cret", owner_id=owner_id)
+    db.add(credential)
+    db.commit()
+    _, entry = _enqueue(db, credential)
+    db.delete(credential)
+    db.commit()
+    db.refresh(entry)
+    assert entry.credential_id is None and entry.credential_required
+
+    nodes, secrets = DispatchOutboxService.load_targets(db, [entry])
+    post = mock.AsyncMock(return_value=httpx.Response(200))
+    with mock.patch.object(node_rpc, "post", post):
+        results = asyncio.run(DispatchOutboxService.deliver([entry], nodes, secrets))
+
+    assert results == [DeliveryResult(entry.id, "Credential not found", retryable=False)]
+    post.assert_not_awaited()
@@ -0,0 +1,241 @@
+"""Tests for GitHubSyncService"""
+import asyncio
+import uuid
+from datetime import datetime
+
+import httpx
+from sqlmodel import Session, select
+
+from app import crud
+from app.core.config import settings
+from app.models import Issue
+from app.models.repository import RepositorySyncState
+from app.services.github_sync import GitHubRateLimiter, GitHubSyncService, _active_client
+
+
+def _gh_issue(number: int, title: str, labels: list[str] | None = None) -> dict:
+    return {
+        "number": number,
+        "title": title,
+        "body": f"body of {title}",
+        "labels": [{"name": label} for label in labels or []],
+    }
+
+
+def test_upsert_issue_page_creates_updates_and_skips(db: Session) -> None:
+    owner = crud.get_user_by_email(session=db, email=settings.FIRST_SUPERUSER)
+    assert owner is not None
+    repo_url = f"https://github.com/example/{uuid.uuid4().hex[:8]}"
+    mapping = {"bug": 60, "high": 75}
+
+    stats = GitHubSyncService.upsert_issue_page(
+        db, owner.id, repo_url, [_gh_issue(1, "one", ["bug"]), _gh_issue(2, "two")], mapping
+    )
+    db.commit()
+    assert stats == {"fetched": 2, "created": 2, "updated": 0, "skipped": 0}
+
+    done = db.exec(
+        select(Issue).where(Issue.repository_url == repo_url, Issue.issue_number == 2)
+    ).one()
+    done.status = "completed"
+    db.add(done)
+    db.commit()
+
+    stats = GitHubSyncService.upsert_issue_page(
+        db,
+        owner.id,
+        repo_url,
+        [_gh_issue(1, "one renamed", ["bug", "high"]), _gh_issue(2, "two renamed"), _gh_issue(3, "three")],
+        mapping,
+    )
+    db.commit()
+    assert stats == {"fetched": 3, "created": 1, "updated": 1, "skipped": 1}
+
+    issues = {
+        issue.issue_number: issue
+        for issue in db.exec(
+            select(Issue)
+            .where(Issue.repository_url == repo_url)
+            .execution_options(populate_existing=True)
+        ).all()
+    }
+    assert issues[1].title == "one renamed"
+    assert issues[1].priority == 75
+    assert issues[2].title == "two"
+    assert issues[3].status == "pending"
+
+
+def _response(status_code: int, headers: dict[str, str] | None = None) -> httpx.Response:
+    return httpx.Response(
+        status_code, headers=headers, request=httpx.Request("GET", "https://api.github.com/")
+    )
+
+
+def test_rate_limiter_spreads_requests_when_quota_is_low() -> None:
+    limiter = GitHubRateLimiter(min_remaining=100, max_wait=900)
+    now = 1_000_000.0
+    reset = str(int(now) + 600)
+
+    limiter.update(
+        _response(200, {"X-RateLimit-Remaining": "4000", "X-RateLimit-Reset": reset}), now=now
+    )
+    assert limiter.delay(now=now) == 0
+
+    limiter.update(
+        _response(200, {"X-RateLimit-Remaining": "10", "X-RateLimit-Reset": reset}), now=now
+    )
+    assert limiter.delay(now=now) == 60
+
+    assert limiter.update(_response(403, {"Retry-After": "30"}), now=now) == 30
+    assert limiter.delay(now=now + 10) == 20
+
+    # 没有限流头的 403 是权限错误, 不重试
+    assert limiter.update(_response(403), now=now) is None
+
+
+def test_sync_pages_retry_after_rate_limit() -> None:
+    calls: list[int] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        page = int(request.url.params["page"])
+        calls.append(page)
+        if len(calls) == 1:
+            return httpx.Response(429, headers={"Retry-After": "0"})
+        if page == 1:
+            issues = [{"number": n, "title": f"issue {n}"} for n in range(100)]
+        else:
+            issues = [{"number": 100, "title": "last"}, {"number": 101, "pull_request": {}}]
+        return httpx.Response(200, json=issues, headers={"X-RateLimit-Remaining": "4999"})
+
+    async def run() -> list[list[dict]]:
+        service = GitHubSyncService("token")
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            _active_client.set(client)
+            url, params = service._build_issue_query("example", "repo")
+            return [page async for page in service.iter_issue_pages(url, params)]
+
+    pages = asyncio.run(run())
+
+    assert calls == [1, 1, 2]
+    assert [len(page) for page in pages] == [100, 1]
+
+
+def test_concurrent_shared_clients_are_isolated() -> None:
+    service = GitHubSyncService("token")
+
+    async def hold(entered: asyncio.Event, release: asyncio.Event) -> httpx.AsyncClient:
+        async with service.shared_client(max_connections=1) as client:
+            entered.set()
+            await release.wait()
+            # 另一次同步已经结束并关闭了它的连接池, 这里仍使用自己的连接池
+            async with service.shared_client(max_connections=1) as inner:
+                assert inner is client
+                assert not client.is_closed
+            return client
+
+    async def run() -> tuple[httpx.AsyncClient, httpx.AsyncClient]:
+        first_entered, second_entered = asyncio.Event(), asyncio.Event()
+        first_release, second_release = asyncio.Event(), asyncio.Event()
+        first = asyncio.create_task(hold(first_entered, first_release))
+        second = asyncio.create_task(hold(second_entered, second_release))
+        await first_entered.wait()
+        await second_entered.wait()
+        first_release.set()
+        first_client = await first
+        second_release.set()
+        return first_client, await second
+
+    first_client, second_client = asyncio.run(run())
+
+    assert first_client is not second_client
+    assert first_client.is_closed and second_client.is_closed
+
+
+def test_build_issue_query_formats_since_as_utc() -> None:
+    _, params = GitHubSyncService._build_issue_query(
+        "example", "repo", labels=["bug", "high"], since=datetime(2026, 1, 2, 3, 4, 5)
+    )
+    assert params["since"] == "2026-01-02T03:04:05Z"
+    assert params["labels"] == "bug,high"
+    assert params["sort"] == "updated" and params["direction"] == "desc"
+
+
+def test_pages_send_if_none_match_and_stop_on_304() -> None:
+    requests: list[tuple[int, str | None]] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        page = int(request.url.params["page"])
+        if_none_match = request.headers.get("If-None-Match")
+        requests.append((page, if_none_match))
+        if if_none_match == f'"page-{page}"':
+            return httpx.Response(304)
+        issues = [{"number": page * 1000 + n, "title": "t"} for n in range(100 if page == 1 else 3)]
+        return httpx.Response(200, json=issues, headers={"ETag": f'"page-{page}"'})
+
+    async def run(etags: dict) -> list[list[dict]]:
+        service = GitHubSyncService("token")
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            _active_client.set(client)
+            url, params = service._build_issue_query("example", "repo")
+            return [page async for page in service.iter_issue_pages(url, params, etags=etags)]
+
+    etags: dict[str, str] = {}
+    assert [len(page) for page in asyncio.run(run(etags))] == [100, 3]
+    assert etags == {"1": '"page-1"', "2": '"page-2"'}
+    assert requests == [(1, None), (2, None)]
+
+    # 第一页没有变化时整个结果都没有变化, 只发送一次条件请求
+    requests.clear()
+    assert asyncio.run(run(etags)) == []
+    assert requests == [(1, '"page-1"')]
+    assert etags == {"1": '"page-1"', "2": '"page-2"'}
+
+
+def test_sync_persists_cursor_and_resumes_incrementally(db: Session) -> None:
+    owner = crud.get_user_by_email(session=db, email=settings.FIRST_SUPERUSER)
+    assert owner is not None
+    repo_name = uuid.uuid4().hex[:8]
+    seen: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request)
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304)
+        issues = [
+            {**_gh_issue(1, "one"), "updated_at": "2026-03-01T10:00:00Z"},
+            {**_gh_issue(2, "two"), "updated_at": "2026-03-02T08:30:00Z"},
+        ]
+        return httpx.Response(200, json=issues, headers={"ETag": '"v1"'})
+
+    async def run(full_sync: bool = False) -> dict:
+        service = GitHubSyncService("token")
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            _active_client.set(client)
+            return await service.sync_issues_to_db(
+                db, owner.id, "example", repo_name, labels=["bug"], full_sync=full_sync
+            )
+
+    assert asyncio.run(run())["created"] == 2
+    state = db.exec(
+        select(RepositorySyncState).where(
+            RepositorySyncState.repository_url == f"https://github.com/example/{repo_name}"
+        )
+    ).one()
+    assert state.labels == "bug"
+    assert state.last_updated_at == datetime(2026, 3, 2, 8, 30)
+    assert state.etags == {"1": '"v1"'}
+    first_synced_at = state.last_synced_at
+    assert "since" not in seen[0].url.params
+
+    # 增量同步: 以高水位作为 since 并发送 If-None-Match, 304 时游标不回退
+    assert asyncio.run(run()) == {"fetched": 0, "created": 0, "updated": 0, "skipped": 0}
+    assert seen[1].url.params["since"] == "2026-03-02T08:30:00Z"
+    assert seen[1].headers["If-None-Match"] == '"v1"'
+    db.refresh(state)
+    assert state.last_updated_at == datetime(2026, 3, 2, 8, 30)
+    assert state.last_synced_at is not None and state.last_synced_at >= first_synced_at
+
+    # 全量同步忽略已保存的游标
+    assert asyncio.run(run(full_sync=True))["updated"] == 2
+    assert "since" not in seen[2].url.params
+    assert "If-None-Match" not in seen[2].headers
@@ -0,0 +1,131 @@
+"""Tests for write-behind heartbeats"""
+from datetime import datetime, timedelta
+from unittest import mock
+
+import pytest
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.models import Node
+from app.models.node import NodeMetrics
+from app.models.register_key import RegisterKey
+from app.services.dashboard import dashboard_snapshots
+from app.services.heartbeat import HeartbeatRegistry, heartbeat_registry
+from app.services.node_monitor import mark_offline_nodes
+from app.services.node_selection import NodeSelectionService
+from tests.utils.node import create_online_node
+
+
+def test_flush_writes_latest_heartbeats_in_bulk(db: Session) -> None:
+    registry = HeartbeatRegistry()
+    first = create_online_node(db)
+    second = create_online_node(db)
+    second.status = "offline"
+    db.add(second)
+    db.commit()
+
+    beat_at = datetime.utcnow() + timedelta(seconds=5)
+    registry.record(first.id, beat_at - timedelta(seconds=1))
+    registry.record(first.id, beat_at)
+    registry.record(second.id, beat_at)
+
+    assert registry.flush(db) == 2
+    assert registry.flush(db) == 0
+
+    first = db.get(Node, first.id, populate_existing=True)
+    second = db.get(Node, second.id, populate_existing=True)
+    assert first is not None and first.last_heartbeat == beat_at
+    assert second is not None and second.last_heartbeat == beat_at
+    assert second.status == "online"
+
+    # 较旧的心跳不会覆盖数据库中较新的值
+    registry.record(first.id, beat_at - timedelta(minutes=1))
+    registry.flush(db)
+    first = db.get(Node, first.id, populate_existing=True)
+    assert first is not None and first.last_heartbeat == beat_at
+
+
+def test_flush_upserts_latest_metrics(db: Session) -> None:
+    registry = HeartbeatRegistry()
+    node = create_online_node(db)
+    beat_at = datetime.utcnow()
+
+    registry.record(node.id, beat_at, metrics={"cpu_count": 8, "load_avg": 1.5})
+    registry.flush(db)
+    registry.record(node.id, beat_at + timedelta(seconds=5), metrics={"cpu_count": 8, "disk_free_mb": 2048})
+    registry.flush(db)
+
+    metrics = db.get(NodeMetrics, node.id, populate_existing=True)
+    assert metrics is not None
+    assert metrics.cpu_count == 8
+    assert metrics.load_avg is None
+    assert metrics.disk_free_mb == 2048
+    assert metrics.reported_at == beat_at + timedelta(seconds=5)
+
+
+def test_unflushed_heartbeat_keeps_node_online(db: Session) -> None:
+    node = create_online_node(db, tags="heartbeat")
+    node.last_heartbeat = datetime.utcnow() - timedelta(
+        seconds=settings.NODE_OFFLINE_THRESHOLD_SECONDS + 120
+    )
+    db.add(node)
+    db.commit()
+    assert not NodeSelectionService.is_node_healthy(node, max_offline_minutes=1)
+
+    node_id = node.id
+    heartbeat_registry.record(node_id)
+    try:
+        assert NodeSelectionService.is_node_healthy(node, max_offline_minutes=1)
+        mark_offline_nodes(db)
+        node = db.get(Node, node_id, populate_existing=True)
+        assert node is not None and node.status == "online"
+    finally:
+        heartbeat_registry.forget(node_id)
+
+
+def test_known_node_cache_expires(db: Session, monkeypatch: pytest.MonkeyPatch) -> None:
+    registry = HeartbeatRegistry()
+    node = create_online_node(db)
+    assert registry.is_known_node(db, node.id)
+
+    # 节点在其它进程中被删除, 缓存过期后不再接受其心跳
+    db.delete(node)
+    db.commit()
+    assert registry.is_known_node(db, node.id)
+    monkeypatch.setattr(settings, "HEARTBEAT_NODE_CACHE_SECONDS", 0)
+    assert not registry.is_known_node(db, node.id)
+
+
+def test_rotated_register_key_is_rejected(db: Session) -> None:
+    registry = HeartbeatRegistry()
+    key = db.get(RegisterKey, 1)
+    assert key is not None
+    old_key = key.key
+    assert registry.check_register_key(db, old_key) is True
+
+    key.rotate()
+    db.add(key)
+    db.commit()
+    registry.invalidate_register_key()
+    assert registry.check_register_key(db, old_key) is False
+    assert registry.check_register_key(db, key.key) is True
+
+
+def test_flush_only_invalidates_dashboard_for_status_changes(db: Session) -> None:
+    registry = HeartbeatRegistry()
+    online = create_online_node(db)
+    offline = create_online_node(db)
+    offline.status = "offline"
+    db.add(offline)
+    db.commit()
+
+    beat_at = datetime.utcnow() + timedelta(seconds=5)
+    with mock.patch.object(dashboard_snapshots, "invalidate") as invalidate:
+        registry.record(online.id, beat_at)
+        registry.flush(db)
+        invalidate.assert_not_called()
+
+        registry.record(online.id, beat_at + timedelta(seconds=1))
+        registry.record(offline.id, beat_at + timedelta(seconds=1))
+        registry.flush(db)
+        invalidate.assert_called_once_with({offline.owner_id})
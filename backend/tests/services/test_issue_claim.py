@@ -0,0 +1,44 @@
+"""Tests for IssueClaimService"""
+from sqlmodel import Session, select
+
+from app.core.db import engine
+from app.models import Issue
+from app.services.issue_claim import IssueClaimService
+from tests.utils.node import create_issue_for_node, create_online_node
+
+
+def test_claim_pending_issues_orders_by_priority(db: Session) -> None:
+    node = create_online_node(db)
+    low = create_issue_for_node(db, node, status="pending", priority=1_000)
+    high = create_issue_for_node(db, node, status="pending", priority=1_001)
+
+    claimed = IssueClaimService.claim_pending_issues(db, limit=2)
+
+    assert [issue.id for issue in claimed] == [high.id, low.id]
+    for issue in claimed:
+        assert issue.status == "processing"
+        assert issue.started_at is not None
+
+    again = IssueClaimService.claim_pending_issues(db, limit=2)
+    assert {issue.id for issue in again}.isdisjoint({high.id, low.id})
+
+
+def test_claim_pending_issues_skips_locked_rows(db: Session) -> None:
+    node = create_online_node(db)
+    locked = create_issue_for_node(db, node, status="pending", priority=2_001)
+    free = create_issue_for_node(db, node, status="pending", priority=2_000)
+
+    with Session(engine) as other:
+        # 另一个worker持有该行的锁但尚未提交
+        other.exec(
+            select(Issue).where(Issue.id == locked.id).with_for_update()
+        ).one()
+
+        claimed = IssueClaimService.claim_pending_issues(db, limit=1)
+        assert [issue.id for issue in claimed] == [free.id]
+        assert IssueClaimService.lock_issue(db, locked.id) is None
+        db.rollback()
+        other.rollback()
+
+    db.refresh(locked)
+    assert locked.status == "pending"
@@ -0,0 +1,151 @@
+"""Tests for IssueDependencyService"""
+import threading
+import uuid
+
+import pytest
+from sqlmodel import Session
+
+from app.core.db import engine
+from app.models.issue import DependencyGraphEdge, DependencyGraphNode, Issue
+from app.services.issue_dependency import DependencyCycleError, IssueDependencyService
+from tests.utils.node import create_issue_for_node
+
+
+def test_merge_releases_dependents(db: Session) -> None:
+    first = create_issue_for_node(db, None, status="processing")
+    second = create_issue_for_node(db, None, status="pending")
+    dependent = create_issue_for_node(db, None, status="pending", priority=5_000)
+
+    IssueDependencyService.set_dependencies(db, dependent.id, {first.id, second.id})
+    db.commit()
+    db.refresh(dependent)
+    assert dependent.unmet_dependency_count == 2
+    ready_ids = {issue.id for issue in IssueDependencyService.get_ready_issues(db, limit=1_000)}
+    assert dependent.id not in ready_ids
+    assert second.id in ready_ids
+
+    first.status = "merged"
+    db.add(first)
+    db.commit()
+    db.refresh(dependent)
+    assert dependent.unmet_dependency_count == 1
+
+    # 已 merged 的issue被重新打开时, 依赖它的issue重新被阻塞
+    first.status = "pending_merge"
+    db.add(first)
+    db.commit()
+    db.refresh(dependent)
+    assert dependent.unmet_dependency_count == 2
+
+    first.status = "merged"
+    second.status = "merged"
+    db.add(first)
+    db.add(second)
+    db.commit()
+    db.refresh(dependent)
+    assert dependent.unmet_dependency_count == 0
+    ready_ids = {issue.id for issue in IssueDependencyService.get_ready_issues(db, limit=1_000)}
+    assert dependent.id in ready_ids
+
+
+def test_deleting_unmerged_dependency_unblocks_dependents(db: Session) -> None:
+    dependency = create_issue_for_node(db, None, status="pending")
+    dependent = create_issue_for_node(db, None, status="pending")
+    IssueDependencyService.set_dependencies(db, dependent.id, {dependency.id})
+    db.commit()
+
+    db.delete(dependency)
+    db.commit()
+    db.refresh(dependent)
+    assert dependent.unmet_dependency_count == 0
+
+
+def test_set_dependencies_rejects_cycles(db: Session) -> None:
+    a = create_issue_for_node(db, None, status="pending")
+    b = create_issue_for_node(db, None, status="pending")
+    c = create_issue_for_node(db, None, status="pending")
+    IssueDependencyService.set_dependencies(db, b.id, {a.id})
+    IssueDependencyService.set_dependencies(db, c.id, {b.id})
+    db.commit()
+
+    with pytest.raises(DependencyCycleError):
+        IssueDependencyService.set_dependencies(db, a.id, {c.id})
+    db.rollback()
+    with pytest.raises(DependencyCycleError):
+        IssueDependencyService.set_dependencies(db, a.id, {a.id})
+    db.rollback()
+
+    assert IssueDependencyService.find_cycle(db, c.id, {a.id}) is None
+
+
+def test_get_graph_returns_transitive_closure(db: Session) -> None:
+    root = create_issue_for_node(db, None, status="merged")
+    middle = create_issue_for_node(db, None, status="pending")
+    seed = create_issue_for_node(db, None, status="pending")
+    leaf = create_issue_for_node(db, None, status="pending")
+    unrelated = create_issue_for_node(db, None, status="pending")
+    IssueDependencyService.set_dependencies(db, middle.id, {root.id})
+    IssueDependencyService.set_dependencies(db, seed.id, {middle.id})
+    IssueDependencyService.set_dependencies(db, leaf.id, {seed.id, root.id})
+    db.commit()
+
+    graph = IssueDependencyService.get_graph(db, [seed.id])
+
+    assert set(graph.ancestor_ids) == {root.id, middle.id}
+    assert graph.descendant_ids == [leaf.id]
+    assert unrelated.id not in {node.id for node in graph.nodes}
+    # 闭包内的边都返回, 包括 leaf 直接依赖 root 的边
+    assert len(graph.edges) == 4
+    assert graph.topological_order == [root.id, middle.id, seed.id, leaf.id]
+    assert graph.critical_path == [root.id, middle.id, seed.id, leaf.id]
+    assert graph.critical_path_length == 3
+
+    ancestors_only = IssueDependencyService.get_graph(db, [seed.id], direction="ancestors")
+    assert ancestors_only.descendant_ids == []
+
+
+def test_build_graph_orders_by_priority_and_reports_cycles() -> None:
+    ids = [uuid.uuid4() for _ in range(4)]
+    nodes = [
+        DependencyGraphNode(id=issue_id, title="t", status="pending", priority=priority, relation="seed")
+        for issue_id, priority in zip(ids, (1, 5, 3, 0))
+    ]
+    edges = [DependencyGraphEdge(issue_id=ids[3], depends_on_issue_id=ids[0])]
+
+    graph = IssueDependencyService.build_graph(nodes, edges)
+    assert graph.topological_order == [ids[1], ids[2], ids[0], ids[3]]
+    assert graph.critical_path_length == 2
+
+    edges.append(DependencyGraphEdge(issue_id=ids[0], depends_on_issue_id=ids[3]))
+    graph = IssueDependencyService.build_graph(nodes, edges)
+    assert set(graph.cycle_issue_ids) == {ids[0], ids[3]}
+    assert graph.topological_order == [ids[1], ids[2]]
+
+
+def test_concurrent_merge_and_new_dependency_do_not_lose_updates(db: Session) -> None:
+    dependency = create_issue_for_node(db, None, status="pending_merge")
+    dependent = create_issue_for_node(db, None, status="pending")
+
+    with Session(engine) as merging, Session(engine) as linking:
+        # 事务1: merge 被依赖的issue并调整依赖方计数, 此时还看不到新的依赖
+        issue = merging.get(Issue, dependency.id)
+        assert issue is not None
+        issue.status = "merged"
+        merging.add(issue)
+        merging.flush()
+
+        # 事务2: 同时新增依赖; 须等事务1提交后才计算计数, 否则依赖方会一直被阻塞
+        def link() -> None:
+            IssueDependencyService.set_dependencies(linking, dependent.id, {dependency.id})
+            linking.commit()
+
+        worker = threading.Thread(target=link)
+        worker.start()
+        worker.join(timeout=0.5)
+        assert worker.is_alive()
+        merging.commit()
+        worker.join(timeout=10)
+        assert not worker.is_alive()
+
+    db.refresh(dependent)
+    assert dependent.unmet_dependency_count == 0
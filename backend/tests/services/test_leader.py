@@ -0,0 +1,29 @@
+"""Tests for advisory-lock leader election"""
+from sqlmodel import Session
+
+from app.services.leader import LeaderElection, get_leader_status
+
+
+def test_only_one_process_leads_and_another_takes_over(db: Session) -> None:
+    # 两个选主对象使用各自的连接, 相当于两个进程
+    first = LeaderElection("workspace-cleanup")
+    second = LeaderElection("workspace-cleanup")
+    try:
+        assert first.try_acquire()
+        assert first.try_acquire()
+        assert not second.try_acquire()
+
+        status = {item.job: item for item in get_leader_status(db.connection())}
+        cleanup = status["workspace-cleanup"]
+        assert cleanup.held
+        assert cleanup.holder is not None and cleanup.holder.startswith("aise:")
+
+        first.release()
+        assert not first.is_leader
+        assert second.try_acquire()
+    finally:
+        first.release()
+        second.release()
+
+    status = {item.job: item for item in get_leader_status(db.connection())}
+    assert not status["workspace-cleanup"].held
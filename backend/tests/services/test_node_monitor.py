@@ -0,0 +1,43 @@
+"""Tests for the node monitor"""
+from datetime import datetime, timedelta
+
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.models import Issue, Node
+from app.services.node_monitor import mark_offline_nodes
+from tests.utils.node import create_issue_for_node, create_online_node
+
+
+def test_mark_offline_nodes_requeues_in_flight_issues(db: Session) -> None:
+    stale = create_online_node(db, tags="monitor")
+    stale.last_heartbeat = datetime.utcnow() - timedelta(
+        seconds=settings.NODE_OFFLINE_THRESHOLD_SECONDS * 2
+    )
+    db.add(stale)
+    db.commit()
+    healthy = create_online_node(db, tags="monitor")
+    in_flight = create_issue_for_node(db, stale, status="processing")
+    done = create_issue_for_node(db, stale, status="completed")
+    backlog = create_issue_for_node(db, None, status="pending")
+
+    changed = mark_offline_nodes(db)
+
+    assert changed >= 1
+    stale = db.get(Node, stale.id, populate_existing=True)
+    healthy = db.get(Node, healthy.id, populate_existing=True)
+    in_flight = db.get(Issue, in_flight.id, populate_existing=True)
+    done = db.get(Issue, done.id, populate_existing=True)
+    backlog = db.get(Issue, backlog.id, populate_existing=True)
+    assert stale is not None and stale.status == "offline"
+    assert healthy is not None and healthy.status == "online"
+    assert in_flight is not None
+    assert in_flight.status == "pending"
+    assert in_flight.started_at is None
+    assert in_flight.assigned_node_id not in (None, stale.id)
+    assert done is not None
+    assert done.status == "completed"
+    assert done.assigned_node_id == stale.id
+    # 只重新分配离线节点上回收的issue, 其余积压由定时分配任务处理
+    assert backlog is not None
+    assert backlog.assigned_node_id is None
@@ -0,0 +1,154 @@
+"""Tests for NodeRPCClient batch execution"""
+import asyncio
+import json
+import uuid
+from collections.abc import Awaitable, Callable
+from unittest import mock
+
+import httpx
+import pytest
+from sqlmodel import Session, select
+
+from app.models import Node
+from app.models.command import CommandBatchRequest, CommandBatchResponse, CommandRequest
+from app.models.workflow_log import WorkflowLog
+from app.services.node_rpc import NodeRPCClient, node_base_url, node_rpc
+from app.services.workflow import WorkflowService
+from tests.utils.node import create_issue_for_node, create_online_node
+
+Handler = Callable[[httpx.Request], Awaitable[httpx.Response]]
+
+
+def _client_for(node: Node, handler: Handler) -> httpx.AsyncClient:
+    return httpx.AsyncClient(base_url=node_base_url(node), transport=httpx.MockTransport(handler))
+
+
+def _sequential_handler(calls: list[str], failing: str = "") -> Handler:
+    """不支持 /execute/batch 的旧版本 agent: 只实现 /execute, 命令为 failing 时退出码为1"""
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        if request.url.path != "/execute":
+            return httpx.Response(404, json={"detail": "Not Found"})
+        body = json.loads(request.content)
+        await asyncio.sleep(0.02)
+        exit_code = 1 if body["command"] == failing else 0
+        return httpx.Response(
+            200,
+            json={**body, "exit_code": exit_code, "stdout": f"ran {body['command']}", "stderr": ""},
+        )
+
+    return handler
+
+
+def test_batch_falls_back_to_sequential_execute() -> None:
+    node = Node(id=uuid.uuid4(), name="legacy", ip="10.9.0.1")
+    calls: list[str] = []
+    batch = CommandBatchRequest(steps=[CommandRequest(command="mkdir"), CommandRequest(command="git")])
+
+    async def run() -> tuple[CommandBatchResponse, CommandBatchResponse]:
+        client = NodeRPCClient()
+        client._clients[node_base_url(node)] = _client_for(node, _sequential_handler(calls))
+        first = await client.execute_batch(node, batch)
+        # 记住节点不支持批量接口, 之后不再尝试
+        second = await client.execute_batch(node, batch)
+        await client.aclose()
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert calls == ["/execute/batch", "/execute", "/execute", "/execute", "/execute"]
+    assert first.success and second.success
+    assert [step.stdout for step in first.steps] == ["ran mkdir", "ran git"]
+    assert all(step.duration_ms is not None and step.duration_ms >= 20 for step in first.steps)
+
+
+def test_sequential_fallback_skips_after_failure() -> None:
+    node = Node(id=uuid.uuid4(), name="legacy", ip="10.9.0.2")
+    calls: list[str] = []
+    batch = CommandBatchRequest(
+        steps=[CommandRequest(command="mkdir"), CommandRequest(command="git"), CommandRequest(command="qoder")]
+    )
+
+    async def run() -> CommandBatchResponse:
+        client = NodeRPCClient()
+        client._clients[node_base_url(node)] = _client_for(node, _sequential_handler(calls, failing="git"))
+        result = await client.execute_batch(node, batch)
+        await client.aclose()
+        return result
+
+    result = asyncio.run(run())
+
+    assert calls.count("/execute") == 2
+    assert not result.success
+    assert [step.exit_code for step in result.steps] == [0, 1, -1]
+    assert [step.skipped for step in result.steps] == [False, False, True]
+
+
+def test_batch_errors_other_than_not_found_are_raised() -> None:
+    node = Node(id=uuid.uuid4(), name="broken", ip="10.9.0.3")
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(500, json={"detail": "boom"})
+
+    async def run() -> None:
+        client = NodeRPCClient()
+        client._clients[node_base_url(node)] = _client_for(node, handler)
+        try:
+            await client.execute_batch(node, CommandBatchRequest(steps=[CommandRequest(command="ls")]))
+        finally:
+            await client.aclose()
+
+    with pytest.raises(httpx.HTTPStatusError) as exc_info:
+        asyncio.run(run())
+    assert exc_info.value.response.status_code == 500
+
+
+def test_step_durations_are_recorded_in_workflow_log(db: Session) -> None:
+    node = create_online_node(db)
+    issue = create_issue_for_node(db, node, status="processing")
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        assert request.url.path == "/execute/batch"
+        steps = json.loads(request.content)["steps"]
+        return httpx.Response(
+            200,
+            json={
+                "success": False,
+                "duration_ms": 480,
+                "steps": [
+                    {**steps[0], "exit_code": 0, "stdout": "", "stderr": "", "duration_ms": 120},
+                    {**steps[1], "exit_code": 128, "stdout": "", "stderr": "fatal", "duration_ms": 360},
+                    {**steps[2], "exit_code": -1, "stdout": "", "stderr": "", "skipped": True},
+                ],
+            },
+        )
+
+    async def run() -> dict:
+        client = _client_for(node, handler)
+        with mock.patch.dict(node_rpc._clients, {node_base_url(node): client}):
+            try:
+                return await WorkflowService.execute_steps_on_node(
+                    db,
+                    node,
+                    issue.id,
+                    [
+                        ("mkdir", "mkdir", ["-p", "/workspace/x"], None),
+                        ("clone", "git", ["clone", "https://example.com/r.git", "."], "/workspace/x"),
+                        ("create_branch", "git", ["checkout", "-b", "fix"], "/workspace/x"),
+                    ],
+                )
+            finally:
+                await client.aclose()
+
+    results = asyncio.run(run())
+
+    assert results["clone"].exit_code == 128
+    logs = {
+        log.step_name: log
+        for log in db.exec(select(WorkflowLog).where(WorkflowLog.issue_id == issue.id)).all()
+    }
+    assert logs["mkdir"].status == "success" and logs["mkdir"].duration_ms == 120
+    assert logs["clone"].status == "failed" and logs["clone"].duration_ms == 360
+    assert logs["clone"].output == "fatal"
+    assert logs["create_branch"].status == "skipped"
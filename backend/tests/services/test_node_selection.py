@@ -0,0 +1,109 @@
+"""Tests for NodeSelectionService"""
+import uuid
+
+from sqlmodel import Session
+
+from app.core.db import engine
+from app.models.node import NodeMetrics
+from app.services.node_selection import NodeSelectionService, ResourceRequirements
+from tests.utils.node import create_issue_for_node, create_online_node
+from tests.utils.query_counter import count_queries
+
+
+def test_select_best_node_prefers_least_loaded_tagged_node(db: Session) -> None:
+    tag = f"tag-{uuid.uuid4().hex[:8]}"
+    busy = create_online_node(db, tags=f"{tag}, gpu")
+    idle = create_online_node(db, tags=f"gpu,{tag}")
+    create_online_node(db, tags="gpu")
+    create_issue_for_node(db, busy)
+    create_issue_for_node(db, busy)
+    create_issue_for_node(db, idle, status="pending")
+
+    best = NodeSelectionService.select_best_node(db, required_tags=[tag])
+
+    assert best is not None
+    assert best.id == idle.id
+
+
+def test_weighted_strategy_prefers_node_with_capacity(db: Session) -> None:
+    tag = f"tag-{uuid.uuid4().hex[:8]}"
+    small = create_online_node(db, tags=tag)
+    large = create_online_node(db, tags=tag)
+    unreported = create_online_node(db, tags=tag)
+    db.add(NodeMetrics(node_id=small.id, cpu_count=2, load_avg=1.5, mem_free_mb=1024, disk_free_mb=4096))
+    db.add(NodeMetrics(node_id=large.id, cpu_count=64, load_avg=8, mem_free_mb=65536, disk_free_mb=512000))
+    db.commit()
+    create_issue_for_node(db, large)
+
+    # least_loaded 只看负载, 空闲的小节点胜出
+    least_loaded = NodeSelectionService.select_best_node(db, required_tags=[tag])
+    assert least_loaded is not None and least_loaded.id != large.id
+
+    best = NodeSelectionService.select_best_node(db, required_tags=[tag], strategy="weighted")
+    assert best is not None and best.id == large.id
+
+    ranked = NodeSelectionService.rank_nodes_by_score(
+        db, required_tags=[tag], requirements=ResourceRequirements(min_disk_free_mb=10240)
+    )
+    ranked_ids = [node.id for node, _ in ranked if node.id in (small.id, large.id, unreported.id)]
+    assert small.id not in ranked_ids
+    assert ranked_ids[:2] == [large.id, unreported.id]
+
+
+def test_select_best_node_query_count_is_constant(db: Session) -> None:
+    tag = f"tag-{uuid.uuid4().hex[:8]}"
+    create_online_node(db, tags=tag)
+    with count_queries(engine) as small:
+        NodeSelectionService.select_best_node(db, required_tags=[tag])
+
+    for _ in range(20):
+        node = create_online_node(db, tags=tag)
+        create_issue_for_node(db, node)
+    with count_queries(engine) as large:
+        NodeSelectionService.select_best_node(db, required_tags=[tag])
+
+    assert small.count == 1
+    assert large.count == small.count
+
+
+def test_plan_issue_assignments_respects_capacity() -> None:
+    full, half, empty = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    issue_ids = [uuid.uuid4() for _ in range(10)]
+
+    assignments, skipped = NodeSelectionService.plan_issue_assignments(
+        [(full, 3), (half, 1), (empty, 0)], issue_ids, max_per_node=3
+    )
+
+    assigned_nodes = [node_id for _, node_id in assignments]
+    assert [issue_id for issue_id, _ in assignments] == issue_ids[:5]
+    assert assigned_nodes == [empty, half, empty, half, empty]
+    assert full not in assigned_nodes
+    assert skipped == 5
+
+
+def test_distribute_issues_to_nodes_uses_constant_queries(db: Session) -> None:
+    create_online_node(db, tags="distribute")
+    issues = [create_issue_for_node(db, None, status="pending") for _ in range(15)]
+
+    with count_queries(engine) as counter:
+        stats = NodeSelectionService.distribute_issues_to_nodes(db, max_per_node=50)
+
+    assert stats["assigned"] >= len(issues)
+    assert counter.count == 3
+    for issue in issues:
+        db.refresh(issue)
+        assert issue.assigned_node_id is not None
+
+
+def test_distribute_issues_with_strategy_assigns_pending_issues(db: Session) -> None:
+    create_online_node(db, tags="strategy")
+    issues = [create_issue_for_node(db, None, status="pending") for _ in range(4)]
+
+    stats = NodeSelectionService.distribute_issues_to_nodes(
+        db, max_per_node=50, strategy="weighted_round_robin"
+    )
+
+    assert stats["assigned"] >= len(issues)
+    for issue in issues:
+        db.refresh(issue)
+        assert issue.assigned_node_id is not None
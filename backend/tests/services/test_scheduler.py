@@ -0,0 +1,33 @@
+"""Tests for SchedulerService"""
+import asyncio
+import uuid
+from unittest import mock
+
+from app.services.scheduler import SchedulerService
+
+
+def test_process_issues_concurrently_limits_runs_per_node() -> None:
+    nodes = [uuid.uuid4() for _ in range(4)]
+    runs = [(uuid.uuid4(), nodes[i % len(nodes)]) for i in range(16)]
+    active: dict[uuid.UUID, int] = dict.fromkeys(nodes, 0)
+    peak: dict[uuid.UUID, int] = dict.fromkeys(nodes, 0)
+
+    async def fake_run(
+        _self: SchedulerService, issue_id: uuid.UUID, node_id: uuid.UUID, _timeout: float
+    ) -> str:
+        active[node_id] += 1
+        peak[node_id] = max(peak[node_id], active[node_id])
+        await asyncio.sleep(0.01)
+        active[node_id] -= 1
+        return "failed" if issue_id == runs[0][0] else "succeeded"
+
+    with mock.patch.object(SchedulerService, "_run_issue_workflow", fake_run):
+        report = asyncio.run(
+            SchedulerService().process_issues_concurrently(runs, max_per_node=2)
+        )
+
+    assert report["total"] == 16
+    assert report["succeeded"] == 15
+    assert report["failed"] == 1
+    assert report["nodes"][str(runs[0][1])]["failed"] == 1
+    assert max(peak.values()) == 2
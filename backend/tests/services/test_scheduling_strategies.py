@@ -0,0 +1,73 @@
+"""Tests for node selection strategies and the scheduling simulator"""
+from collections import Counter
+
+from app.services.scheduling_simulator import (
+    SimulatedNode,
+    TraceItem,
+    simulate,
+    synthetic_nodes,
+    synthetic_trace,
+)
+from app.services.scheduling_strategies import NodeCandidate, STRATEGIES, get_strategy
+
+
+def test_weighted_round_robin_follows_weights() -> None:
+    candidates = [
+        NodeCandidate(node_id="a", capacity=100, weight=5),
+        NodeCandidate(node_id="b", capacity=100, weight=1),
+        NodeCandidate(node_id="c", capacity=100, weight=1),
+    ]
+    strategy = get_strategy("weighted_round_robin")
+
+    picks = [strategy.choose(candidates).node_id for _ in range(7)]
+
+    assert Counter(picks) == {"a": 5, "b": 1, "c": 1}
+    # 平滑轮询把小权重节点穿插在大权重节点之间, 而不是连续选5次a
+    assert picks == ["a", "a", "b", "a", "c", "a", "a"]
+
+
+def test_tag_affinity_spills_over_when_matched_nodes_are_busy() -> None:
+    gpu = NodeCandidate(node_id="gpu", workload=4, capacity=5, tags=frozenset({"gpu"}))
+    cpu = NodeCandidate(node_id="cpu", workload=0, capacity=4)
+
+    assert get_strategy("least_loaded").choose([gpu, cpu], ["gpu"]).node_id == "gpu"
+    assert get_strategy("tag_affinity").choose([gpu, cpu], ["gpu"]).node_id == "cpu"
+    gpu.workload = 1
+    assert get_strategy("tag_affinity").choose([gpu, cpu], ["gpu"]).node_id == "gpu"
+
+
+def test_strategies_skip_full_nodes() -> None:
+    full = NodeCandidate(node_id="full", workload=2, capacity=2, weight=10, score=1.0)
+    free = NodeCandidate(node_id="free", workload=1, capacity=2)
+    for name in STRATEGIES:
+        strategy = get_strategy(name)
+        assert strategy.choose([full, free]).node_id == "free"
+        free.workload = 2
+        assert strategy.choose([full, free]) is None
+        free.workload = 1
+
+
+def test_simulation_is_deterministic_and_accounts_for_every_issue() -> None:
+    trace = synthetic_trace(300, mean_interarrival=5, mean_duration=120, tag_choices=("gpu",), seed=7)
+    nodes = synthetic_nodes(6, tag_choices=("gpu",), seed=7)
+
+    for name in STRATEGIES:
+        options = {"seed": 7} if name == "power_of_two" else {}
+        first = simulate(trace, nodes, get_strategy(name, **options))
+        second = simulate(trace, nodes, get_strategy(name, **options))
+        assert first == second
+        assert first.completed == len(trace)
+        assert sum(node.completed for node in first.nodes) == len(trace)
+        assert 0 < first.mean_utilization <= 1
+
+
+def test_simulation_queues_when_capacity_is_exhausted() -> None:
+    trace = [TraceItem(arrival=0, duration=10) for _ in range(3)]
+    nodes = [SimulatedNode(node_id="only", capacity=1)]
+
+    report = simulate(trace, nodes, get_strategy("least_loaded"))
+
+    assert report.makespan_seconds == 30
+    assert report.wait_max_seconds == 20
+    assert report.wait_p50_seconds == 10
+    assert report.nodes[0].utilization == 1.0
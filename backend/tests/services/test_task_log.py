@@ -0,0 +1,71 @@
+"""Tests for TaskLogStore"""
+import pytest
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.models.workflow_log import WorkflowLog, WorkflowLogChunk
+from app.services.task_log import TaskLogStore
+from tests.utils.node import create_issue_for_node
+
+
+@pytest.fixture
+def small_chunks(monkeypatch: pytest.MonkeyPatch) -> int:
+    monkeypatch.setattr(settings, "TASK_LOG_CHUNK_BYTES", 16)
+    return 16
+
+
+def _create_log(db: Session) -> WorkflowLog:
+    issue = create_issue_for_node(db, None, status="processing")
+    log = WorkflowLog(issue_id=issue.id, step_name="clone", status="success")
+    db.add(log)
+    db.commit()
+    db.refresh(log)
+    return log
+
+
+def test_append_splits_into_fixed_size_chunks(db: Session, small_chunks: int) -> None:
+    log = _create_log(db)
+    text = "".join(f"line {index:03d}\n" for index in range(20))  # 180 bytes
+
+    # 分两次追加, 第一次留下的未写满的段会被补满
+    assert TaskLogStore.append(db, log.id, "stdout", text[:50]) == 50
+    assert TaskLogStore.append(db, log.id, "stdout", text[50:]) == len(text)
+    db.commit()
+
+    chunks = db.exec(
+        select(WorkflowLogChunk).where(WorkflowLogChunk.log_id == log.id).order_by(WorkflowLogChunk.seq)
+    ).all()
+    assert [chunk.seq for chunk in chunks] == list(range(12))
+    assert all(chunk.raw_size == small_chunks for chunk in chunks[:-1])
+    assert [chunk.offset for chunk in chunks] == [seq * small_chunks for seq in range(12)]
+
+    page = TaskLogStore.read(db, log.id, "stdout", offset=30, limit=40)
+    assert page.data == text[30:70]
+    assert page.next_offset == 70
+    assert page.total == len(text)
+
+    pages = []
+    offset = 0
+    while offset < len(text):
+        page = TaskLogStore.read(db, log.id, "stdout", offset=offset, limit=64)
+        pages.append(page.data)
+        offset = page.next_offset
+    assert "".join(pages) == text
+    assert TaskLogStore.sizes(db, [log.id]) == {(log.id, "stdout"): len(text)}
+
+
+def test_read_does_not_split_multibyte_characters(db: Session, small_chunks: int) -> None:
+    log = _create_log(db)
+    text = "构建完成" * 10
+    TaskLogStore.append(db, log.id, "stderr", text)
+    db.commit()
+
+    pages = []
+    offset = 0
+    while offset < len(text.encode()):
+        page = TaskLogStore.read(db, log.id, "stderr", offset=offset, limit=10)
+        assert "�" not in page.data
+        pages.append(page.data)
+        offset = page.next_offset
+    assert "".join(pages) == text
+    assert TaskLogStore.read(db, log.id, "stdout").total == 0
@@ -1,8 +1,13 @@
 """Node utility functions for tests"""
+import uuid
+from datetime import datetime
+
 from sqlmodel import Session
 
+from app import crud
+from app.core.config import settings
 from app.crud import create_node
-from app.models import Node, NodeCreate
+from app.models import Issue, Node, NodeCreate
 
 
 def create_random_node(db: Session) -> Node:
@@ -21,3 +26,43 @@ def create_random_node(db: Session) -> Node:
         status=status,
     )
     return create_node(session=db, node_in=node_in)
+
+
+def create_online_node(db: Session, tags: str | None = None) -> Node:
+    """Create an online node with a fresh heartbeat, owned by the superuser"""
+    owner = crud.get_user_by_email(session=db, email=settings.FIRST_SUPERUSER)
+    assert owner is not None
+    node = Node(
+        name=f"online-node-{uuid.uuid4().hex[:8]}",
+        ip="10.1.0.1",
+        tags=tags,
+        status="online",
+        last_heartbeat=datetime.utcnow(),
+        owner_id=owner.id,
+    )
+    db.add(node)
+    db.commit()
+    db.refresh(node)
+    return node
+
+
+def create_issue_for_node(
+    db: Session,
+    node: Node | None,
+    status: str = "processing",
+    priority: int = 0,
+) -> Issue:
+    """Create an issue assigned to ``node`` in the given status"""
+    owner = crud.get_user_by_email(session=db, email=settings.FIRST_SUPERUSER)
+    assert owner is not None
+    issue = Issue(
+        title=f"issue-{uuid.uuid4().hex[:8]}",
+        status=status,
+        priority=priority,
+        assigned_node_id=node.id if node else None,
+        owner_id=owner.id,
+    )
+    db.add(issue)
+    db.commit()
+    db.refresh(issue)
+    return issue
@@ -0,0 +1,31 @@
+"""SQL statement counting helpers for tests"""
+from collections.abc import Generator
+from contextlib import contextmanager
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryCounter:
+    def __init__(self) -> None:
+        self.statements: list[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+
+@contextmanager
+def count_queries(engine: Engine) -> Generator[QueryCounter, None, None]:
+    """Record every SQL statement executed on ``engine`` inside the block"""
+    counter = QueryCounter()
+
+    def _before_cursor_execute(*args: Any) -> None:
+        counter.statements.append(args[2])
+
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", _before_cursor_execute)